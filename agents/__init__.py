@@ -1,33 +1,105 @@
 # agents/__init__.py
 
-from .summarize_tool import SummarizeTool
-from .write_article_tool import WriteArticleTool
-from .sanitize_data_tool import SanitizeDataTool
-from .summarize_validator_agent import SummarizeValidatorAgent
-from .write_article_validator_agent import WriteArticleValidatorAgent
-from .sanitize_data_validator_agent import SanitizeDataValidatorAgent
-from .refiner_agent import RefinerAgent # New import
-from .validator_agent import ValidatorAgent  # New import
-from .web_search_agent import WebSearchAgent
-from .web_search_validator_agent import WebSearchValidatorAgent
+import importlib
+import threading
+from typing import Any, ClassVar, Dict, List, Tuple
+
+# Agent name -> ("module:Class", settings passed to the constructor). Modules are
+# imported and agents constructed on first use; the module path may be relative
+# to this package or absolute, so new agents can be registered from config.
+AGENT_DEFINITIONS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "summarize": (".summarize_tool:SummarizeTool", ("max_retries", "verbose")),
+    "write_article": (".write_article_tool:WriteArticleTool", ("max_retries", "verbose")),
+    "sanitize_data": (".sanitize_data_tool:SanitizeDataTool", ("max_retries", "verbose")),
+    "summarize_validator": (".summarize_validator_agent:SummarizeValidatorAgent", ("verbose",)),
+    "write_article_validator": (".write_article_validator_agent:WriteArticleValidatorAgent", ("verbose",)),
+    "sanitize_data_validator": (".sanitize_data_validator_agent:SanitizeDataValidatorAgent", ("verbose",)),
+    "refiner": (".refiner_agent:RefinerAgent", ("max_retries", "verbose")),
+    "validator": (".validator_agent:ValidatorAgent", ("max_retries", "verbose")),
+    "web_search": (".web_search_agent:WebSearchAgent", ("max_retries", "verbose")),
+    "web_search_validator": (".web_search_validator_agent:WebSearchValidatorAgent", ("verbose",)),
+}
+
+
+# Public agent classes, imported on first attribute access (PEP 562) so that
+# `import agents` stays cheap for workers that only need a few of them.
+_LAZY_EXPORTS: Dict[str, str] = {
+    "SummarizeTool": ".summarize_tool",
+    "WriteArticleTool": ".write_article_tool",
+    "SanitizeDataTool": ".sanitize_data_tool",
+    "SummarizeValidatorAgent": ".summarize_validator_agent",
+    "WriteArticleValidatorAgent": ".write_article_validator_agent",
+    "SanitizeDataValidatorAgent": ".sanitize_data_validator_agent",
+    "RefinerAgent": ".refiner_agent",
+    "ValidatorAgent": ".validator_agent",
+    "WebSearchAgent": ".web_search_agent",
+    "WebSearchValidatorAgent": ".web_search_validator_agent",
+}
+
+__all__ = ["AgentManager", "AGENT_DEFINITIONS", "register_agent", *_LAZY_EXPORTS]
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
+
+def register_agent(name: str, class_path: str, settings: Tuple[str, ...] = ("verbose",)) -> None:
+    """Add or replace an agent definition; managers pick it up on the next get_agent."""
+    AGENT_DEFINITIONS[name] = (class_path, settings)
+
 
 class AgentManager:
+    """
+    Registry of agents, each created on first get_agent and reused afterwards.
+    Use AgentManager.shared() to get one manager per process and settings, so
+    Streamlit reruns don't rebuild the agents and their clients.
+    """
+    _shared: ClassVar[Dict[Tuple[int, bool], "AgentManager"]] = {}
+    _shared_lock: ClassVar[threading.Lock] = threading.Lock()
+
     def __init__(self, max_retries=4, verbose=True):
-        self.agents = {
-            "summarize": SummarizeTool(max_retries=max_retries, verbose=verbose),
-            "write_article": WriteArticleTool(max_retries=max_retries, verbose=verbose),
-            "sanitize_data": SanitizeDataTool(max_retries=max_retries, verbose=verbose),
-            "summarize_validator": SummarizeValidatorAgent(verbose=verbose),
-            "write_article_validator": WriteArticleValidatorAgent(verbose=verbose),
-            "sanitize_data_validator": SanitizeDataValidatorAgent(verbose=verbose),
-            "refiner": RefinerAgent(max_retries=max_retries, verbose=verbose),     # New agent
-            "validator": ValidatorAgent(max_retries=max_retries, verbose=verbose),   # New agent
-            "web_search": WebSearchAgent(max_retries=max_retries, verbose=verbose),
-            "web_search_validator": WebSearchValidatorAgent(verbose=verbose)
-        }
+        self.max_retries = max_retries
+        self.verbose = verbose
+        self.agents: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, max_retries: int = 4, verbose: bool = True) -> "AgentManager":
+        """Return the process-wide manager for these settings."""
+        key = (max_retries, verbose)
+        with cls._shared_lock:
+            manager = cls._shared.get(key)
+            if manager is None:
+                manager = cls._shared[key] = cls(max_retries=max_retries, verbose=verbose)
+            return manager
+
+    def _create_agent(self, agent_name: str) -> Any:
+        class_path, settings = AGENT_DEFINITIONS[agent_name]
+        module_name, class_name = class_path.split(":")
+        module = importlib.import_module(module_name, __name__)
+        kwargs = {setting: getattr(self, setting) for setting in settings}
+        return getattr(module, class_name)(**kwargs)
 
     def get_agent(self, agent_name):
         agent = self.agents.get(agent_name)
-        if not agent:
+        if agent is not None:
+            return agent
+        if agent_name not in AGENT_DEFINITIONS:
             raise ValueError(f"Agent '{agent_name}' not found.")
-        return agent
+        with self._lock:
+            agent = self.agents.get(agent_name)
+            if agent is None:
+                agent = self.agents[agent_name] = self._create_agent(agent_name)
+            return agent
+
+    def available_agents(self) -> List[str]:
+        return list(AGENT_DEFINITIONS)
@@ -0,0 +1,118 @@
+# agents/__main__.py
+"""
+Command-line entry point for the agents, without Streamlit.
+
+Usage:
+    python -m agents summarize paper.pdf
+    python -m agents summarize --url https://arxiv.org/pdf/1706.03762
+    python -m agents write "Graph neural networks" --outline outline.txt
+    python -m agents refine draft.md
+    python -m agents sanitize record.txt
+    python -m agents models
+    python -m agents batch jobs.jsonl -o results.jsonl --resume
+    python -m agents sanitize-dataset export.csv -o clean.csv --resume
+
+Text inputs are read from a file, or from stdin when the path is "-". Generated
+text is streamed to stdout as it arrives. PDFs and URLs are summarized page by
+page while they are still being extracted.
+"""
+import argparse
+import sys
+from typing import Iterator, Optional
+
+
+def _read_input(path: Optional[str]) -> str:
+    if path is None or path == "-":
+        return sys.stdin.read()
+    if path.lower().endswith(".pdf"):
+        from utils.pdf_extraction import extract_pdf_text
+        return extract_pdf_text(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _read_pages(path: Optional[str], url: Optional[str] = None) -> Iterator[str]:
+    """Pages of a PDF or URL as they are extracted; any other input is one page."""
+    if url:
+        from utils.document_store import iter_document_pages
+        return iter_document_pages(url)
+    if path is not None and path.lower().endswith(".pdf"):
+        from utils.pdf_extraction import iter_pdf_pages
+        return iter_pdf_pages(path)
+    return iter([_read_input(path)])
+
+
+def _print_stream(stream) -> None:
+    for delta in stream:
+        sys.stdout.write(delta)
+        sys.stdout.flush()
+    sys.stdout.write("\n")
+
+
+def main(argv: Optional[list] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "batch":
+        from .batch_runner import main as batch_main
+        return batch_main(argv[1:])
+    if argv and argv[0] == "sanitize-dataset":
+        from .dataset_sanitizer import main as dataset_main
+        return dataset_main(argv[1:])
+
+    parser = argparse.ArgumentParser(prog="python -m agents", description="Run the agents from the command line.")
+    parser.add_argument("--server", default=None, help="Ollama server address (default: OLLAMA_SERVER or localhost)")
+    parser.add_argument("--model", default="deepseek-r1:1.5b", help="model name")
+    parser.add_argument("--max-retries", type=int, default=2)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summarize = commands.add_parser("summarize", help="summarize a text file, PDF or URL")
+    summarize.add_argument("path", nargs="?", default="-")
+    summarize.add_argument("--url", default=None)
+    write = commands.add_parser("write", help="write an article on a topic")
+    write.add_argument("topic")
+    write.add_argument("--outline", default=None, help="file with one section per line")
+    refine = commands.add_parser("refine", help="refine a draft article")
+    refine.add_argument("path", nargs="?", default="-")
+    sanitize = commands.add_parser("sanitize", help="remove PHI from a text file")
+    sanitize.add_argument("path", nargs="?", default="-")
+    commands.add_parser("models", help="list the models on the server")
+    commands.add_parser("batch", help="run a JSONL batch (see python -m agents.batch_runner --help)")
+    commands.add_parser("sanitize-dataset", help="sanitize a CSV or JSONL dataset (see python -m agents.dataset_sanitizer --help)")
+    args = parser.parse_args(argv)
+
+    from . import AgentManager
+    from .openai_response import normalize_base_url
+    from utils.logger import configure_logging_from_env
+
+    configure_logging_from_env(console=sys.stderr)
+    if args.command == "models":
+        from .model_catalog import get_model_catalog
+        health = get_model_catalog().probe(normalize_base_url(args.server))
+        if not health.ok:
+            print(f"Failed to connect to {health.server_address}: {health.error}", file=sys.stderr)
+            return 1
+        for name in health.models:
+            print(f"{name}{'  (loaded)' if name in health.loaded_models else ''}")
+        return 0
+
+    manager = AgentManager.shared(max_retries=args.max_retries, verbose=False)
+    try:
+        if args.command == "summarize":
+            pages = _read_pages(args.path, args.url)
+            _print_stream(manager.get_agent("summarize").execute_pages_stream(pages, args.server, args.model))
+        elif args.command == "write":
+            outline = _read_input(args.outline) if args.outline else None
+            _print_stream(manager.get_agent("write_article").execute_stream(args.topic, outline, args.server, args.model))
+        elif args.command == "refine":
+            draft = _read_input(args.path)
+            _print_stream(manager.get_agent("refiner").execute_stream(draft, args.server, args.model))
+        elif args.command == "sanitize":
+            record = _read_input(args.path)
+            _print_stream(manager.get_agent("sanitize_data").execute_stream(record, args.server, args.model))
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,73 @@
 # agents/agent_base.py
 
+import hashlib
 import os
+import random
+from typing import Any, Iterable
 from pydantic import BaseModel, Field
 from loguru import logger
 import openai
+from .openai_response import get_client
+from .server_pool import parse_server_addresses
 
-class AgentBase(BaseModel):
+# Verbose logs show a payload's length, hash and at most this many leading characters
+# (0 = hash only), and only for a LOG_PAYLOAD_SAMPLE fraction of calls the preview is included
+PAYLOAD_PREVIEW_CHARS = int(os.environ.get("LOG_PAYLOAD_CHARS", "200"))
+PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE", "1.0"))
+
+
+def describe_payload(text: Any, preview_chars: int = PAYLOAD_PREVIEW_CHARS) -> str:
+    """Short stand-in for a payload in logs: its length, a hash and a truncated preview."""
+    text = text if isinstance(text, str) else str(text)
+    digest = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()[:12]
+    summary = f"<{len(text)} chars sha1={digest}>"
+    if preview_chars > 0 and random.random() < PAYLOAD_SAMPLE_RATE:
+        preview = text[:preview_chars].replace("\n", " ")
+        summary += f" {preview!r}" + ("..." if len(text) > preview_chars else "")
+    return summary
+
+
+def describe_messages(messages: Iterable[Any]) -> str:
+    """One ``role=<payload>`` entry per chat message."""
+    return ", ".join(
+        f"{message.get('role', '?')}={describe_payload(message.get('content') or '')}"
+        if isinstance(message, dict) else describe_payload(message)
+        for message in messages
+    )
+
+
+class AgentLogMixin:
+    """Verbose request/response logging for classes with ``name`` and ``verbose`` attributes."""
+
+    # Logged under the calling module's name, so LOG_LEVELS can be set per agent
+    def log_request(self, model_name: str, messages: Iterable[Any], kind: str = "") -> None:
+        if self.verbose:
+            kind = f"{kind} " if kind else ""
+            # lazy: the payloads are only hashed if some sink accepts the record
+            logger.opt(depth=1, lazy=True).debug(
+                "[{}] Sending {}request: model={}, messages=[{}]",
+                lambda: self.name, lambda: kind, lambda: model_name, lambda: describe_messages(messages),
+            )
+
+    def log_response(self, text: Any) -> None:
+        if self.verbose:
+            logger.opt(depth=1, lazy=True).debug("[{}] Response: {}", lambda: self.name, lambda: describe_payload(text))
+
+    def log_error(self, error: BaseException) -> None:
+        logger.opt(depth=1, exception=error).error(f"[{self.name}] Exception: {error}")
+
+
+class AgentBase(AgentLogMixin, BaseModel):
     name: str
     max_retries: int = 2
     verbose: bool = True
     server_address: str = Field(default_factory=lambda: os.environ.get("OLLAMA_SERVER", "http://localhost:11434/v1"))
     model_name: str = Field(default_factory=lambda: os.environ.get("OLLAMA_MODEL", "deepseek-r1:1.5b"))
     api_key: str = Field(default_factory=lambda: os.environ.get("OLLAMA_API_KEY", "ollama"))
-    client: openai.OpenAI = Field(default_factory=lambda: openai.OpenAI(
-        base_url=os.environ.get("OLLAMA_SERVER", "http://localhost:11434/v1"),
-        api_key=os.environ.get("OLLAMA_API_KEY", "ollama")
+    # Shared, pooled client: agents pointing at the same server reuse one connection pool
+    client: openai.OpenAI = Field(default_factory=lambda: get_client(
+        (parse_server_addresses(None) or ["http://localhost:11434/v1"])[0],
+        os.environ.get("OLLAMA_API_KEY", "ollama")
     ))
 
     model_config = {
@@ -0,0 +1,237 @@
+# agents/batch_runner.py
+"""
+Headless batch runner: reads jobs from a JSONL file, runs them through AgentManager
+on a worker pool and appends one result line per job to an output JSONL file.
+
+The output file doubles as the checkpoint: on restart with --resume, jobs whose id
+already has a result are skipped, so an interrupted overnight run picks up where it
+stopped.
+
+Job lines look like:
+    {"id": "paper-1", "type": "summarize", "text": "..."}
+    {"id": "rec-7", "type": "sanitize", "text": "..."}
+    {"id": "art-3", "type": "write_article", "topic": "...", "outline": "..."}
+    {"id": "val-2", "type": "validate", "original_text": "...", "summary": "..."}
+Optional per-job "model" and "server_address" override the command-line defaults.
+Jobs without an id are identified by their line number; a repeated id is
+reported as a failed job.
+
+Usage:
+    python -m agents.batch_runner jobs.jsonl -o results.jsonl --workers 8 --resume
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from . import metrics
+from .scheduler import BATCH, request_priority
+
+JobHandler = Callable[[Any, Dict[str, Any], Optional[str], Optional[str]], Dict[str, Any]]
+
+
+def _summarize(manager: Any, job: Dict[str, Any], server_address: Optional[str], model_name: Optional[str]) -> Dict[str, Any]:
+    result = manager.get_agent("summarize").execute(job["text"], server_address, model_name)
+    return {"summary": result.summary}
+
+
+def _sanitize(manager: Any, job: Dict[str, Any], server_address: Optional[str], model_name: Optional[str]) -> Dict[str, Any]:
+    result = manager.get_agent("sanitize_data").execute(job["text"], server_address, model_name)
+    return {"sanitized_data": result.sanitized_data}
+
+
+def _write_article(manager: Any, job: Dict[str, Any], server_address: Optional[str], model_name: Optional[str]) -> Dict[str, Any]:
+    result = manager.get_agent("write_article").execute(job["topic"], job.get("outline"), server_address, model_name)
+    return {"article": result.article}
+
+
+def _validate(manager: Any, job: Dict[str, Any], server_address: Optional[str], model_name: Optional[str]) -> Dict[str, Any]:
+    """Pick the validator from the fields present on the job."""
+    if "summary" in job:
+        validation = manager.get_agent("summarize_validator").execute(
+            job.get("original_text", ""), job["summary"], server_address, model_name)
+    elif "article" in job and "topic" in job:
+        validation = manager.get_agent("validator").execute(job["topic"], job["article"], server_address, model_name)
+    elif "article" in job:
+        validation = manager.get_agent("write_article_validator").execute(job["article"], server_address, model_name)
+    elif "text" in job:
+        validation = manager.get_agent("sanitize_data_validator").execute(job["text"], server_address, model_name)
+    else:
+        raise ValueError("validate job needs 'summary', 'article' or 'text'.")
+    return {"validation": validation}
+
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    "summarize": _summarize,
+    "sanitize": _sanitize,
+    "write_article": _write_article,
+    "validate": _validate,
+}
+
+
+def read_jobs(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Lazily yield (job id, job) pairs; malformed lines become jobs that fail with the parse error."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("job must be a JSON object")
+            except ValueError as e:
+                job = {"type": "invalid", "error": f"line {line_number}: {e}"}
+            yield str(job.get("id", f"line-{line_number}")), job
+
+
+def load_checkpoint(output_path: str, retry_failed: bool = False) -> Set[str]:
+    """
+    Return the ids already recorded in the output file. A torn last line left by a
+    crash, or any line that is not a JSON object, is truncated along with everything
+    after it so new results append cleanly.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    valid_end = 0
+    with open(output_path, "rb") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            if not isinstance(record, dict) or not raw.endswith(b"\n"):
+                break
+            valid_end += len(raw)
+            if record.get("status") == "ok" or not retry_failed:
+                done.add(str(record.get("id")))
+    if valid_end < os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_end)
+    return done
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        agent_manager: Any,
+        workers: int = 4,
+        max_in_flight: Optional[int] = None,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None,
+        priority: int = BATCH,
+    ) -> None:
+        self.agent_manager = agent_manager
+        self.workers = max(1, workers)
+        self.max_in_flight = max(self.workers, max_in_flight or 2 * self.workers)
+        self.server_address = server_address
+        self.model_name = model_name
+        self.priority = priority  # batch jobs yield Ollama slots to interactive requests
+
+    def run_job(self, job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        record: Dict[str, Any] = {"id": job_id, "type": job.get("type")}
+        try:
+            if job.get("type") == "invalid":
+                raise ValueError(job["error"])
+            handler = JOB_HANDLERS.get(job.get("type", ""))
+            if handler is None:
+                raise ValueError(f"Unknown job type '{job.get('type')}'.")
+            with request_priority(self.priority), metrics.span("batch.job", job_id=job_id, job_type=job.get("type")):
+                record["result"] = handler(
+                    self.agent_manager, job,
+                    job.get("server_address", self.server_address),
+                    job.get("model", self.model_name),
+                )
+            record["status"] = "ok"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["elapsed"] = round(time.perf_counter() - start, 3)
+        return record
+
+    def run(self, input_path: str, output_path: str, resume: bool = False, retry_failed: bool = False) -> Dict[str, int]:
+        """Process every job in ``input_path``, appending results to ``output_path`` as they finish."""
+        done = load_checkpoint(output_path, retry_failed) if resume else set()
+        counts = {"ok": 0, "error": 0, "skipped": 0}
+        mode = "a" if resume else "w"
+        with open(output_path, mode, encoding="utf-8") as out, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight: Set[Future] = set()
+
+            def drain(block_until: int) -> None:
+                nonlocal in_flight
+                while len(in_flight) > block_until:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record = future.result()
+                        counts[record["status"]] += 1
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+
+            seen: Set[str] = set()
+            for job_id, job in read_jobs(input_path):
+                if job_id in seen:
+                    job = {"type": "invalid", "error": f"duplicate id '{job_id}'"}
+                elif job_id in done:
+                    seen.add(job_id)
+                    counts["skipped"] += 1
+                    continue
+                seen.add(job_id)
+                in_flight.add(executor.submit(self.run_job, job_id, job))
+                drain(self.max_in_flight - 1)
+            drain(0)
+        return counts
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run agent jobs from a JSONL file without the Streamlit UI.")
+    parser.add_argument("input", help="JSONL file with one job per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=4, help="worker threads (default: 4)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="jobs submitted but not yet written (default: 2x workers)")
+    parser.add_argument("--resume", action="store_true", help="skip jobs already recorded in the output file")
+    parser.add_argument("--retry-failed", action="store_true", help="with --resume, run failed jobs again")
+    parser.add_argument("--server", default=None, help="Ollama server address, or a comma-separated list to load-balance")
+    parser.add_argument("--model", default=None, help="model name")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args(argv)
+
+    from . import AgentManager
+    from .model_catalog import get_model_catalog
+    from .openai_response import normalize_base_url
+    from .server_pool import parse_server_addresses
+    from utils.logger import configure_logging_from_env
+
+    configure_logging_from_env(console=sys.stderr)
+    if args.metrics_port:
+        metrics.serve_metrics(args.metrics_port)
+    for address in parse_server_addresses(args.server) or [None]:
+        health = get_model_catalog().get_health(normalize_base_url(address))
+        if not health.ok:
+            print(f"[BatchRunner] Warning: server {health.server_address} is unreachable: {health.error}", file=sys.stderr)
+        elif args.model and args.model not in health.models:
+            print(f"[BatchRunner] Warning: model '{args.model}' is not available on {health.server_address}", file=sys.stderr)
+    runner = BatchRunner(
+        AgentManager.shared(max_retries=args.max_retries, verbose=False),
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+        server_address=args.server,
+        model_name=args.model,
+    )
+    start = time.perf_counter()
+    counts = runner.run(args.input, args.output, resume=args.resume, retry_failed=args.retry_failed)
+    print(
+        f"[BatchRunner] {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped "
+        f"in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
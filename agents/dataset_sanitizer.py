@@ -0,0 +1,303 @@
+# agents/dataset_sanitizer.py
+"""
+Streaming sanitization of large CSV and JSONL datasets.
+
+Records are read lazily and packed into batches of at most ``batch_tokens``
+tokens, and each batch goes to the model as one JSON array through
+``SanitizeDataTool.execute_records``. Batches run on a worker pool, but results
+are written strictly in input order, so the output has the same records in the
+same order with the same columns (CSV) or keys (JSONL). When a reply is not a
+matching array the batch is split in half and retried, down to single records.
+Records the local PHI scanner settles on its own (see ``phi_scanner``) are
+redacted without being sent to the model.
+
+Progress is checkpointed next to the output in ``<output>.checkpoint`` after every
+written batch: the number of records done and the output size at that point. With
+--resume, the output is truncated back to that size and reading restarts after
+the last checkpointed record, so a multi-hour job survives a crash or Ctrl-C.
+
+Usage:
+    python -m agents.dataset_sanitizer export.csv -o clean.csv --workers 4 --resume
+    python -m agents.dataset_sanitizer records.jsonl -o clean.jsonl --fields name,notes
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from . import metrics
+from .scheduler import BATCH, request_priority
+from .text_chunker import estimate_tokens
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of '{path}'; pass one of {FORMATS}.")
+
+
+def read_csv_header(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def read_records(path: str, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Lazily yield the records of a CSV file (rows keyed by header) or a JSONL file (one object per line)."""
+    if fmt == "csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                row.pop(None, None)  # cells beyond the header
+                yield {key: value if value is not None else "" for key, value in row.items()}
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"{path} line {line_number}: record must be a JSON object")
+            yield record
+
+
+def batch_records(
+    records: Iterable[Dict[str, Any]], max_tokens: int, max_records: int = 50, fields: Optional[Sequence[str]] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """Group consecutive records into batches of at most ``max_tokens`` tokens; a larger record is a batch of its own."""
+    batch: List[Dict[str, Any]] = []
+    batch_tokens = 0
+    for record in records:
+        tokens = estimate_tokens(json.dumps(_selected(record, fields), ensure_ascii=False))
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_records):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(record)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def _selected(record: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    return record if fields is None else {key: value for key, value in record.items() if key in fields}
+
+
+def _conform(original: Dict[str, Any], sanitized: Dict[str, Any], fields: Optional[Sequence[str]], fmt: str) -> Dict[str, Any]:
+    """The original record with the sanitized values of its selected fields, keys in the original order."""
+    record = {}
+    for key, value in original.items():
+        if fields is None or key in fields:
+            if key not in sanitized:
+                raise ValueError(f"sanitized record is missing field '{key}'")
+            value = sanitized[key]
+            if fmt == "csv" and not isinstance(value, str):
+                value = "" if value is None else str(value)
+        record[key] = value
+    return record
+
+
+class Checkpoint:
+    """Progress of one job, stored as JSON in ``<output>.checkpoint`` and replaced atomically."""
+
+    def __init__(self, output_path: str) -> None:
+        self.path = output_path + ".checkpoint"
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, state: Dict[str, Any]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+
+def _fingerprint(path: str) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {"input": os.path.abspath(path), "input_size": stat.st_size, "input_mtime": stat.st_mtime}
+
+
+class DatasetSanitizer:
+    def __init__(
+        self,
+        tool: Any,
+        workers: int = 4,
+        batch_tokens: int = 800,
+        max_batch_records: int = 50,
+        max_in_flight: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None,
+        priority: int = BATCH,
+    ) -> None:
+        self.tool = tool
+        self.workers = max(1, workers)
+        self.batch_tokens = batch_tokens
+        self.max_batch_records = max(1, max_batch_records)
+        # Finished batches wait here until every earlier one is written, so this also bounds memory
+        self.max_in_flight = max(self.workers, max_in_flight or 2 * self.workers)
+        self.fields = list(fields) if fields else None
+        self.server_address = server_address
+        self.model_name = model_name
+        self.priority = priority
+
+    def sanitize_batch(self, records: List[Dict[str, Any]], fmt: str) -> Tuple[List[Dict[str, Any]], int]:
+        """Sanitize one batch, halving it while replies don't parse; returns the records and the number of splits."""
+        try:
+            sanitized = self.tool.execute_records(
+                [_selected(record, self.fields) for record in records], self.server_address, self.model_name
+            )
+            return [_conform(original, new, self.fields, fmt) for original, new in zip(records, sanitized)], 0
+        except ValueError as e:
+            if len(records) == 1:
+                raise ValueError(f"could not sanitize record: {e}") from e
+            logger.debug(f"[DatasetSanitizer] Splitting a batch of {len(records)} records: {e}")
+            middle = len(records) // 2
+            first, first_splits = self.sanitize_batch(records[:middle], fmt)
+            second, second_splits = self.sanitize_batch(records[middle:], fmt)
+            return first + second, first_splits + second_splits + 1
+
+    def _run_batch(self, records: List[Dict[str, Any]], fmt: str) -> Tuple[List[Dict[str, Any]], int]:
+        with request_priority(self.priority), metrics.span("sanitize.batch", records=len(records)):
+            return self.sanitize_batch(records, fmt)
+
+    def run(self, input_path: str, output_path: str, resume: bool = False, fmt: Optional[str] = None) -> Dict[str, int]:
+        """
+        Sanitize every record of ``input_path`` into ``output_path``. Raises on a batch that
+        cannot be sanitized, after checkpointing everything written before it.
+        """
+        fmt = fmt or detect_format(input_path)
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'; expected one of {FORMATS}.")
+        checkpoint = Checkpoint(output_path)
+        state = dict(_fingerprint(input_path), format=fmt, fields=self.fields, records=0, output_bytes=0, complete=False)
+        previous = checkpoint.load() if resume and os.path.exists(output_path) else None
+        if resume and previous is None:
+            logger.warning(f"[DatasetSanitizer] No checkpoint for {output_path}; starting from the first record.")
+        if previous is not None:
+            for key in ("input", "input_size", "input_mtime", "format", "fields"):
+                if previous.get(key) != state[key]:
+                    raise ValueError(f"Checkpoint {checkpoint.path} was written for a different job ({key} differs).")
+            if os.path.getsize(output_path) < previous["output_bytes"]:
+                raise ValueError(f"{output_path} is shorter than its checkpoint; start again without --resume.")
+            state.update(records=previous["records"], output_bytes=previous["output_bytes"], complete=previous["complete"])
+        counts = {"records": 0, "batches": 0, "splits": 0, "skipped": state["records"]}
+        if state["complete"]:
+            return counts
+        fieldnames = read_csv_header(input_path) if fmt == "csv" else None
+
+        with open(output_path, "r+b" if previous else "wb") as out:
+            out.truncate(state["output_bytes"])  # drop output written after the last checkpoint
+            out.seek(state["output_bytes"])
+            if fieldnames is not None and not previous:
+                out.write(self._encode_header(fieldnames))
+            in_flight: Deque[Tuple[Future, int]] = deque()
+
+            def write_oldest() -> None:
+                future, size = in_flight.popleft()
+                records, splits = future.result()
+                out.write(self._encode(records, fmt, fieldnames))
+                out.flush()
+                os.fsync(out.fileno())
+                state["records"] += size
+                state["output_bytes"] = out.tell()
+                checkpoint.save(state)
+                counts["records"] += size
+                counts["batches"] += 1
+                counts["splits"] += splits
+
+            executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dataset-sanitizer")
+            try:
+                records = read_records(input_path, fmt)
+                for _ in range(state["records"]):
+                    next(records, None)
+                for batch in batch_records(records, self.batch_tokens, self.max_batch_records, self.fields):
+                    in_flight.append((executor.submit(self._run_batch, batch, fmt), len(batch)))
+                    if len(in_flight) >= self.max_in_flight:
+                        write_oldest()
+                while in_flight:
+                    write_oldest()
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+        state["complete"] = True
+        checkpoint.save(state)
+        return counts
+
+    @staticmethod
+    def _encode_header(fieldnames: List[str]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(fieldnames)
+        return buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _encode(records: List[Dict[str, Any]], fmt: str, fieldnames: Optional[List[str]]) -> bytes:
+        if fmt == "jsonl":
+            return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames or [], extrasaction="ignore")
+        writer.writerows(records)
+        return buffer.getvalue().encode("utf-8")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sanitize a CSV or JSONL dataset record by record, with resumable progress.")
+    parser.add_argument("input", help="CSV file with a header row, or JSONL file with one object per line")
+    parser.add_argument("-o", "--output", required=True, help="sanitized file, in the same format as the input")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="input format (default: from the file extension)")
+    parser.add_argument("--fields", default=None, help="comma-separated fields to sanitize; others are copied unchanged")
+    parser.add_argument("--workers", type=int, default=4, help="batches sanitized concurrently (default: 4)")
+    parser.add_argument("--batch-tokens", type=int, default=800, help="approximate tokens per batch (default: 800)")
+    parser.add_argument("--batch-records", type=int, default=50, help="records per batch at most (default: 50)")
+    parser.add_argument("--resume", action="store_true", help="continue from the output's checkpoint")
+    parser.add_argument("--server", default=None, help="Ollama server address, or a comma-separated list to load-balance")
+    parser.add_argument("--model", default=None, help="model name")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args(argv)
+
+    from . import AgentManager
+    from utils.logger import configure_logging_from_env
+
+    configure_logging_from_env(console=sys.stderr)
+    if args.metrics_port:
+        metrics.serve_metrics(args.metrics_port)
+    sanitizer = DatasetSanitizer(
+        AgentManager.shared(max_retries=args.max_retries, verbose=False).get_agent("sanitize_data"),
+        workers=args.workers,
+        batch_tokens=args.batch_tokens,
+        max_batch_records=args.batch_records,
+        fields=[field.strip() for field in args.fields.split(",") if field.strip()] if args.fields else None,
+        server_address=args.server,
+        model_name=args.model,
+    )
+    start = time.perf_counter()
+    try:
+        counts = sanitizer.run(args.input, args.output, resume=args.resume, fmt=args.format)
+    except (RuntimeError, ValueError) as e:
+        print(f"[DatasetSanitizer] Stopped: {e}", file=sys.stderr)
+        print("[DatasetSanitizer] Progress is checkpointed; rerun with --resume to continue.", file=sys.stderr)
+        return 1
+    print(
+        f"[DatasetSanitizer] {counts['records']} records in {counts['batches']} batches "
+        f"({counts['splits']} splits, {counts['skipped']} already done) in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+# agents/metrics.py
+"""
+Per-call metrics and tracing for the LLM layer.
+
+Every chat request records its model, server, outcome, latency, time to first
+token (streams), prompt/completion tokens from ``response.usage`` and the
+resulting tokens per second; retries, cache hits and scheduler queue waits are
+counted as well. Metrics are kept in-process and rendered in the Prometheus text
+format by ``render_prometheus()``, or served over HTTP with ``serve_metrics()``.
+
+When the ``opentelemetry-api`` package is installed, calls, pipeline stages and
+batch jobs are also traced as spans: a chat call made inside a pipeline stage
+becomes a child of that stage's span. Without it (or without a configured
+OpenTelemetry SDK) tracing is a no-op.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RATE_BUCKETS = (1.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value:g}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def summary(self, **labels: Any) -> Dict[str, float]:
+        """Count, sum and mean of the observations for one label set."""
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return {"count": 0, "sum": 0.0, "mean": 0.0}
+            return {"count": entry[2], "sum": entry[1], "mean": entry[1] / entry[2]}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+REQUESTS = Counter("ollama_requests_total", "Chat requests sent to Ollama, by outcome.", ("model", "server", "outcome"))
+REQUEST_SECONDS = Histogram("ollama_request_duration_seconds", "Latency of chat requests.", ("model", "server"))
+TTFT_SECONDS = Histogram("ollama_time_to_first_token_seconds", "Time to the first streamed token.", ("model", "server"))
+PROMPT_TOKENS = Counter("ollama_prompt_tokens_total", "Prompt tokens processed.", ("model", "server"))
+COMPLETION_TOKENS = Counter("ollama_completion_tokens_total", "Completion tokens generated.", ("model", "server"))
+TOKENS_PER_SECOND = Histogram(
+    "ollama_tokens_per_second", "Completion tokens per second of request time.", ("model", "server"), RATE_BUCKETS,
+)
+RETRIES = Counter("ollama_retries_total", "Retried or failed-over attempts, by error class.", ("server", "error_class"))
+CACHE_LOOKUPS = Counter("ollama_cache_lookups_total", "Response cache lookups, by result.", ("model", "result"))
+QUEUE_WAIT_SECONDS = Histogram("ollama_queue_wait_seconds", "Time requests waited for a scheduler slot.", ("server",))
+STAGE_SECONDS = Histogram("pipeline_stage_duration_seconds", "Time pipeline stages spent per item.", ("stage",))
+PHI_PRESCANS = Counter(
+    "phi_prescans_total", "Texts checked by the local PHI scanner, by whether they still went to the model.", ("agent", "result"),
+)
+UNPARSED_VERDICTS = Counter(
+    "unparsed_verdicts_total", "Model replies without a verdict, so the item was kept unvalidated.", ("agent", "model"),
+)
+
+METRICS = (
+    REQUESTS, REQUEST_SECONDS, TTFT_SECONDS, PROMPT_TOKENS, COMPLETION_TOKENS, TOKENS_PER_SECOND,
+    RETRIES, CACHE_LOOKUPS, QUEUE_WAIT_SECONDS, STAGE_SECONDS, PHI_PRESCANS, UNPARSED_VERDICTS,
+)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    for metric in METRICS:
+        metric.reset()
+
+
+# --- Tracing (optional OpenTelemetry) ---
+
+_tracer: Any = None
+_tracer_checked = False
+
+
+def _get_tracer() -> Any:
+    global _tracer, _tracer_checked
+    if not _tracer_checked:
+        try:
+            from opentelemetry import trace
+            _tracer = trace.get_tracer("agents")
+        except ImportError:
+            _tracer = None
+        _tracer_checked = True
+    return _tracer
+
+
+def set_span_attributes(span: Any, **attributes: Any) -> None:
+    if span is None:
+        return
+    for key, value in attributes.items():
+        if value is not None:
+            span.set_attribute(key, value)
+
+
+def start_span(name: str, parent: Any = None, **attributes: Any) -> Any:
+    """Start a span without making it current (e.g. the root of a pipeline run); end it with ``end_span``."""
+    tracer = _get_tracer()
+    if tracer is None:
+        return None
+    from opentelemetry import trace
+    context = trace.set_span_in_context(parent) if parent is not None else None
+    span = tracer.start_span(name, context=context)
+    set_span_attributes(span, **attributes)
+    return span
+
+
+def end_span(span: Any) -> None:
+    if span is not None:
+        span.end()
+
+
+@contextmanager
+def span(name: str, parent: Any = None, **attributes: Any) -> Iterator[Any]:
+    """
+    Run the enclosed block in a span that is current on this thread, so spans started
+    inside it nest under it. ``parent`` links it to a span from another thread.
+    """
+    tracer = _get_tracer()
+    if tracer is None:
+        yield None
+        return
+    from opentelemetry import trace
+    context = trace.set_span_in_context(parent) if parent is not None else None
+    with tracer.start_as_current_span(name, context=context) as current:
+        set_span_attributes(current, **attributes)
+        yield current
+
+
+# --- Recording helpers used by the LLM layer ---
+
+class CallRecord:
+    """Measurements of one request attempt, filled in while it runs."""
+
+    def __init__(self, model: str, server: str) -> None:
+        self.model = model
+        self.server = server
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.streamed_chunks = 0
+        self.outcome = "ok"
+        self.span: Any = None
+
+    def set_usage(self, usage: Any) -> None:
+        if usage is not None:
+            self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+            self.completion_tokens = getattr(usage, "completion_tokens", None)
+
+    def chunk(self) -> None:
+        """Note a streamed text delta; the first one fixes the time to first token."""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.streamed_chunks += 1
+
+
+@contextmanager
+def track_request(model: str, server: str, current: bool = True) -> Iterator[CallRecord]:
+    """
+    Time one request attempt to ``server`` and record its outcome, tokens and rate.
+    Pass ``current=False`` when the block outlives the caller's frame (streams), so
+    the span is not left attached to the thread's context.
+    """
+    record = CallRecord(model, server)
+    with (span("ollama.chat", model=model, server=server) if current else _detached_span("ollama.chat", model=model, server=server)) as record.span:
+        try:
+            yield record
+        except BaseException as e:
+            record.outcome = "error"
+            set_span_attributes(record.span, error=type(e).__name__)
+            raise
+        finally:
+            _finish(record)
+
+
+@contextmanager
+def _detached_span(name: str, **attributes: Any) -> Iterator[Any]:
+    detached = start_span(name, **attributes)
+    try:
+        yield detached
+    finally:
+        end_span(detached)
+
+
+def _finish(record: CallRecord) -> None:
+    duration = time.perf_counter() - record.started
+    labels = {"model": record.model, "server": record.server}
+    REQUESTS.inc(outcome=record.outcome, **labels)
+    REQUEST_SECONDS.observe(duration, **labels)
+    ttft = record.first_token_at - record.started if record.first_token_at is not None else None
+    if ttft is not None:
+        TTFT_SECONDS.observe(ttft, **labels)
+    completion = record.completion_tokens
+    if completion is None and record.streamed_chunks:
+        completion = record.streamed_chunks  # Ollama streams about one token per chunk
+    if record.prompt_tokens:
+        PROMPT_TOKENS.inc(record.prompt_tokens, **labels)
+    tokens_per_second = None
+    if completion and record.outcome == "ok":
+        COMPLETION_TOKENS.inc(completion, **labels)
+        generation = duration - (ttft or 0.0)
+        if generation > 0:
+            tokens_per_second = completion / generation
+            TOKENS_PER_SECOND.observe(tokens_per_second, **labels)
+    set_span_attributes(
+        record.span, outcome=record.outcome, duration_s=duration, ttft_s=ttft,
+        prompt_tokens=record.prompt_tokens, completion_tokens=completion, tokens_per_second=tokens_per_second,
+    )
+
+
+def record_retry(server: str, error_class: str) -> None:
+    RETRIES.inc(server=server, error_class=error_class)
+
+
+def record_cache_lookup(model: str, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(model=model, result="hit" if hit else "miss")
+
+
+def record_queue_wait(server: str, seconds: float) -> None:
+    QUEUE_WAIT_SECONDS.observe(seconds, server=server)
+
+
+def record_prescan(agent: str, result: str) -> None:
+    """``result`` is "clean" or "redacted" when the model was skipped, "review" when it was still called."""
+    PHI_PRESCANS.inc(agent=agent, result=result)
+
+
+def record_unparsed_verdict(agent: str, model: str) -> None:
+    UNPARSED_VERDICTS.inc(agent=agent, model=model)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def serve_metrics(port: int = 9464, host: str = "127.0.0.1") -> Any:
+    """Serve /metrics for Prometheus on a daemon thread; returns the server (call shutdown() to stop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,140 @@
+# agents/model_catalog.py
+"""
+Cached catalog of the models available on Ollama servers.
+
+Lookups are served from memory; once an entry is older than the TTL it is still
+returned while a background thread refreshes it (stale-while-revalidate), so a
+slow or unreachable server never blocks a page render for more than the first,
+short-timeout probe. Each probe also records the server's latency and which
+models it currently has loaded (/api/ps).
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+import requests
+from pydantic import BaseModel
+
+
+class ServerHealth(BaseModel):
+    server_address: str
+    ok: bool
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    models: List[str] = []
+    loaded_models: List[str] = []  # models currently in memory, from /api/ps
+    checked_at: float = 0.0
+
+
+def native_api_url(server_address: str) -> str:
+    """Ollama's native API root for an address that may carry the OpenAI '/v1' suffix."""
+    base_url = server_address.rstrip("/")
+    if base_url.endswith("/v1"):
+        base_url = base_url[:-3]
+    return base_url
+
+
+class ModelCatalog:
+    def __init__(self, ttl: float = 30.0, connect_timeout: float = 1.0, read_timeout: float = 3.0) -> None:
+        self.ttl = ttl
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._entries: Dict[str, ServerHealth] = {}
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def probe(self, server_address: str) -> ServerHealth:
+        """Query a server now, update the cache and return its health."""
+        base_url = native_api_url(server_address)
+        timeout = (self.connect_timeout, self.read_timeout)
+        start = time.perf_counter()
+        try:
+            response = requests.get(f"{base_url}/api/tags", timeout=timeout)
+            response.raise_for_status()
+            latency_ms = (time.perf_counter() - start) * 1000
+            models = [model["name"] for model in response.json().get("models", [])]
+            loaded: List[str] = []
+            try:
+                ps = requests.get(f"{base_url}/api/ps", timeout=timeout)
+                if ps.ok:
+                    loaded = [model["name"] for model in ps.json().get("models", [])]
+            except requests.RequestException:
+                pass  # older servers have no /api/ps
+            health = ServerHealth(
+                server_address=base_url, ok=True, latency_ms=latency_ms,
+                models=models, loaded_models=loaded, checked_at=time.time(),
+            )
+        except Exception as e:
+            health = ServerHealth(server_address=base_url, ok=False, error=str(e), checked_at=time.time())
+        with self._lock:
+            self._entries[base_url] = health
+        return health
+
+    def _refresh_in_background(self, base_url: str) -> None:
+        with self._lock:
+            if base_url in self._refreshing:
+                return
+            self._refreshing.add(base_url)
+
+        def refresh() -> None:
+            try:
+                self.probe(base_url)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(base_url)
+
+        threading.Thread(target=refresh, name="model-catalog-refresh", daemon=True).start()
+
+    def get_health(self, server_address: str) -> ServerHealth:
+        """
+        Return the cached health of a server. Stale entries are returned immediately and
+        refreshed in the background; unknown servers are probed synchronously.
+        """
+        base_url = native_api_url(server_address)
+        with self._lock:
+            entry = self._entries.get(base_url)
+        if entry is None:
+            return self.probe(base_url)
+        if time.time() - entry.checked_at > self.ttl:
+            self._refresh_in_background(base_url)
+        return entry
+
+    def cached_health(self, server_address: str) -> Optional[ServerHealth]:
+        """
+        Like ``get_health`` but never blocks: unknown servers return None and are
+        probed in the background, for callers running on an event loop.
+        """
+        base_url = native_api_url(server_address)
+        with self._lock:
+            entry = self._entries.get(base_url)
+        if entry is None or time.time() - entry.checked_at > self.ttl:
+            self._refresh_in_background(base_url)
+        return entry
+
+    def get_models(self, server_address: str) -> List[str]:
+        """Names of the models available on a server (empty if it is unreachable)."""
+        return list(self.get_health(server_address).models)
+
+    def known_servers(self) -> List[ServerHealth]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def invalidate(self, server_address: Optional[str] = None) -> None:
+        with self._lock:
+            if server_address is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(native_api_url(server_address), None)
+
+
+_catalog: Optional[ModelCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_model_catalog() -> ModelCatalog:
+    """Return the process-wide model catalog."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog()
+        return _catalog
@@ -2,15 +2,218 @@
 """
 Micro-library for OpenAI/Ollama chat completions using OpenAI >=1.0 syntax.
 Additional Ollama compatibility with custom base_url
+
+Clients are pooled: one ``OpenAI`` client (and therefore one keep-alive HTTP
+connection pool) is created per ``(base_url, api_key)`` pair and reused by every
+agent in the process. Pool limits and timeouts can be tuned through
+``configure_client_pool`` or the ``OLLAMA_*`` environment variables below.
+
+The SDK's own retries are disabled; every request goes through
+``agents.resilience`` instead, which retries per error class with backoff and
+jitter, honours per-request deadlines and trips a per-server circuit breaker.
+A comma-separated ``server_address`` (or OLLAMA_SERVERS) spreads requests over a
+pool of servers with failover; see ``agents.server_pool``. Requests to each server
+are queued by ``agents.scheduler``, which favours interactive work and batches
+requests for the same model together.
 """
-from typing import Iterable, Any, Optional
+import asyncio
+import os
+import threading
+import weakref
+from contextlib import ExitStack
+from typing import Callable, Dict, Iterable, Iterator, Any, List, Optional, Sequence, Tuple
+import httpx
 from openai.types.chat import ChatCompletionMessageParam
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+from . import metrics
+from .resilience import call_with_retries, call_with_retries_async
+from .response_cache import get_response_cache
+from .scheduler import get_scheduler
+from .server_pool import get_server_pool
+
+DEFAULT_BASE_URL = "http://localhost:11434/v1"
+DEFAULT_API_KEY = "ollama"  # required, but unused for Ollama
+
+# Pool settings, overridable via environment or configure_client_pool()
+_pool_settings: Dict[str, float] = {
+    "max_connections": int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "32")),
+    "max_keepalive_connections": int(os.environ.get("OLLAMA_MAX_KEEPALIVE", "16")),
+    "keepalive_expiry": float(os.environ.get("OLLAMA_KEEPALIVE_EXPIRY", "60")),
+    "connect_timeout": float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5")),
+    "read_timeout": float(os.environ.get("OLLAMA_READ_TIMEOUT", "600")),
+}
+
+_clients: Dict[Tuple[str, str], OpenAI] = {}
+_clients_lock = threading.Lock()
+
+# Async clients are bound to the event loop that created their connections,
+# so they are pooled per running loop and dropped together with it.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+
+
+def normalize_base_url(server_address: Optional[str]) -> str:
+    """Return an OpenAI-compatible base URL ('.../v1') for an Ollama server address."""
+    if not server_address:
+        server_address = os.environ.get("OLLAMA_SERVER", DEFAULT_BASE_URL)
+    base_url = server_address.rstrip("/")
+    if not base_url.endswith("/v1"):
+        base_url += "/v1"
+    return base_url
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(_pool_settings["max_connections"]),
+        max_keepalive_connections=int(_pool_settings["max_keepalive_connections"]),
+        keepalive_expiry=_pool_settings["keepalive_expiry"],
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        _pool_settings["read_timeout"],
+        connect=_pool_settings["connect_timeout"],
+    )
+
+
+def configure_client_pool(
+    max_connections: Optional[int] = None,
+    max_keepalive_connections: Optional[int] = None,
+    keepalive_expiry: Optional[float] = None,
+    connect_timeout: Optional[float] = None,
+    read_timeout: Optional[float] = None,
+) -> None:
+    """
+    Update connection pool limits and timeouts for pooled clients.
+    Existing clients are closed so the next call picks up the new settings.
+    """
+    updates = {
+        "max_connections": max_connections,
+        "max_keepalive_connections": max_keepalive_connections,
+        "keepalive_expiry": keepalive_expiry,
+        "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout,
+    }
+    with _clients_lock:
+        for key, value in updates.items():
+            if value is not None:
+                _pool_settings[key] = value
+    close_clients()
+
+
+def get_client(server_address: Optional[str] = None, api_key: Optional[str] = None) -> OpenAI:
+    """
+    Return the shared OpenAI client for a server, creating it on first use.
+    Args:
+        server_address (str, optional): Ollama server address, with or without the '/v1' suffix.
+        api_key (str, optional): API key; defaults to OLLAMA_API_KEY or 'ollama'.
+    Returns:
+        A pooled ``OpenAI`` client backed by a keep-alive ``httpx.Client``.
+    """
+    base_url = normalize_base_url(server_address)
+    api_key = api_key or os.environ.get("OLLAMA_API_KEY", DEFAULT_API_KEY)
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                timeout=_http_timeout(),
+                max_retries=0,  # retried by agents.resilience
+                http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout()),
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_client(server_address: Optional[str] = None, api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for a server on the running event loop.
+    Must be called from within a coroutine.
+    """
+    base_url = normalize_base_url(server_address)
+    api_key = api_key or os.environ.get("OLLAMA_API_KEY", DEFAULT_API_KEY)
+    key = (base_url, api_key)
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                timeout=_http_timeout(),
+                max_retries=0,  # retried by agents.resilience
+                http_client=httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout()),
+            )
+            loop_clients[key] = client
+        return client
+
+
+def close_clients() -> None:
+    """Close and forget every pooled synchronous client."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def close_async_clients() -> None:
+    """Close and forget the pooled async clients of the running event loop."""
+    with _clients_lock:
+        loop_clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in loop_clients.values():
+        await client.close()
+
+
+def _request_options(
+    kwargs: Dict[str, Any], timeout: Optional[float], keep_alive: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Request parameters with the per-attempt timeout left before the deadline, if any,
+    and the scheduler's keep_alive hint (an Ollama extension, sent in the request body).
+    """
+    if keep_alive is not None:
+        kwargs = dict(kwargs, extra_body={"keep_alive": keep_alive, **(kwargs.get("extra_body") or {})})
+    if timeout is None:
+        return kwargs
+    if kwargs.get("timeout") is not None:
+        timeout = min(timeout, kwargs["timeout"])
+    return dict(kwargs, timeout=timeout)
+
+
+class _ScheduledStream:
+    """A response stream that gives its scheduler slot back when it is closed."""
+
+    def __init__(self, stream: Any, release: Callable[[], Any]) -> None:
+        self._stream = stream
+        self._release: Optional[Callable[[], Any]] = release
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._stream)
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
 
 def get_chat_response(
     model: str,
     messages: Iterable[ChatCompletionMessageParam],
     server_address: Optional[str] = None,
+    api_key: Optional[str] = None,
+    cache: Optional[bool] = None,
+    max_retries: Optional[int] = None,
+    deadline: Optional[float] = None,
     **kwargs
 ) -> Any:
     """
@@ -19,18 +222,183 @@ def get_chat_response(
         model (str): The model name (e.g., 'deepseek-r1:1.5b').
         messages (Iterable[ChatCompletionMessageParam]): List of message dicts (role/content pairs).
         server_address (str, optional): Ollama server base URL (e.g., 'http://localhost:11434').
+        api_key (str, optional): API key for the server (ignored by Ollama).
+        cache (bool, optional): True to cache even with a non-zero temperature, False to skip the cache.
+        max_retries (int, optional): Retries for transient errors; defaults to OLLAMA_MAX_RETRIES (2).
+        deadline (float, optional): Seconds the call may take in total, retries and backoff included.
         **kwargs: Additional parameters (temperature, max_tokens, etc).
     Returns:
         The full response object (not just the text).
     """
-    base_url = (server_address.rstrip("/") + "/v1") if server_address else "http://localhost:11434/v1"
-    client = OpenAI(
-        base_url=base_url,
-        api_key="ollama"  # required, but unused for Ollama
-    )
-    response = client.chat.completions.create(
-        model=model,
-        messages=list(messages),
-        **kwargs
-    )
+    messages = list(messages)
+    response_cache = get_response_cache()
+    cache_key = response_cache.lookup_key(model, messages, kwargs, cache)
+    if cache_key is not None:
+        cached = response_cache.get(cache_key)
+        metrics.record_cache_lookup(model, cached is not None)
+        if cached is not None:
+            return cached
+
+    def request(base_url: str, timeout: Optional[float]) -> Any:
+        scheduler = get_scheduler()
+        with scheduler.slot(base_url, model, timeout) as remaining, metrics.track_request(model, base_url) as record:
+            response = get_client(base_url, api_key).chat.completions.create(
+                model=model,
+                messages=messages,
+                **_request_options(kwargs, remaining, scheduler.keep_alive_hint(base_url, model))
+            )
+            record.set_usage(response.usage)
+            return response
+
+    pool = get_server_pool(server_address)
+    if pool is not None:
+        response = pool.call(request, model, max_retries, deadline)
+    else:
+        base_url = normalize_base_url(server_address)
+        response = call_with_retries(lambda timeout: request(base_url, timeout), base_url, max_retries, deadline)
+    if cache_key is not None:
+        response_cache.set(cache_key, response)
+    return response
+
+
+def get_embeddings(
+    model: str,
+    texts: Sequence[str],
+    server_address: Optional[str] = None,
+    api_key: Optional[str] = None,
+    batch_size: int = 32,
+    max_retries: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> List[List[float]]:
+    """
+    Embed ``texts`` with Ollama's OpenAI-compatible embeddings endpoint, sending
+    ``batch_size`` texts per request (``deadline`` applies to each request).
+    Returns one vector per text, in order.
+    """
+    texts = list(texts)
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), max(1, batch_size)):
+        batch = texts[start:start + max(1, batch_size)]
+
+        def request(base_url: str, timeout: Optional[float], batch: List[str] = batch) -> Any:
+            scheduler = get_scheduler()
+            with scheduler.slot(base_url, model, timeout) as remaining, metrics.track_request(model, base_url) as record:
+                response = get_client(base_url, api_key).embeddings.create(
+                    model=model, input=batch, **_request_options({}, remaining)
+                )
+                record.set_usage(response.usage)
+                return response
+
+        pool = get_server_pool(server_address)
+        if pool is not None:
+            response = pool.call(request, model, max_retries, deadline)
+        else:
+            base_url = normalize_base_url(server_address)
+            response = call_with_retries(lambda timeout: request(base_url, timeout), base_url, max_retries, deadline)
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return vectors
+
+
+def stream_chat_response(
+    model: str,
+    messages: Iterable[ChatCompletionMessageParam],
+    server_address: Optional[str] = None,
+    api_key: Optional[str] = None,
+    max_retries: Optional[int] = None,
+    deadline: Optional[float] = None,
+    **kwargs
+) -> Iterator[str]:
+    """
+    Streams a chat completion, yielding text deltas as the server produces them.
+    Streaming requests always bypass the response cache. Opening the stream is
+    retried like ``get_chat_response``; once text has been yielded, errors are raised.
+    """
+    messages = list(messages)
+    records: List[metrics.CallRecord] = []
+
+    def open_stream(base_url: str, timeout: Optional[float]) -> Any:
+        # The slot and the call record are held until the stream is closed, not just while it is opened
+        scheduler = get_scheduler()
+        with ExitStack() as stack:
+            remaining = stack.enter_context(scheduler.slot(base_url, model, timeout))
+            records.append(stack.enter_context(metrics.track_request(model, base_url, current=False)))
+            stream = get_client(base_url, api_key).chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                **_request_options(kwargs, remaining, scheduler.keep_alive_hint(base_url, model))
+            )
+            return _ScheduledStream(stream, stack.pop_all().close)
+
+    pool = get_server_pool(server_address)
+    if pool is not None:
+        stream = pool.stream(open_stream, model, max_retries, deadline)
+    else:
+        base_url = normalize_base_url(server_address)
+        stream = call_with_retries(lambda timeout: open_stream(base_url, timeout), base_url, max_retries, deadline)
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                records[-1].set_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                records[-1].chunk()
+                yield chunk.choices[0].delta.content
+    except GeneratorExit:
+        if records:
+            records[-1].outcome = "cancelled"  # the consumer stopped reading early
+        raise
+    except BaseException:
+        # A pool opens its stream lazily, so failures while opening it arrive before any record exists
+        if records:
+            records[-1].outcome = "error"
+        raise
+    finally:
+        stream.close()
+
+
+async def get_chat_response_async(
+    model: str,
+    messages: Iterable[ChatCompletionMessageParam],
+    server_address: Optional[str] = None,
+    api_key: Optional[str] = None,
+    cache: Optional[bool] = None,
+    max_retries: Optional[int] = None,
+    deadline: Optional[float] = None,
+    **kwargs
+) -> Any:
+    """
+    Async counterpart of ``get_chat_response`` using a pooled ``AsyncOpenAI`` client.
+    Many calls can be awaited concurrently from a single event loop.
+    Returns:
+        The full response object (not just the text).
+    """
+    messages = list(messages)
+    response_cache = get_response_cache()
+    cache_key = response_cache.lookup_key(model, messages, kwargs, cache)
+    if cache_key is not None:
+        cached = response_cache.get(cache_key)
+        metrics.record_cache_lookup(model, cached is not None)
+        if cached is not None:
+            return cached
+
+    async def request(base_url: str, timeout: Optional[float]) -> Any:
+        scheduler = get_scheduler()
+        async with scheduler.slot_async(base_url, model, timeout) as remaining:
+            with metrics.track_request(model, base_url) as record:
+                response = await get_async_client(base_url, api_key).chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **_request_options(kwargs, remaining, scheduler.keep_alive_hint(base_url, model))
+                )
+                record.set_usage(response.usage)
+                return response
+
+    pool = get_server_pool(server_address)
+    if pool is not None:
+        response = await pool.call_async(request, model, max_retries, deadline)
+    else:
+        base_url = normalize_base_url(server_address)
+        response = await call_with_retries_async(lambda timeout: request(base_url, timeout), base_url, max_retries, deadline)
+    if cache_key is not None:
+        response_cache.set(cache_key, response)
     return response
@@ -0,0 +1,240 @@
+# agents/phi_scanner.py
+"""
+Local PHI pre-scanner run before the sanitize and validate agents call the model.
+
+Entities with a fixed shape (emails, phone numbers, SSNs, dates, MRNs and other
+record numbers, IPs, URLs, street addresses) are found by one compiled regex
+alternation in a single pass and redacted locally as ``[LABEL]``. Anything that
+could be a name or a place is marked for review: dictionary names and places,
+capitalised words after "Dr." or "Patient", and every capitalised word that does
+not start a sentence. The dictionaries can never be complete, so a name like
+"Olusegun Adeyemi" or a town like "Springfield" is caught by its capital letter.
+Only text without review spans (no spans at all, or only redactions) is finished
+locally; everything else still goes to the model.
+
+Dictionary terms are matched on word tokens. Each token, and each phrase of up
+to the longest term's length starting there, is looked up in a dict, which
+gives the single linear pass of an Aho-Corasick automaton with the inner loop
+in C. Names and places only match capitalised words, so "may" or "will" in
+running text don't trigger a review. Extra terms are loaded from
+PHI_NAMES_FILE and PHI_LOCATIONS_FILE (one term per line).
+"""
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+_MONTH = r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+_STREET = r"(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Place|Pl|Way|Terrace|Parkway|Pkwy)"
+
+# Redacted locally. Order matters: at one position the first alternative that matches wins.
+REDACT_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ("EMAIL", r"(?<![\w.%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"),
+    ("URL", r"(?:https?://|www\.)[^\s<>\"]+"),
+    ("SSN", r"\b\d{3}-\d{2}-\d{4}\b"),
+    ("MRN", r"(?i:\b(?:MRN|medical record(?: number| no\.?)?|patient id|chart(?: number| no\.?)?))[\s:#.]*[A-Z]{0,3}\d[\dA-Z-]{3,}\b"),
+    ("ACCOUNT", r"(?i:\b(?:account|acct|policy|member id|insurance id)(?: number| no\.?)?)[\s:#.]*[A-Z]{0,3}\d[\dA-Z-]{3,}\b"),
+    ("CARD", r"\b\d{4}[ -]\d{4}[ -]\d{4}[ -]\d{4}\b"),
+    ("IP", r"\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b"),
+    ("DATE", rf"\b\d{{4}}-\d{{2}}-\d{{2}}\b|\b\d{{1,2}}[/.-]\d{{1,2}}[/.-](?:\d{{4}}|\d{{2}})\b"
+             rf"|\b{_MONTH}\.? \d{{1,2}}(?:st|nd|rd|th)?,? \d{{4}}\b|\b\d{{1,2}} {_MONTH}\.? \d{{4}}\b"),
+    ("PHONE", r"(?<![\w-])(?:\+?1[ .-]?)?(?:\(\d{3}\) ?|\d{3}[ .-])\d{3}[ .-]\d{4}\b"),
+    ("ADDRESS", rf"\b\d{{1,6}} (?:[A-Z][a-z]+ ){{1,3}}{_STREET}\b\.?"),
+    ("ZIP", r"\b\d{5}-\d{4}\b"),
+)
+
+# Marked for review by the model; these may or may not identify someone.
+REVIEW_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ("NAME", r"\b(?:Dr|Mr|Mrs|Ms|Miss|Prof)\.? [A-Z][a-z'-]+(?: [A-Z][a-z'-]+)?"),
+    ("NAME", r"(?i:\b(?:patient|name|seen by|referred by|mother|father|spouse)\b)[:\s]+(?!(?:Dr|Mr|Mrs|Ms|Miss|Prof)\b)[A-Z][a-z'-]+(?: [A-Z][a-z'-]+)*"),
+    ("AGE", r"(?i:\b(?:9\d|1[01]\d)[- ](?:years?|yrs?)[- ]old\b)"),
+)
+
+DEFAULT_NAMES = (
+    "James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas", "Charles",
+    "Christopher", "Daniel", "Matthew", "Anthony", "Mark", "Donald", "Steven", "Paul", "Andrew", "Joshua",
+    "Kenneth", "Kevin", "Brian", "George", "Edward", "Ronald", "Timothy", "Jason", "Jeffrey", "Ryan",
+    "Mary", "Patricia", "Jennifer", "Linda", "Elizabeth", "Barbara", "Susan", "Jessica", "Sarah", "Karen",
+    "Nancy", "Lisa", "Betty", "Margaret", "Sandra", "Ashley", "Kimberly", "Emily", "Donna", "Michelle",
+    "Dorothy", "Carol", "Amanda", "Melissa", "Deborah", "Stephanie", "Rebecca", "Sharon", "Laura", "Cynthia",
+    "Maria", "Jose", "Juan", "Carlos", "Luis", "Ana", "Wei", "Mohammed", "Ahmed", "Fatima", "Priya", "Raj",
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Taylor", "Moore", "Jackson", "Martin", "Lee",
+    "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Walker",
+    "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores", "Green",
+    "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Roberts", "Patel",
+)
+
+DEFAULT_LOCATIONS = (
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware", "Florida",
+    "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine",
+    "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska",
+    "Nevada", "New Hampshire", "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio",
+    "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas",
+    "Utah", "Vermont", "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming",
+    "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego", "Dallas",
+    "San Jose", "Austin", "Jacksonville", "San Francisco", "Seattle", "Denver", "Boston", "Detroit", "Nashville",
+    "Baltimore", "Atlanta", "Miami", "Minneapolis", "Cleveland", "Pittsburgh", "St. Louis", "New Orleans",
+    "London", "Toronto", "Sydney", "Paris", "Berlin", "Mumbai", "Delhi", "Beijing", "Shanghai", "Tokyo",
+)
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*")
+# Runs of capitalised words, e.g. "St. Louis" or "Patient John Smith"; dictionary terms are looked up only inside these
+_CAPITALISED_RUN_RE = re.compile(r"\b[A-Z][A-Za-z'-]*(?:\.?[ \t]+[A-Z][A-Za-z'-]*)*")
+# Record fields whose values are free-text names or addresses; these always go to the model
+_IDENTIFYING_FIELD_RE = re.compile(
+    r"name|addr|street|city|town|county|location|contact|guardian|emergency|employer|physician|doctor|provider|relative",
+    re.IGNORECASE,
+)
+# Characters that may sit between a sentence end and the next sentence's first word
+_SENTENCE_LEAD = " \t\r\"'([{*\u2022-"
+# Every redaction pattern needs a digit, an @ or a web address, so text without any skips that regex
+_REDACT_TRIGGER_RE = re.compile(r"[\d@]|www\.|https?:")
+
+
+class PhiSpan(BaseModel):
+    start: int
+    end: int
+    label: str
+    text: str
+    redact: bool  # False: left in place for the model to review
+
+
+class PhiScan(BaseModel):
+    text: str  # the input with every redacted span replaced by [LABEL]
+    spans: List[PhiSpan]  # offsets into the original input
+
+    @property
+    def clean(self) -> bool:
+        return not self.spans
+
+    @property
+    def needs_review(self) -> bool:
+        return any(not span.redact for span in self.spans)
+
+    @property
+    def review_terms(self) -> List[str]:
+        return list(dict.fromkeys(span.text for span in self.spans if not span.redact))
+
+
+def is_identifying_field(name: str) -> bool:
+    """Whether a record field (e.g. "patient_name", "City") holds names or addresses rather than free text."""
+    return bool(_IDENTIFYING_FIELD_RE.search(name))
+
+
+def _starts_sentence(text: str, position: int) -> bool:
+    while position > 0 and text[position - 1] in _SENTENCE_LEAD:
+        position -= 1
+    return position == 0 or text[position - 1] in ".!?:;\n"
+
+
+def load_terms(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class PhiScanner:
+    def __init__(self, names: Iterable[str] = DEFAULT_NAMES, locations: Iterable[str] = DEFAULT_LOCATIONS) -> None:
+        # Every pattern starts a word, so the leading lookbehind rejects most positions before any alternative runs
+        self._redact_re = re.compile(
+            r"(?<!\w)(?:" + "|".join(f"(?P<{label}>{pattern})" for label, pattern in REDACT_PATTERNS) + ")"
+        )
+        # Review labels repeat, so their groups are numbered instead of named after the label
+        self._review_re = re.compile(
+            r"(?<!\w)(?=[A-Za-z9])(?:" + "|".join(f"(?P<r{i}>{pattern})" for i, (_, pattern) in enumerate(REVIEW_PATTERNS)) + ")"
+        )
+        self._terms: Dict[Tuple[str, ...], str] = {}
+        self._max_words = 1
+        self.add_terms(names, "NAME")
+        self.add_terms(locations, "LOCATION")
+
+    def add_terms(self, terms: Iterable[str], label: str) -> None:
+        for term in terms:
+            words = tuple(word.lower() for word in _WORD_RE.findall(term))
+            if words:
+                self._terms.setdefault(words, label)
+                self._max_words = max(self._max_words, len(words))
+
+    def _dictionary_spans(self, text: str) -> Iterable[PhiSpan]:
+        for run in _CAPITALISED_RUN_RE.finditer(text):
+            words = [(m.start(), m.end(), m.group().lower()) for m in _WORD_RE.finditer(run.group())]
+            i = 0
+            while i < len(words):
+                # Longest phrase first, so "New York" wins over "York"
+                for length in range(min(self._max_words, len(words) - i), 0, -1):
+                    label = self._terms.get(tuple(word for _, _, word in words[i:i + length]))
+                    if label is not None:
+                        start, end = run.start() + words[i][0], run.start() + words[i + length - 1][1]
+                        yield PhiSpan(start=start, end=end, label=label, text=text[start:end], redact=False)
+                        i += length
+                        break
+                else:
+                    i += 1
+
+    @staticmethod
+    def _capitalised_spans(text: str) -> Iterable[PhiSpan]:
+        """Runs of capitalised words, unless the run is a single word starting a sentence (or "I") or a placeholder."""
+        for run in _CAPITALISED_RUN_RE.finditer(text):
+            word = run.group()
+            if " " not in word and "\t" not in word and (word == "I" or _starts_sentence(text, run.start())):
+                continue
+            if text[run.start() - 1:run.start()] == "[" and text[run.end():run.end() + 1] == "]":
+                continue  # a placeholder from an earlier redaction, e.g. "[NAME]"
+            yield PhiSpan(start=run.start(), end=run.end(), label="CAPITALISED", text=word, redact=False)
+
+    def scan(self, text: str) -> PhiScan:
+        """Find PHI candidates in ``text``; redactions take precedence over overlapping review spans."""
+        spans = []
+        if _REDACT_TRIGGER_RE.search(text):
+            spans = [
+                PhiSpan(start=m.start(), end=m.end(), label=m.lastgroup or "PHI", text=m.group(), redact=True)
+                for m in self._redact_re.finditer(text)
+            ]
+        for m in self._review_re.finditer(text):
+            label = REVIEW_PATTERNS[int((m.lastgroup or "r0")[1:])][0]
+            spans.append(PhiSpan(start=m.start(), end=m.end(), label=label, text=m.group(), redact=False))
+        spans.extend(self._dictionary_spans(text))
+        spans.extend(self._capitalised_spans(text))
+        if not spans:
+            return PhiScan(text=text, spans=[])
+        spans.sort(key=lambda span: (span.start, not span.redact, -span.end))
+        kept: List[PhiSpan] = []
+        for span in spans:
+            if kept and span.start < kept[-1].end:
+                if not span.redact or kept[-1].redact:
+                    continue
+                # A redaction cuts short the review span it overlaps; what precedes it is still reviewed
+                head = text[kept[-1].start:span.start].rstrip()
+                if any(c.isalnum() for c in head):
+                    kept[-1] = kept[-1].model_copy(update={"end": kept[-1].start + len(head), "text": head})
+                else:
+                    kept.pop()
+            kept.append(span)
+        parts = []
+        position = 0
+        for span in kept:
+            if span.redact:
+                parts.append(text[position:span.start])
+                parts.append(f"[{span.label}]")
+                position = span.end
+        parts.append(text[position:])
+        return PhiScan(text="".join(parts), spans=kept)
+
+
+_scanner: Optional[PhiScanner] = None
+_scanner_lock = threading.Lock()
+
+
+def get_phi_scanner() -> PhiScanner:
+    """The process-wide scanner, with the terms from PHI_NAMES_FILE and PHI_LOCATIONS_FILE added to the defaults."""
+    global _scanner
+    with _scanner_lock:
+        if _scanner is None:
+            scanner = PhiScanner()
+            for variable, label in (("PHI_NAMES_FILE", "NAME"), ("PHI_LOCATIONS_FILE", "LOCATION")):
+                if os.environ.get(variable):
+                    scanner.add_terms(load_terms(os.environ[variable]), label)
+            _scanner = scanner
+        return _scanner
@@ -0,0 +1,243 @@
+# agents/pipeline.py
+"""
+Stage pipeline for chaining agents over many items (e.g. article sections).
+
+Each item flows through the stages in order, and every stage works on whichever
+items are ready, so stage N can process item 1 while stage N-1 is still on item 2.
+Per-stage concurrency bounds how many items a stage handles at once. Events are
+yielded on the caller's thread, which keeps the pipeline usable from Streamlit
+(where UI calls must stay on the script thread) as well as from batch jobs.
+"""
+import heapq
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from pydantic import BaseModel
+
+from . import metrics
+
+
+class PipelineStage(BaseModel):
+    name: str
+    run: Callable[[Any], Any]
+    max_concurrency: int = 1
+
+    model_config = {
+        "arbitrary_types_allowed": True
+    }
+
+
+class StageTiming(BaseModel):
+    stage: str
+    item: Optional[int] = None  # None for stages that run over the whole batch
+    started: float  # seconds since the pipeline started
+    finished: float
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+class StageEvent(BaseModel):
+    item: int
+    stage: str
+    output: Any = None
+    error: Optional[str] = None
+    timing: StageTiming
+    final: bool = False  # True when this was the item's last stage (or it failed)
+
+
+class PipelineResult(BaseModel):
+    outputs: List[Any]
+    errors: Dict[int, str] = {}
+    timings: List[StageTiming] = []
+    elapsed: float = 0.0
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Total busy time per stage, in seconds."""
+        totals: Dict[str, float] = {}
+        for timing in self.timings:
+            totals[timing.stage] = totals.get(timing.stage, 0.0) + timing.duration
+        return totals
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[PipelineStage]) -> None:
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        self.stages = list(stages)
+
+    @classmethod
+    def from_agents(
+        cls,
+        agent_manager: Any,
+        stages: Iterable[Tuple[str, str, Callable[[Any, Any], Any]]],
+        max_concurrency: int = 1,
+    ) -> "Pipeline":
+        """
+        Build a pipeline from (stage name, agent name, call) triples, where ``call``
+        receives the agent from ``agent_manager`` and the stage input.
+        """
+        built = []
+        for stage_name, agent_name, call in stages:
+            agent = agent_manager.get_agent(agent_name)
+            built.append(PipelineStage(
+                name=stage_name,
+                run=lambda value, agent=agent, call=call: call(agent, value),
+                max_concurrency=max_concurrency,
+            ))
+        return cls(built)
+
+    def run_iter(self, items: Iterable[Any]) -> Iterator[StageEvent]:
+        """Run every item through the stages, yielding an event as each stage finishes an item."""
+        items = list(items)
+        start = time.perf_counter()
+        # Per-stage heaps of (item index, input): earlier items are served first
+        ready: List[List[Tuple[int, Any]]] = [[] for _ in self.stages]
+        ready[0] = list(enumerate(items))
+        running = [0] * len(self.stages)
+        in_flight: Dict[Future, Tuple[int, int, float]] = {}
+        workers = sum(max(1, stage.max_concurrency) for stage in self.stages)
+        root = metrics.start_span("pipeline", stages=",".join(stage.name for stage in self.stages), items=len(items))
+        try:
+            yield from self._schedule(items, start, ready, running, in_flight, workers, root)
+        finally:
+            metrics.end_span(root)
+
+    @staticmethod
+    def _run_stage(stage: PipelineStage, value: Any, item: int, root: Any) -> Any:
+        # Runs on a worker thread; chat calls made by the stage nest under its span
+        with metrics.span(f"pipeline.{stage.name}", parent=root, stage=stage.name, item=item):
+            return stage.run(value)
+
+    def _schedule(
+        self,
+        items: List[Any],
+        start: float,
+        ready: List[List[Tuple[int, Any]]],
+        running: List[int],
+        in_flight: Dict[Future, Tuple[int, int, float]],
+        workers: int,
+        root: Any,
+    ) -> Iterator[StageEvent]:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while in_flight or any(ready):
+                # Later stages first, so finished work drains before new work starts
+                for index in reversed(range(len(self.stages))):
+                    stage = self.stages[index]
+                    while ready[index] and running[index] < max(1, stage.max_concurrency):
+                        item, value = heapq.heappop(ready[index])
+                        future = executor.submit(self._run_stage, stage, value, item, root)
+                        in_flight[future] = (index, item, time.perf_counter() - start)
+                        running[index] += 1
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: in_flight[f][1]):
+                    index, item, started = in_flight.pop(future)
+                    running[index] -= 1
+                    timing = StageTiming(
+                        stage=self.stages[index].name, item=item,
+                        started=started, finished=time.perf_counter() - start,
+                    )
+                    metrics.record_stage(timing.stage, timing.duration)
+                    error = future.exception()
+                    if error is not None:
+                        yield StageEvent(item=item, stage=timing.stage, error=str(error), timing=timing, final=True)
+                        continue
+                    output = future.result()
+                    last = index == len(self.stages) - 1
+                    if not last:
+                        heapq.heappush(ready[index + 1], (item, output))
+                    yield StageEvent(item=item, stage=timing.stage, output=output, timing=timing, final=last)
+
+    def run(self, items: Iterable[Any]) -> PipelineResult:
+        """Run the pipeline to completion. Items that fail keep None as output and are listed in ``errors``."""
+        items = list(items)
+        start = time.perf_counter()
+        outputs: List[Any] = [None] * len(items)
+        errors: Dict[int, str] = {}
+        timings: List[StageTiming] = []
+        for event in self.run_iter(items):
+            timings.append(event.timing)
+            if event.error is not None:
+                errors[event.item] = f"{event.stage}: {event.error}"
+            elif event.final:
+                outputs[event.item] = event.output
+        return PipelineResult(outputs=outputs, errors=errors, timings=timings, elapsed=time.perf_counter() - start)
+
+
+# --- Article writing: draft -> refine per section, then validate the whole article ---
+
+class ArticlePipelineResult(BaseModel):
+    article: str
+    sections: List[str]
+    validation: Optional[str] = None
+    errors: Dict[int, str] = {}
+    timings: List[StageTiming] = []
+    elapsed: float = 0.0
+
+
+def split_outline(outline: Optional[str]) -> List[str]:
+    """Split an outline into sections, one per non-empty line (or comma-separated entry on a single line)."""
+    if not outline:
+        return []
+    lines = [line.strip(" \t-*#") for line in outline.splitlines()]
+    sections = [line for line in lines if line]
+    if len(sections) == 1 and "," in sections[0]:
+        sections = [part.strip() for part in sections[0].split(",") if part.strip()]
+    return sections
+
+
+def build_article_pipeline(
+    agent_manager: Any,
+    topic: str,
+    outline: Optional[str],
+    server_address: Optional[str] = None,
+    model_name: Optional[str] = None,
+    max_concurrency: int = 1,
+    retriever: Any = None,
+) -> Pipeline:
+    """
+    Pipeline that drafts each outline section with 'write_article' and refines it with 'refiner'.
+    With a ``retriever`` (see ``agents.retrieval``), each draft is given the indexed passages
+    most relevant to its section.
+    """
+    def draft(agent: Any, section: Optional[str]) -> str:
+        context = retriever.context_for(f"{topic}\n{section or outline or ''}") if retriever is not None else None
+        return agent.execute(topic, outline, server_address, model_name, section=section, context=context).article
+
+    return Pipeline.from_agents(agent_manager, [
+        ("draft", "write_article", draft),
+        ("refine", "refiner",
+         lambda agent, draft: agent.execute(draft, server_address, model_name)),
+    ], max_concurrency=max_concurrency)
+
+
+def run_article_pipeline(
+    agent_manager: Any,
+    topic: str,
+    outline: Optional[str],
+    server_address: Optional[str] = None,
+    model_name: Optional[str] = None,
+    max_concurrency: int = 1,
+    validate: bool = True,
+    retriever: Any = None,
+) -> ArticlePipelineResult:
+    """Write an article section by section, refine each section as soon as it is drafted, then validate the result."""
+    sections: List[Optional[str]] = list(split_outline(outline)) or [None]  # None drafts the whole article at once
+    pipeline = build_article_pipeline(agent_manager, topic, outline, server_address, model_name, max_concurrency, retriever)
+    result = pipeline.run(sections)
+    article = "\n\n".join(section for section in result.outputs if section)
+    validation = None
+    timings = list(result.timings)
+    elapsed = result.elapsed
+    if validate and article:
+        start = time.perf_counter()
+        with metrics.span("pipeline.validate", stage="validate"):
+            validation = agent_manager.get_agent("validator").execute(topic, article, server_address, model_name)
+        timings.append(StageTiming(stage="validate", started=elapsed, finished=elapsed + time.perf_counter() - start))
+        metrics.record_stage("validate", timings[-1].duration)
+        elapsed = timings[-1].finished
+    return ArticlePipelineResult(
+        article=article, sections=[section or "" for section in result.outputs], validation=validation,
+        errors=result.errors, timings=timings, elapsed=elapsed,
+    )
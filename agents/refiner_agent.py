@@ -1,14 +1,21 @@
 # agents/refiner_agent.py
 
-from typing import Optional
+from typing import Iterator, Optional
 from .agent_base import AgentBase
-from .openai_response import get_chat_response
+from .openai_response import get_chat_response, get_chat_response_async, stream_chat_response
+from .streaming import StreamedResult
 from openai.types.chat import ChatCompletionMessageParam
 
 class RefinerAgent(AgentBase):
     def __init__(self, max_retries: int = 2, verbose: bool = True) -> None:
         super().__init__(name="RefinerAgent", max_retries=max_retries, verbose=verbose)
 
+    def _build_messages(self, text: str) -> list[ChatCompletionMessageParam]:
+        return [
+            {"role": "system", "content": "You are an expert scientific article refiner."},
+            {"role": "user", "content": f"Refine the following article:\n{text}"}
+        ]
+
     def execute(
         self,
         text: str,
@@ -16,30 +23,81 @@ class RefinerAgent(AgentBase):
         model_name: Optional[str] = None
     ) -> str:
         """Refine a scientific article using LLM."""
-        messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": "You are an expert scientific article refiner."},
-            {"role": "user", "content": f"Refine the following article:\n{text}"}
-        ]
+        messages = self._build_messages(text)
         try:
             if model_name is None:
                 model_name = "deepseek-r1:1.5b"
-            if self.verbose:
-                print(f"[RefinerAgent] Sending OpenAI request: model={model_name}, messages={messages}")
+            self.log_request(model_name, messages)
             response = get_chat_response(
                 model=model_name,
                 messages=messages,
                 server_address=server_address,
+                max_retries=self.max_retries,
                 temperature=0.3,
                 max_tokens=2049,
             )
             refined_article = response.choices[0].message.content
-            if self.verbose:
-                print(f"[RefinerAgent] OpenAI response: {refined_article}")
+            self.log_response(refined_article)
         except Exception as e:
-            import traceback
-            print(f"[RefinerAgent] Exception: {e}")
-            traceback.print_exc()
+            self.log_error(e)
             raise RuntimeError(f"[RefinerAgent] Failed to get response from OpenAI-compatible API: {e}")
         if not isinstance(refined_article, str):
             refined_article = ""
         return refined_article
+
+    async def execute_async(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> str:
+        """Refine a scientific article using LLM without blocking the event loop."""
+        messages = self._build_messages(text)
+        try:
+            if model_name is None:
+                model_name = "deepseek-r1:1.5b"
+            self.log_request(model_name, messages, "async")
+            response = await get_chat_response_async(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                max_retries=self.max_retries,
+                temperature=0.3,
+                max_tokens=2049,
+            )
+            refined_article = response.choices[0].message.content
+            self.log_response(refined_article)
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[RefinerAgent] Failed to get response from OpenAI-compatible API: {e}")
+        if not isinstance(refined_article, str):
+            refined_article = ""
+        return refined_article
+
+    def execute_stream(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> StreamedResult[str]:
+        """Refine a scientific article using LLM, streaming the refined text as it is generated."""
+        messages = self._build_messages(text)
+        if model_name is None:
+            model_name = "deepseek-r1:1.5b"
+
+        def deltas() -> Iterator[str]:
+            self.log_request(model_name, messages, "streaming")
+            try:
+                yield from stream_chat_response(
+                    model=model_name,
+                    messages=messages,
+                    server_address=server_address,
+                    max_retries=self.max_retries,
+                    temperature=0.3,
+                    max_tokens=2049,
+                )
+            except Exception as e:
+                self.log_error(e)
+                raise RuntimeError(f"[RefinerAgent] Failed to get response from OpenAI-compatible API: {e}")
+
+        return StreamedResult(deltas(), lambda refined_article: refined_article)
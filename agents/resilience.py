@@ -0,0 +1,314 @@
+# agents/resilience.py
+"""
+Retries, deadlines and circuit breaking for calls to Ollama servers.
+
+Errors are sorted into classes (connection, timeout, rate_limit, server, client)
+and each class has its own retry policy: exponential backoff with full jitter,
+capped per attempt, and never sleeping past the request's deadline. Client errors
+(bad request, unknown model) are not retried.
+
+Every server has a circuit breaker. After ``failure_threshold`` consecutive
+retryable failures it opens and calls fail immediately with CircuitOpenError
+instead of queueing more blocked threads on an overloaded server; after
+``reset_timeout`` seconds a single trial call is let through (half-open), and its
+outcome closes or re-opens the circuit.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+CONNECTION = "connection"
+TIMEOUT = "timeout"
+RATE_LIMIT = "rate_limit"
+SERVER = "server"
+CLIENT = "client"
+UNKNOWN = "unknown"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the server while its circuit breaker is open."""
+
+    def __init__(self, server_address: str, retry_in: float) -> None:
+        super().__init__(f"Circuit open for {server_address}; not sending requests for another {retry_in:.1f}s")
+        self.server_address = server_address
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's deadline passes before it could complete."""
+
+
+class RetryPolicy:
+    """Backoff for one error class: delay = uniform(0, min(max_delay, base_delay * 2**attempt))."""
+
+    def __init__(self, base_delay: float = 0.5, max_delay: float = 8.0, retry: bool = True) -> None:
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry = retry
+
+    def backoff(self, attempt: int, rng: Optional[random.Random] = None) -> float:
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return (rng or random).uniform(0, cap)
+
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    CONNECTION: RetryPolicy(base_delay=0.25, max_delay=4.0),
+    TIMEOUT: RetryPolicy(base_delay=1.0, max_delay=8.0),
+    RATE_LIMIT: RetryPolicy(base_delay=2.0, max_delay=30.0),  # Retry-After wins when the server sends one
+    SERVER: RetryPolicy(base_delay=0.5, max_delay=8.0),
+    CLIENT: RetryPolicy(retry=False),
+    UNKNOWN: RetryPolicy(retry=False),
+}
+
+# Error classes that count towards opening a server's circuit
+_BREAKER_ERRORS = {CONNECTION, TIMEOUT, RATE_LIMIT, SERVER}
+
+
+def classify_error(error: BaseException) -> str:
+    """Map an exception from the OpenAI SDK or httpx to an error class."""
+    import httpx
+    import openai
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException)):
+        return TIMEOUT
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError, ConnectionError)):
+        return CONNECTION
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMIT
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code in (408, 409):
+            return TIMEOUT
+        if error.status_code == 429:
+            return RATE_LIMIT
+        return SERVER if error.status_code >= 500 else CLIENT
+    if isinstance(error, httpx.HTTPStatusError):
+        return SERVER if error.response.status_code >= 500 else CLIENT
+    return UNKNOWN
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, server_address: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.server_address = server_address
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must be shed; otherwise let it through."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(self.server_address, max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, error_class: str) -> None:
+        with self._lock:
+            if error_class not in _BREAKER_ERRORS:
+                # The server answered; a bad request says nothing about its health
+                if self.state == self.HALF_OPEN:
+                    self.state = self.CLOSED
+                    self.failures = 0
+                self._trial_in_flight = False
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def allows_request(self) -> bool:
+        """Whether before_call would currently let a request through (without claiming a trial slot)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            return not self._trial_in_flight
+
+    def release(self) -> None:
+        """Give back a half-open trial slot when the call was cancelled before it finished."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"server_address": self.server_address, "state": self.state, "failures": self.failures}
+
+
+_settings: Dict[str, float] = {
+    "max_retries": int(os.environ.get("OLLAMA_MAX_RETRIES", "2")),
+    "failure_threshold": int(os.environ.get("OLLAMA_BREAKER_FAILURES", "5")),
+    "reset_timeout": float(os.environ.get("OLLAMA_BREAKER_RESET", "30")),
+}
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def configure_resilience(
+    max_retries: Optional[int] = None,
+    failure_threshold: Optional[int] = None,
+    reset_timeout: Optional[float] = None,
+) -> None:
+    """Change the default retry count and breaker settings; existing breakers are reset."""
+    updates = {"max_retries": max_retries, "failure_threshold": failure_threshold, "reset_timeout": reset_timeout}
+    with _breakers_lock:
+        for key, value in updates.items():
+            if value is not None:
+                _settings[key] = value
+        _breakers.clear()
+
+
+def get_circuit_breaker(server_address: str) -> CircuitBreaker:
+    """Return the breaker for a server (keyed by its normalized base URL)."""
+    breaker = _breakers.get(server_address)
+    if breaker is not None:
+        return breaker
+    with _breakers_lock:
+        breaker = _breakers.get(server_address)
+        if breaker is None:
+            breaker = _breakers[server_address] = CircuitBreaker(
+                server_address, int(_settings["failure_threshold"]), _settings["reset_timeout"],
+            )
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.server_address: breaker.snapshot() for breaker in breakers}
+
+
+def is_retryable(error: BaseException) -> bool:
+    return DEFAULT_POLICIES.get(classify_error(error), DEFAULT_POLICIES[UNKNOWN]).retry
+
+
+class RetryState:
+    """Retry count and deadline of one logical request, shared by the sync and async callers."""
+
+    def __init__(self, max_retries: Optional[int], deadline: Optional[float]) -> None:
+        self.max_retries = int(_settings["max_retries"]) if max_retries is None else max(0, max_retries)
+        self.expires_at = time.monotonic() + deadline if deadline is not None else None
+        self.attempt = 0
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None without one); raises DeadlineExceeded once it has passed."""
+        if self.expires_at is None:
+            return None
+        remaining = self.expires_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Deadline exceeded after {self.attempt + 1} attempt(s)")
+        return remaining
+
+    def delay_after(self, error: BaseException) -> float:
+        """Return how long to wait before retrying after ``error``; re-raise it when giving up."""
+        error_class = classify_error(error)
+        policy = DEFAULT_POLICIES.get(error_class, DEFAULT_POLICIES[UNKNOWN])
+        if not policy.retry or self.attempt >= self.max_retries:
+            raise error
+        delay = policy.backoff(self.attempt)
+        if error_class == RATE_LIMIT:
+            delay = max(delay, min(_retry_after(error) or 0.0, policy.max_delay))
+        if self.expires_at is not None and time.monotonic() + delay >= self.expires_at:
+            raise error  # the retry could not finish before the deadline anyway
+        self.attempt += 1
+        return delay
+
+    def fail_over(self, error: BaseException) -> None:
+        """Count an immediate retry on another server against ``max_retries``; re-raise ``error`` when none are left."""
+        if self.attempt >= self.max_retries:
+            raise error
+        self.attempt += 1
+
+
+def call_with_retries(
+    fn: Callable[[Optional[float]], T],
+    server_address: str,
+    max_retries: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> T:
+    """
+    Call ``fn(timeout)`` until it succeeds, retrying per error class.
+    ``timeout`` is the time left before ``deadline`` (None without a deadline) and
+    should be passed on as the per-attempt request timeout.
+    """
+    breaker = get_circuit_breaker(server_address)
+    state = RetryState(max_retries, deadline)
+    while True:
+        timeout = state.remaining()
+        breaker.before_call()
+        try:
+            result = fn(timeout)
+        except Exception as e:
+            error_class = classify_error(e)
+            breaker.record_failure(error_class)
+            delay = state.delay_after(e)
+            metrics.record_retry(server_address, error_class)
+        except BaseException:
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            return result
+        time.sleep(delay)
+
+
+async def call_with_retries_async(
+    fn: Callable[[Optional[float]], Awaitable[T]],
+    server_address: str,
+    max_retries: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> T:
+    """Async counterpart of ``call_with_retries``; backoff sleeps don't block the event loop."""
+    breaker = get_circuit_breaker(server_address)
+    state = RetryState(max_retries, deadline)
+    while True:
+        timeout = state.remaining()
+        breaker.before_call()
+        try:
+            result = await fn(timeout)
+        except Exception as e:
+            error_class = classify_error(e)
+            breaker.record_failure(error_class)
+            delay = state.delay_after(e)
+            metrics.record_retry(server_address, error_class)
+        except BaseException:  # cancelled
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            return result
+        await asyncio.sleep(delay)
@@ -0,0 +1,233 @@
+# agents/response_cache.py
+"""
+Content-addressed cache for chat completion responses.
+
+Responses are keyed on a hash of (model, messages, sampling params) and kept in an
+in-memory LRU tier, optionally backed by an SQLite tier that survives restarts and
+is shared between processes. Requests sampled with a non-zero temperature are not
+cached unless explicitly opted in, since repeating them is expected to give a
+different answer.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+from openai.types.chat import ChatCompletion
+
+# Request options that change transport behaviour but not the completion itself
+_NON_SEMANTIC_PARAMS = {"stream", "timeout", "extra_headers", "max_retries"}
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 512,
+        db_path: Optional[str] = None,
+        ttl: Optional[float] = 86400.0,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        cache_nondeterministic: bool = False,
+    ) -> None:
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_nondeterministic = cache_nondeterministic
+        self._memory: "OrderedDict[str, Tuple[float, ChatCompletion]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0,
+            "bypassed": 0, "stores": 0, "evictions": 0,
+        }
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_since_prune = 0
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, created REAL NOT NULL, accessed REAL NOT NULL, "
+                "size INTEGER NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def make_key(self, model: str, messages: Iterable[Any], params: Mapping[str, Any]) -> str:
+        """Hash the parts of a request that determine its completion."""
+        semantic = {k: v for k, v in params.items() if k not in _NON_SEMANTIC_PARAMS}
+        payload = json.dumps(
+            {"model": model, "messages": list(messages), "params": semantic},
+            sort_keys=True, default=str, separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup_key(
+        self,
+        model: str,
+        messages: Iterable[Any],
+        params: Mapping[str, Any],
+        cache: Optional[bool] = None,
+    ) -> Optional[str]:
+        """
+        Return the cache key for a request, or None if the request bypasses the cache.
+        cache=True opts a non-deterministic request in, cache=False opts any request out.
+        """
+        if not self.enabled or cache is False or params.get("stream"):
+            return None
+        temperature = params.get("temperature", 1.0)
+        deterministic = temperature is not None and temperature <= 0
+        if not (deterministic or cache or self.cache_nondeterministic):
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return None
+        return self.make_key(model, messages, params)
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[ChatCompletion]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT created, payload FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[0], now):
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    response = ChatCompletion.model_validate_json(row[1])
+                    self._remember(key, row[0], response)
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    return response
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, response: Any) -> None:
+        if not isinstance(response, ChatCompletion):
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            self._stats["stores"] += 1
+            if self._db is not None:
+                payload = response.model_dump_json()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, created, accessed, size, payload) VALUES (?, ?, ?, ?, ?)",
+                    (key, now, now, len(payload), payload),
+                )
+                self._db.commit()
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 64:
+                    self._prune_disk(now)
+
+    def _remember(self, key: str, created: float, response: ChatCompletion) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (created, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _prune_disk(self, now: float) -> None:
+        """Drop expired rows, then least recently used rows until under the size budget."""
+        assert self._db is not None
+        self._writes_since_prune = 0
+        evicted = 0
+        if self.ttl is not None:
+            evicted += self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,)).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_disk_bytes:
+            for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+                if total <= self.max_disk_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        self._db.commit()
+        self._stats["evictions"] += evicted
+
+    def prune(self) -> None:
+        """Apply TTL and size eviction to the disk tier now."""
+        with self._lock:
+            if self._db is not None:
+                self._prune_disk(time.time())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current tier sizes for monitoring."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _cache_from_env() -> ResponseCache:
+    ttl = os.environ.get("OLLAMA_CACHE_TTL", "86400")
+    return ResponseCache(
+        max_entries=int(os.environ.get("OLLAMA_CACHE_SIZE", "512")),
+        db_path=os.environ.get("OLLAMA_CACHE_DB") or None,
+        ttl=float(ttl) if ttl else None,
+        max_disk_bytes=int(os.environ.get("OLLAMA_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+        cache_nondeterministic=os.environ.get("OLLAMA_CACHE_NONDETERMINISTIC", "").lower() in ("1", "true", "yes"),
+    )
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache, configured from the environment on first use."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = _cache_from_env()
+    return _response_cache
+
+
+def configure_response_cache(**kwargs: Any) -> ResponseCache:
+    """Replace the process-wide response cache; accepts the ``ResponseCache`` constructor arguments."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+        _response_cache = ResponseCache(**kwargs)
+    return _response_cache
+
+
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the process-wide response cache."""
+    return get_response_cache().stats()
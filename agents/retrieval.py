@@ -0,0 +1,150 @@
+# agents/retrieval.py
+"""
+Retrieval of relevant passages for the writer and the summarizer.
+
+Documents, arXiv abstracts and web snippets are split into small passages,
+embedded in batches through Ollama and stored in a ``VectorIndex``. A query then
+returns the most similar passages that fit a token budget, so prompts carry a
+bounded amount of relevant source text instead of whole documents.
+
+The shared retriever persists its index under VECTOR_INDEX_DIR (default
+.cache/vectors) and embeds with OLLAMA_EMBED_MODEL (default nomic-embed-text).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from .openai_response import get_embeddings
+from .text_chunker import chunk_text, estimate_tokens
+
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+
+
+class Retriever:
+    def __init__(
+        self,
+        index: Any = None,
+        embed_model: Optional[str] = None,
+        server_address: Optional[str] = None,
+        passage_tokens: int = 300,
+        passage_overlap: int = 50,
+        batch_size: int = 32,
+    ) -> None:
+        from utils.vector_index import VectorIndex
+        self.embed_model = embed_model or os.environ.get("OLLAMA_EMBED_MODEL", DEFAULT_EMBED_MODEL)
+        self.index = index if index is not None else VectorIndex(model=self.embed_model)
+        self.server_address = server_address
+        self.passage_tokens = passage_tokens
+        self.passage_overlap = passage_overlap
+        self.batch_size = batch_size
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        return get_embeddings(self.embed_model, texts, self.server_address, batch_size=self.batch_size)
+
+    def add_passages(self, passages: Iterable[Tuple[str, Optional[str], Dict[str, Any]]]) -> int:
+        """Index (text, source, metadata) passages that are not indexed yet; returns how many were added."""
+        from utils.vector_index import IndexEntry, entry_id
+        entries = []
+        seen = set()
+        for text, source, metadata in passages:
+            text = text.strip()
+            id = entry_id(text, source)
+            if text and id not in seen and id not in self.index:  # only new passages cost an embedding
+                seen.add(id)
+                entries.append(IndexEntry(id=id, text=text, source=source, metadata=metadata or {}))
+        if not entries:
+            return 0
+        return self.index.add(self.embed([entry.text for entry in entries]), entries)
+
+    def add_document(self, text: str, source: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Split a document into passages and index them."""
+        chunks = chunk_text(text, self.passage_tokens, self.passage_overlap)
+        return self.add_passages(
+            (chunk, source, dict(metadata or {}, passage=number)) for number, chunk in enumerate(chunks)
+        )
+
+    def retrieve(self, query: str, k: int = 8, max_tokens: int = 1500, min_score: Optional[float] = None) -> List[Any]:
+        """Up to ``k`` passages most similar to ``query``, best first, together at most ``max_tokens`` tokens."""
+        if not len(self.index):
+            return []
+        hits = self.index.search(self.embed([query])[0], k, min_score)
+        selected = []
+        budget = max_tokens
+        for hit in hits:
+            tokens = estimate_tokens(hit.entry.text)
+            if tokens > budget:
+                continue
+            selected.append(hit)
+            budget -= tokens
+        return selected
+
+    def context_for(self, query: str, k: int = 8, max_tokens: int = 1500) -> str:
+        """Retrieved passages formatted for a prompt, or an empty string when nothing is indexed."""
+        return format_context(self.retrieve(query, k, max_tokens))
+
+    def select_relevant(self, text: str, query: str, max_tokens: int) -> str:
+        """
+        The passages of one document most relevant to ``query``, in document order and
+        within ``max_tokens``; the document is indexed in a throwaway in-memory index.
+        """
+        scratch = Retriever(
+            embed_model=self.embed_model, server_address=self.server_address,
+            passage_tokens=self.passage_tokens, passage_overlap=self.passage_overlap, batch_size=self.batch_size,
+        )
+        scratch.add_document(text)
+        hits = scratch.retrieve(query, k=len(scratch.index), max_tokens=max_tokens)
+        hits.sort(key=lambda hit: hit.entry.metadata.get("passage", 0))
+        return "\n\n".join(hit.entry.text for hit in hits)
+
+
+def format_context(hits: Sequence[Any]) -> str:
+    """Number the passages and name their sources so the model can refer to them."""
+    return "\n\n".join(
+        f"[{number}]" + (f" ({hit.entry.source})" if hit.entry.source else "") + f"\n{hit.entry.text}"
+        for number, hit in enumerate(hits, start=1)
+    )
+
+
+_retriever: Optional[Retriever] = None
+_retriever_lock = threading.Lock()
+_indexer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval-indexer")
+
+
+def get_retriever(server_address: Optional[str] = None) -> Retriever:
+    """The process-wide retriever backed by the on-disk index in VECTOR_INDEX_DIR."""
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            from utils.vector_index import VectorIndex
+            model = os.environ.get("OLLAMA_EMBED_MODEL", DEFAULT_EMBED_MODEL)
+            directory = os.environ.get("VECTOR_INDEX_DIR", os.path.join(".cache", "vectors"))
+            _retriever = Retriever(VectorIndex(directory, model), model, server_address)
+        elif server_address:
+            _retriever.server_address = server_address
+        return _retriever
+
+
+def index_in_background(retriever: Retriever, passages: Sequence[Tuple[str, Optional[str], Dict[str, Any]]]) -> None:
+    """Queue passages for indexing without holding up the caller; failures are logged, not raised."""
+    passages = list(passages)
+
+    def run() -> None:
+        try:
+            retriever.add_passages(passages)
+        except Exception as e:
+            logger.warning(f"[Retriever] Indexing {len(passages)} passages failed: {e}")
+
+    _indexer.submit(run)
+
+
+def index_document_in_background(retriever: Retriever, text: str, source: Optional[str] = None) -> None:
+    def run() -> None:
+        try:
+            retriever.add_document(text, source)
+        except Exception as e:
+            logger.warning(f"[Retriever] Indexing {source or 'document'} failed: {e}")
+
+    _indexer.submit(run)
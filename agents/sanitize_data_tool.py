@@ -1,49 +1,258 @@
 # agents/sanitize_data_agent.py
 
-from typing import Optional
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 from pydantic import BaseModel
+from . import metrics
 from .agent_base import AgentBase
-from .openai_response import get_chat_response
+from .openai_response import get_chat_response, get_chat_response_async, stream_chat_response
+from .phi_scanner import get_phi_scanner, is_identifying_field
+from .streaming import StreamedResult
+from .text_chunker import estimate_tokens
 from openai.types.chat import ChatCompletionMessageParam
 
+_THINK_RE = re.compile(r"<think>.*?(</think>|$)", re.DOTALL | re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"\[[A-Z_]+\]")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+
 class SanitizeDataResult(BaseModel):
     sanitized_data: str
 
+
+def parse_records(text: Optional[str], count: int) -> List[Dict[str, Any]]:
+    """
+    Parse a reply holding a JSON array of ``count`` objects, ignoring reasoning blocks
+    and any prose or code fences around the array. Raises ValueError otherwise.
+    """
+    text = _THINK_RE.sub("", text or "")
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        raise ValueError("reply contains no JSON array")
+    records = json.loads(text[start:end + 1])
+    if not isinstance(records, list) or len(records) != count or not all(isinstance(r, dict) for r in records):
+        raise ValueError(f"expected a JSON array of {count} objects")
+    return records
+
+def _has_free_text(text: str) -> bool:
+    """Whether any letters remain outside [LABEL] placeholders; the scanner can't rule out PHI in free text."""
+    return _LETTER_RE.search(_PLACEHOLDER_RE.sub("", text)) is not None
+
+
+def _review_note(review_terms: Sequence[str]) -> str:
+    note = "Values shown as [LABEL] are already redacted; keep them as they are."
+    if review_terms:
+        note += " Check in particular whether these identify a person or place: " + ", ".join(review_terms) + "."
+    return note + "\n"
+
+
 class SanitizeDataTool(AgentBase):
+    # Redact fixed-shape identifiers locally first. Only text with no letters left
+    # (dates, phone numbers, ids) skips the model: lowercase and informal names
+    # ("pt john smith") leave no trace the scanner could review.
+    prescan: bool = True
+
     def __init__(self, max_retries: int = 2, verbose: bool = True) -> None:
         super().__init__(name="SanitizeDataTool", max_retries=max_retries, verbose=verbose)
 
+    def _prescan(self, text: str) -> Tuple[Optional[SanitizeDataResult], str, List[str]]:
+        """
+        The result when the scanner settles ``text`` locally; otherwise None, the text with
+        the deterministic entities already redacted and the terms the model must review.
+        """
+        if not self.prescan:
+            return None, text, []
+        scan = get_phi_scanner().scan(text)
+        if not _has_free_text(scan.text):
+            metrics.record_prescan(self.name, "clean" if scan.clean else "redacted")
+            return SanitizeDataResult(sanitized_data=scan.text), scan.text, []
+        metrics.record_prescan(self.name, "review")
+        return None, scan.text, scan.review_terms
+
+    def _prescan_record(self, record: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str], bool]:
+        """
+        The record with its string values scanned, the terms to review and whether the model
+        is still needed, which it is for any value with letters left after redaction.
+        """
+        if not self.prescan:
+            return record, [], True
+        scanner = get_phi_scanner()
+        redacted: Dict[str, Any] = {}
+        review_terms: List[str] = []
+        needs_model = False
+        for key, value in record.items():
+            if isinstance(value, str):
+                scan = scanner.scan(value)
+                value = scan.text
+                review_terms += scan.review_terms
+                needs_model = needs_model or _has_free_text(value)
+                if is_identifying_field(key) and _PLACEHOLDER_RE.sub("", value).strip(" ,.;-"):
+                    review_terms.append(value)
+                    needs_model = True
+            elif isinstance(value, (dict, list)):
+                needs_model = True  # nested values are left to the model
+            redacted[key] = value
+        metrics.record_prescan(self.name, "review" if needs_model else "redacted" if redacted != record else "clean")
+        return redacted, review_terms, needs_model
+
+    def _build_messages(self, text: str, review_terms: Sequence[str] = ()) -> list[ChatCompletionMessageParam]:
+        note = _review_note(review_terms) if self.prescan else ""
+        return [
+            {"role": "system", "content": "You are an expert in data sanitization."},
+            {"role": "user", "content": f"{note}Sanitize the following data:\n{text}"}
+        ]
+
+    def _build_records_messages(
+        self, payload: str, count: int, review_terms: Sequence[str] = ()
+    ) -> list[ChatCompletionMessageParam]:
+        note = _review_note(review_terms) if self.prescan else ""
+        return [
+            {"role": "system", "content": "You are an expert in data sanitization."},
+            {"role": "user", "content": (
+                f"{note}Sanitize the following records by removing or masking personal and sensitive "
+                f"information in their values. Reply with only a JSON array of exactly {count} objects, "
+                "in the same order and with the same keys; do not add, drop or rename keys.\n"
+                f"{payload}"
+            )}
+        ]
+
+    def execute_records(
+        self,
+        records: List[Dict[str, Any]],
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Sanitize a batch of records in one request. Returns one object per record, in order;
+        raises ValueError when the reply is not a matching JSON array, so callers can retry
+        with smaller batches. Records the scanner settles locally are not sent.
+        """
+        results: List[Dict[str, Any]] = []
+        pending: List[int] = []
+        review_terms: List[str] = []
+        for index, record in enumerate(records):
+            redacted, terms, needs_model = self._prescan_record(record)
+            results.append(redacted)
+            if needs_model:
+                pending.append(index)
+                review_terms += terms
+        if not pending:
+            return results
+        payload = json.dumps([results[index] for index in pending], ensure_ascii=False)
+        messages = self._build_records_messages(payload, len(pending), list(dict.fromkeys(review_terms)))
+        try:
+            if model_name is None:
+                model_name = "deepseek-r1:1.5b"
+            self.log_request(model_name, messages, "records")
+            response = get_chat_response(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                max_retries=self.max_retries,
+                temperature=0.3,
+                max_tokens=max(2049, 2 * estimate_tokens(payload) + 512),  # room for the rewritten records
+            )
+            reply = response.choices[0].message.content
+            self.log_response(reply)
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[SanitizeDataTool] Failed to get response from OpenAI-compatible API: {e}")
+        for index, record in zip(pending, parse_records(reply, len(pending))):
+            results[index] = record
+        return results
+
     def execute(
         self,
         text: str,
         server_address: Optional[str] = None,
         model_name: Optional[str] = None
     ) -> SanitizeDataResult:
-        """Sanitize the given data using LLM."""
-        messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": "You are an expert in data sanitization."},
-            {"role": "user", "content": f"Sanitize the following data:\n{text}"}
-        ]
+        """Sanitize the given data, locally when the PHI scanner settles it, otherwise using LLM."""
+        local, text, review_terms = self._prescan(text)
+        if local is not None:
+            return local
+        messages = self._build_messages(text, review_terms)
         try:
             if model_name is None:
                 model_name = "deepseek-r1:1.5b"
-            if self.verbose:
-                print(f"[SanitizeDataTool] Sending OpenAI request: model={model_name}, messages={messages}")
+            self.log_request(model_name, messages)
             response = get_chat_response(
                 model=model_name,
                 messages=messages,
                 server_address=server_address,
+                max_retries=self.max_retries,
                 temperature=0.3,
                 max_tokens=2049,
             )
             sanitized_data = response.choices[0].message.content
-            if self.verbose:
-                print(f"[SanitizeDataTool] OpenAI response: {sanitized_data}")
+            self.log_response(sanitized_data)
         except Exception as e:
-            import traceback
-            print(f"[SanitizeDataTool] Exception: {e}")
-            traceback.print_exc()
+            self.log_error(e)
             raise RuntimeError(f"[SanitizeDataTool] Failed to get response from OpenAI-compatible API: {e}")
         if not isinstance(sanitized_data, str):
             sanitized_data = ""
         return SanitizeDataResult(sanitized_data=sanitized_data)
+
+    async def execute_async(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> SanitizeDataResult:
+        """Sanitize the given data using LLM without blocking the event loop."""
+        local, text, review_terms = self._prescan(text)
+        if local is not None:
+            return local
+        messages = self._build_messages(text, review_terms)
+        try:
+            if model_name is None:
+                model_name = "deepseek-r1:1.5b"
+            self.log_request(model_name, messages, "async")
+            response = await get_chat_response_async(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                max_retries=self.max_retries,
+                temperature=0.3,
+                max_tokens=2049,
+            )
+            sanitized_data = response.choices[0].message.content
+            self.log_response(sanitized_data)
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[SanitizeDataTool] Failed to get response from OpenAI-compatible API: {e}")
+        if not isinstance(sanitized_data, str):
+            sanitized_data = ""
+        return SanitizeDataResult(sanitized_data=sanitized_data)
+
+    def execute_stream(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> StreamedResult[SanitizeDataResult]:
+        """Sanitize the given data using LLM, streaming the sanitized text as it is generated."""
+        local, text, review_terms = self._prescan(text)
+        if local is not None:
+            return StreamedResult(iter([local.sanitized_data]), lambda sanitized_data: SanitizeDataResult(sanitized_data=sanitized_data))
+        messages = self._build_messages(text, review_terms)
+        if model_name is None:
+            model_name = "deepseek-r1:1.5b"
+
+        def deltas() -> Iterator[str]:
+            self.log_request(model_name, messages, "streaming")
+            try:
+                yield from stream_chat_response(
+                    model=model_name,
+                    messages=messages,
+                    server_address=server_address,
+                    max_retries=self.max_retries,
+                    temperature=0.3,
+                    max_tokens=2049,
+                )
+            except Exception as e:
+                self.log_error(e)
+                raise RuntimeError(f"[SanitizeDataTool] Failed to get response from OpenAI-compatible API: {e}")
+
+        return StreamedResult(deltas(), lambda sanitized_data: SanitizeDataResult(sanitized_data=sanitized_data))
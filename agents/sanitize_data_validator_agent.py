@@ -1,29 +1,52 @@
 # agents/sanitize_data_validator_agent.py
 
 from typing import Optional
-from .openai_response import get_chat_response
+from . import metrics
+from .agent_base import AgentLogMixin
+from .openai_response import get_chat_response, get_chat_response_async
+from .phi_scanner import get_phi_scanner
 from openai.types.chat import ChatCompletionMessageParam
 
-class SanitizeDataValidatorAgent:
+CLEAN_SCAN_VALIDATION = "VALID: the local PHI scan found no identifiers in the sanitized data."
+
+
+class SanitizeDataValidatorAgent(AgentLogMixin):
+    name = "SanitizeDataValidatorAgent"
+    # Opt-in: report VALID without the model when the local PHI scanner finds nothing at all,
+    # not even a capitalised word. The scanner can't prove text is free of PHI, so by default
+    # every validation goes to the model.
+    prescan = False
+
     def __init__(self, verbose: bool = True) -> None:
         self.verbose = verbose
 
+    def _scan_is_clean(self, text: str) -> bool:
+        if not self.prescan:
+            return False
+        clean = get_phi_scanner().scan(text).clean
+        metrics.record_prescan(self.name, "clean" if clean else "review")
+        return clean
+
+    def _build_messages(self, text: str) -> list[ChatCompletionMessageParam]:
+        return [
+            {"role": "system", "content": "You are an expert in data sanitization validation."},
+            {"role": "user", "content": f"Validate the following sanitized data:\n{text}"}
+        ]
+
     def execute(
         self,
         text: str,
         server_address: Optional[str] = None,
         model_name: Optional[str] = None
     ) -> str:
-        """Validate sanitized data using LLM."""
-        messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": "You are an expert in data sanitization validation."},
-            {"role": "user", "content": f"Validate the following sanitized data:\n{text}"}
-        ]
+        """Validate sanitized data using LLM, unless the local PHI scan finds nothing."""
+        if self._scan_is_clean(text):
+            return CLEAN_SCAN_VALIDATION
+        messages = self._build_messages(text)
         try:
             if model_name is None:
                 model_name = "deepseek-r1:1.5b"
-            if self.verbose:
-                print(f"[SanitizeDataValidatorAgent] Sending OpenAI request: model={model_name}, messages={messages}")
+            self.log_request(model_name, messages)
             response = get_chat_response(
                 model=model_name,
                 messages=messages,
@@ -32,12 +55,39 @@ class SanitizeDataValidatorAgent:
                 max_tokens=2049,
             )
             validation = response.choices[0].message.content
-            if self.verbose:
-                print(f"[SanitizeDataValidatorAgent] OpenAI response: {validation}")
+            self.log_response(validation)
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[SanitizeDataValidatorAgent] Failed to get response from OpenAI-compatible API: {e}")
+        if not isinstance(validation, str):
+            validation = ""
+        return validation
+
+    async def execute_async(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> str:
+        """Validate sanitized data using LLM without blocking the event loop."""
+        if self._scan_is_clean(text):
+            return CLEAN_SCAN_VALIDATION
+        messages = self._build_messages(text)
+        try:
+            if model_name is None:
+                model_name = "deepseek-r1:1.5b"
+            self.log_request(model_name, messages, "async")
+            response = await get_chat_response_async(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                temperature=0.3,
+                max_tokens=2049,
+            )
+            validation = response.choices[0].message.content
+            self.log_response(validation)
         except Exception as e:
-            import traceback
-            print(f"[SanitizeDataValidatorAgent] Exception: {e}")
-            traceback.print_exc()
+            self.log_error(e)
             raise RuntimeError(f"[SanitizeDataValidatorAgent] Failed to get response from OpenAI-compatible API: {e}")
         if not isinstance(validation, str):
             validation = ""
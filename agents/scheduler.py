@@ -0,0 +1,299 @@
+# agents/scheduler.py
+"""
+Model-affinity scheduling of requests to each Ollama server.
+
+Each server gets a fixed number of request slots (like OLLAMA_NUM_PARALLEL).
+Requests wait for a slot in a per-server queue, and when one frees up the next
+request is picked by
+
+1. priority: interactive (UI) requests before batch jobs;
+2. model affinity: a request for a model the server is already running goes
+   ahead of one that would make it load a different model, unless the latter
+   has waited longer than ``max_wait_for_switch`` seconds;
+3. arrival order.
+
+While other models are running, a request that would make the server load a
+different model is held back even if a slot is free, until it has waited
+``max_wait_for_switch`` seconds or the server goes idle. So same-model work is
+batched together instead of interleaving models and forcing Ollama to unload
+and reload them. While more requests for a model are queued, requests carry a
+``keep_alive`` hint so the model stays in memory.
+
+Priority comes from the calling context:
+
+    with request_priority(BATCH):
+        agent.execute(...)
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from . import metrics
+from .resilience import DeadlineExceeded
+
+INTERACTIVE = 0
+BATCH = 10
+
+_priority: ContextVar[int] = ContextVar("ollama_request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Run the enclosed requests (in this thread or task) at ``priority``; lower runs first."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class _Waiter:
+    __slots__ = ("model", "priority", "seq", "enqueued", "granted", "wake")
+
+    def __init__(self, model: str, priority: int, seq: int, wake: Callable[[], None]) -> None:
+        self.model = model
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.wake = wake
+
+
+class _ServerQueue:
+    def __init__(self) -> None:
+        self.in_use = 0
+        self.active_model: Optional[str] = None
+        self.running: Dict[str, int] = {}
+        self.waiters: List[_Waiter] = []
+        self.hold_timer: Optional[threading.Timer] = None
+        self.granted = 0
+        self.model_switches = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class ModelScheduler:
+    def __init__(self, slots: int = 4, max_wait_for_switch: float = 2.0, keep_alive: Optional[str] = "30m") -> None:
+        self.slots = slots
+        self.max_wait_for_switch = max_wait_for_switch
+        self.keep_alive = keep_alive
+        self._queues: Dict[str, _ServerQueue] = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def _queue(self, server: str) -> _ServerQueue:
+        queue = self._queues.get(server)
+        if queue is None:
+            queue = self._queues[server] = _ServerQueue()
+        return queue
+
+    def _is_warm(self, queue: _ServerQueue, waiter: _Waiter, now: float) -> bool:
+        """True if granting ``waiter`` needs no model switch, or it has waited long enough to force one."""
+        return (
+            queue.active_model is None
+            or waiter.model == queue.active_model
+            or queue.running.get(waiter.model, 0) > 0
+            or now - waiter.enqueued >= self.max_wait_for_switch
+        )
+
+    def _rank(self, queue: _ServerQueue, waiter: _Waiter, now: float) -> tuple:
+        return (waiter.priority, 0 if self._is_warm(queue, waiter, now) else 1, waiter.seq)
+
+    def _grant(self, queue: _ServerQueue, waiter: _Waiter, now: float) -> None:
+        queue.in_use += 1
+        queue.running[waiter.model] = queue.running.get(waiter.model, 0) + 1
+        if queue.active_model is not None and waiter.model != queue.active_model:
+            queue.model_switches += 1
+        queue.active_model = waiter.model
+        wait = now - waiter.enqueued
+        queue.granted += 1
+        queue.total_wait += wait
+        queue.max_wait = max(queue.max_wait, wait)
+        waiter.granted = True
+        waiter.wake()
+
+    def _dispatch(self, queue: _ServerQueue) -> None:
+        """Hand free slots to the best waiters. Called with the lock held."""
+        now = time.monotonic()
+        while queue.waiters and queue.in_use < self.slots:
+            waiter = min(queue.waiters, key=lambda w: self._rank(queue, w, now))
+            if queue.in_use and not self._is_warm(queue, waiter, now):
+                # Other models are running: hold the switch back until the server
+                # drains or the waiter reaches max_wait_for_switch
+                self._hold(queue, waiter.enqueued + self.max_wait_for_switch - now)
+                return
+            queue.waiters.remove(waiter)
+            self._grant(queue, waiter, now)
+
+    def _hold(self, queue: _ServerQueue, delay: float) -> None:
+        """Re-run dispatch after ``delay`` seconds unless a release does it first. Called with the lock held."""
+        if queue.hold_timer is not None:
+            return  # waiters enqueued later can only have later deadlines
+
+        def expire() -> None:
+            with self._lock:
+                queue.hold_timer = None
+                self._dispatch(queue)
+
+        queue.hold_timer = threading.Timer(max(0.0, delay), expire)
+        queue.hold_timer.daemon = True
+        queue.hold_timer.start()
+
+    def _enqueue(self, server: str, model: str, priority: Optional[int], wake: Callable[[], None]) -> _Waiter:
+        with self._lock:
+            self._seq += 1
+            waiter = _Waiter(model, current_priority() if priority is None else priority, self._seq, wake)
+            queue = self._queue(server)
+            queue.waiters.append(waiter)
+            self._dispatch(queue)
+            return waiter
+
+    def _abandon(self, server: str, waiter: _Waiter) -> bool:
+        """Take a waiter out of its queue; returns True if it had already been granted a slot."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            queue = self._queues[server]
+            queue.waiters.remove(waiter)
+            self._dispatch(queue)  # it may have been holding back the waiters behind it
+            return False
+
+    def acquire(self, server: str, model: str, timeout: Optional[float] = None, priority: Optional[int] = None) -> None:
+        """Block until a slot on ``server`` is granted; raises DeadlineExceeded after ``timeout`` seconds."""
+        event = threading.Event()
+        waiter = self._enqueue(server, model, priority, event.set)
+        try:
+            granted = event.wait(timeout)
+        except BaseException:  # interrupted while queued or just after being granted
+            if self._abandon(server, waiter):
+                self.release(server, model)
+            raise
+        if granted or self._abandon(server, waiter):
+            return
+        raise DeadlineExceeded(f"No free slot on {server} for {model} within {timeout:.1f}s")
+
+    async def acquire_async(
+        self, server: str, model: str, timeout: Optional[float] = None, priority: Optional[int] = None
+    ) -> None:
+        """Async counterpart of ``acquire``; waiting doesn't block the event loop."""
+        loop = asyncio.get_running_loop()
+        granted: asyncio.Future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = self._enqueue(server, model, priority, wake)
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(server, waiter):
+                raise DeadlineExceeded(f"No free slot on {server} for {model} within {timeout:.1f}s") from None
+        except BaseException:  # cancelled while queued or just after being granted
+            if self._abandon(server, waiter):
+                self.release(server, model)
+            raise
+
+    def release(self, server: str, model: str) -> None:
+        with self._lock:
+            queue = self._queues[server]
+            queue.in_use -= 1
+            queue.running[model] -= 1
+            if not queue.running[model]:
+                del queue.running[model]
+            self._dispatch(queue)
+
+    @contextmanager
+    def slot(self, server: str, model: str, timeout: Optional[float] = None) -> Iterator[Optional[float]]:
+        """Hold a slot for the enclosed request; yields the part of ``timeout`` left after queueing."""
+        if self.slots <= 0:
+            yield timeout
+            return
+        started = time.monotonic()
+        self.acquire(server, model, timeout)
+        metrics.record_queue_wait(server, time.monotonic() - started)
+        try:
+            yield None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+        finally:
+            self.release(server, model)
+
+    @asynccontextmanager
+    async def slot_async(self, server: str, model: str, timeout: Optional[float] = None) -> AsyncIterator[Optional[float]]:
+        if self.slots <= 0:
+            yield timeout
+            return
+        started = time.monotonic()
+        await self.acquire_async(server, model, timeout)
+        metrics.record_queue_wait(server, time.monotonic() - started)
+        try:
+            yield None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+        finally:
+            self.release(server, model)
+
+    def keep_alive_hint(self, server: str, model: str) -> Optional[str]:
+        """``keep_alive`` to send while more requests for ``model`` are queued on ``server``, else None."""
+        if not self.keep_alive:
+            return None
+        with self._lock:
+            queue = self._queues.get(server)
+            if queue is not None and any(waiter.model == model for waiter in queue.waiters):
+                return self.keep_alive
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per server: slots in use, queue depth (total and per model), wait times and model switches."""
+        now = time.monotonic()
+        with self._lock:
+            report = {}
+            for server, queue in self._queues.items():
+                depth: Dict[str, int] = {}
+                for waiter in queue.waiters:
+                    depth[waiter.model] = depth.get(waiter.model, 0) + 1
+                report[server] = {
+                    "slots": self.slots,
+                    "in_use": queue.in_use,
+                    "active_model": queue.active_model,
+                    "queue_depth": len(queue.waiters),
+                    "queued_by_model": depth,
+                    "oldest_wait_s": max((now - w.enqueued for w in queue.waiters), default=0.0),
+                    "granted": queue.granted,
+                    "mean_wait_s": queue.total_wait / queue.granted if queue.granted else 0.0,
+                    "max_wait_s": queue.max_wait,
+                    "model_switches": queue.model_switches,
+                }
+            return report
+
+
+_scheduler: Optional[ModelScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ModelScheduler:
+    """
+    Return the process-wide scheduler. OLLAMA_SCHEDULER_SLOTS sets the slots per
+    server (default 4, 0 disables queueing) and OLLAMA_KEEP_ALIVE the keep_alive hint.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ModelScheduler(
+                slots=int(os.environ.get("OLLAMA_SCHEDULER_SLOTS", "4")),
+                max_wait_for_switch=float(os.environ.get("OLLAMA_SCHEDULER_MAX_WAIT", "2")),
+                keep_alive=os.environ.get("OLLAMA_KEEP_ALIVE", "30m") or None,
+            )
+        return _scheduler
+
+
+def configure_scheduler(**kwargs: Any) -> ModelScheduler:
+    """Replace the process-wide scheduler (takes ModelScheduler's arguments)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = ModelScheduler(**kwargs)
+        return _scheduler
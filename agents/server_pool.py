@@ -0,0 +1,301 @@
+# agents/server_pool.py
+"""
+Routing of chat requests across several Ollama servers.
+
+A pool is used whenever a server address lists more than one endpoint
+("http://gpu1:11434,http://gpu2:11434"), or when no address is given and
+OLLAMA_SERVERS is set. For each request the pool picks a server by
+
+1. model placement: servers that have the model loaded in memory (/api/ps, or a
+   recent successful request for it) come first, then servers that have it
+   pulled (/api/tags), then the rest; placement comes from the shared model
+   catalog and is refreshed in the background (``call_async`` never waits for a
+   probe, so a server the catalog has not seen yet ranks as unknown there);
+2. load: fewest outstanding requests ("least_outstanding", the default) or lowest
+   latency EWMA scaled by outstanding requests ("ewma").
+
+Servers whose circuit breaker is open are skipped. A request that fails with a
+retryable error fails over to the next-best server immediately; only when every
+server has failed does it back off and retry per ``agents.resilience``. Failovers
+and retries share one ``max_retries`` budget, so a request makes at most
+``max_retries + 1`` attempts however many servers the pool has.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from . import metrics
+from .model_catalog import get_model_catalog
+from .resilience import (
+    CircuitOpenError,
+    RetryState,
+    classify_error,
+    get_circuit_breaker,
+    is_retryable,
+)
+
+T = TypeVar("T")
+
+STRATEGIES = ("least_outstanding", "ewma")
+
+
+def parse_server_addresses(server_address: Optional[str]) -> List[str]:
+    """Split a comma-separated address list; without one, use OLLAMA_SERVERS or OLLAMA_SERVER."""
+    if not server_address:
+        server_address = os.environ.get("OLLAMA_SERVERS") or os.environ.get("OLLAMA_SERVER", "")
+    return [address.strip() for address in server_address.split(",") if address.strip()]
+
+
+class _ServerState:
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.recent_models: Dict[str, float] = {}  # model -> time of the last successful request
+
+
+class ServerPool:
+    def __init__(
+        self,
+        server_addresses: Sequence[str],
+        strategy: str = "least_outstanding",
+        ewma_alpha: float = 0.3,
+        loaded_model_ttl: float = 300.0,
+    ) -> None:
+        from .openai_response import normalize_base_url
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}'; expected one of {STRATEGIES}")
+        if not server_addresses:
+            raise ValueError("A server pool needs at least one server address.")
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        # Ollama keeps a model in memory for keep_alive (5 minutes by default) after a request
+        self.loaded_model_ttl = loaded_model_ttl
+        self._servers: Dict[str, _ServerState] = {}
+        for address in server_addresses:
+            base_url = normalize_base_url(address)
+            self._servers.setdefault(base_url, _ServerState(base_url))
+        self._lock = threading.Lock()
+
+    @property
+    def servers(self) -> List[str]:
+        return list(self._servers)
+
+    def _placement(self, state: _ServerState, model: Optional[str], probe: bool = True) -> int:
+        """0 = model loaded, 1 = model available, 2 = unknown, 3 = server unreachable or model missing."""
+        if model and time.time() - state.recent_models.get(model, 0.0) < self.loaded_model_ttl:
+            return 0
+        catalog = get_model_catalog()
+        health = catalog.get_health(state.base_url) if probe else catalog.cached_health(state.base_url)
+        if health is None:
+            return 2
+        if not health.ok:
+            return 3
+        if not model or not health.models:
+            return 2
+        if model in health.loaded_models:
+            return 0
+        return 1 if model in health.models else 3
+
+    def _load(self, state: _ServerState) -> Tuple[float, float]:
+        latency = state.ewma_latency if state.ewma_latency is not None else 0.0
+        if self.strategy == "ewma":
+            return (latency * (state.outstanding + 1), state.outstanding)
+        return (state.outstanding, latency)
+
+    def choose(self, model: Optional[str] = None, exclude: Optional[Set[str]] = None, probe: bool = True) -> str:
+        """
+        Return the base URL of the best server for ``model``, skipping ``exclude`` and open circuits.
+        With ``probe=False`` placement uses only what the model catalog already knows.
+        """
+        exclude = exclude or set()
+        candidates = [
+            state for base_url, state in self._servers.items()
+            if base_url not in exclude and get_circuit_breaker(base_url).allows_request()
+        ]
+        if not candidates:
+            raise CircuitOpenError(",".join(self._servers), 0.0)
+        placements = {state.base_url: self._placement(state, model, probe) for state in candidates}
+        with self._lock:
+            return min(candidates, key=lambda state: (placements[state.base_url], self._load(state))).base_url
+
+    def _begin(self, base_url: str) -> float:
+        with self._lock:
+            self._servers[base_url].outstanding += 1
+            self._servers[base_url].requests += 1
+        return time.perf_counter()
+
+    def _end(self, base_url: str, started: float, model: Optional[str], ok: bool) -> None:
+        latency = time.perf_counter() - started
+        with self._lock:
+            state = self._servers[base_url]
+            state.outstanding -= 1
+            if not ok:
+                state.failures += 1
+                return
+            if state.ewma_latency is None:
+                state.ewma_latency = latency
+            else:
+                state.ewma_latency = self.ewma_alpha * latency + (1 - self.ewma_alpha) * state.ewma_latency
+            if model:
+                state.recent_models[model] = time.time()
+
+    def _next_server(self, model: Optional[str], tried: Set[str], probe: bool = True) -> Optional[str]:
+        """The next server to fail over to, or None once every available server has been tried."""
+        try:
+            return self.choose(model, tried, probe)
+        except CircuitOpenError:
+            return None
+
+    def call(
+        self,
+        fn: Callable[[str, Optional[float]], T],
+        model: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """
+        Call ``fn(base_url, timeout)`` on the best server, failing over to the others on
+        retryable errors and backing off once all of them have failed. Each failover
+        uses up one of the ``max_retries``.
+        """
+        state = RetryState(max_retries, deadline)
+        tried: Set[str] = set()
+        while True:
+            timeout = state.remaining()
+            base_url = self._next_server(model, tried) or self.choose(model)
+            breaker = get_circuit_breaker(base_url)
+            breaker.before_call()
+            started = self._begin(base_url)
+            try:
+                result = fn(base_url, timeout)
+            except Exception as e:
+                self._end(base_url, started, model, ok=False)
+                error_class = classify_error(e)
+                breaker.record_failure(error_class)
+                tried.add(base_url)
+                if is_retryable(e) and self._next_server(model, tried) is not None:
+                    state.fail_over(e)
+                    metrics.record_retry(base_url, error_class)
+                    continue  # fail over right away
+                delay = state.delay_after(e)
+                metrics.record_retry(base_url, error_class)
+                tried.clear()
+            except BaseException:
+                self._end(base_url, started, model, ok=False)
+                breaker.release()
+                raise
+            else:
+                self._end(base_url, started, model, ok=True)
+                breaker.record_success()
+                return result
+            time.sleep(delay)
+
+    async def call_async(
+        self,
+        fn: Callable[[str, Optional[float]], Awaitable[T]],
+        model: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """Async counterpart of ``call``. Placement never waits for a catalog probe, which would block the event loop."""
+        state = RetryState(max_retries, deadline)
+        tried: Set[str] = set()
+        while True:
+            timeout = state.remaining()
+            base_url = self._next_server(model, tried, probe=False) or self.choose(model, probe=False)
+            breaker = get_circuit_breaker(base_url)
+            breaker.before_call()
+            started = self._begin(base_url)
+            try:
+                result = await fn(base_url, timeout)
+            except Exception as e:
+                self._end(base_url, started, model, ok=False)
+                error_class = classify_error(e)
+                breaker.record_failure(error_class)
+                tried.add(base_url)
+                if is_retryable(e) and self._next_server(model, tried, probe=False) is not None:
+                    state.fail_over(e)
+                    metrics.record_retry(base_url, error_class)
+                    continue
+                delay = state.delay_after(e)
+                metrics.record_retry(base_url, error_class)
+                tried.clear()
+            except BaseException:  # cancelled
+                self._end(base_url, started, model, ok=False)
+                breaker.release()
+                raise
+            else:
+                self._end(base_url, started, model, ok=True)
+                breaker.record_success()
+                return result
+            await asyncio.sleep(delay)
+
+    def stream(
+        self,
+        open_stream: Callable[[str, Optional[float]], Iterator[T]],
+        model: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> Iterator[T]:
+        """
+        Open a stream with ``call`` semantics (failover applies until the stream is open)
+        and yield from it; the server counts as busy until the stream is exhausted or closed.
+        """
+        chosen: List[str] = []
+
+        def open_on(base_url: str, timeout: Optional[float]) -> Iterator[T]:
+            stream = open_stream(base_url, timeout)
+            chosen.append(base_url)
+            return stream
+
+        stream = self.call(open_on, model, max_retries, deadline)
+        base_url = chosen[-1]
+        with self._lock:
+            self._servers[base_url].outstanding += 1
+        try:
+            yield from stream
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            with self._lock:
+                self._servers[base_url].outstanding -= 1
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "server_address": state.base_url,
+                    "outstanding": state.outstanding,
+                    "ewma_latency_ms": state.ewma_latency * 1000 if state.ewma_latency is not None else None,
+                    "requests": state.requests,
+                    "failures": state.failures,
+                    "circuit": get_circuit_breaker(state.base_url).state,
+                }
+                for state in self._servers.values()
+            ]
+
+
+_pools: Dict[Tuple[str, ...], ServerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_server_pool(server_address: Optional[str] = None) -> Optional[ServerPool]:
+    """
+    Return the shared pool for a comma-separated address list (or OLLAMA_SERVERS),
+    or None when it names a single server.
+    """
+    addresses = parse_server_addresses(server_address)
+    if len(addresses) < 2:
+        return None
+    key = tuple(addresses)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ServerPool(addresses, strategy=os.environ.get("OLLAMA_ROUTING", "least_outstanding"))
+        return pool
@@ -0,0 +1,41 @@
+# agents/streaming.py
+
+from typing import Callable, Generic, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class StreamedResult(Generic[T]):
+    """
+    Iterable of text deltas from a streaming completion that builds the agent's
+    usual result model once the stream is exhausted. Can be passed straight to
+    ``st.write_stream``; read ``result`` afterwards for the aggregated output.
+    """
+
+    def __init__(self, deltas: Iterator[str], finalize: Callable[[str], T]) -> None:
+        self._deltas = deltas
+        self._finalize = finalize
+        self._parts: List[str] = []
+        self._result: Optional[T] = None
+        self._done = False
+
+    def __iter__(self) -> Iterator[str]:
+        for delta in self._deltas:
+            self._parts.append(delta)
+            yield delta
+        self._done = True
+
+    @property
+    def text(self) -> str:
+        """Text received so far."""
+        return "".join(self._parts)
+
+    @property
+    def result(self) -> T:
+        """The aggregated result; consumes whatever is left of the stream."""
+        if not self._done:
+            for _ in self:
+                pass
+        if self._result is None:
+            self._result = self._finalize(self.text)
+        return self._result
@@ -1,9 +1,17 @@
 # agents/summarize_agent.py
 
-from typing import List, Optional
+import asyncio
+import itertools
+import math
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
 from pydantic import BaseModel
+from loguru import logger
 from .agent_base import AgentBase
-from .openai_response import get_chat_response
+from .openai_response import get_chat_response, get_chat_response_async, stream_chat_response
+from .retrieval import Retriever
+from .streaming import StreamedResult
+from .text_chunker import chunk_text, estimate_tokens, iter_chunks
 from openai.types.chat import ChatCompletionMessageParam
 
 class SummarizeResult(BaseModel):
@@ -11,40 +19,311 @@ class SummarizeResult(BaseModel):
     
 
 class SummarizeTool(AgentBase):
+    # Map-reduce settings for documents larger than one chunk
+    chunk_tokens: int = 1000
+    chunk_overlap: int = 100
+    max_concurrency: int = 4
+    # The model's context window. Ollama's /v1 endpoint ignores num_ctx, so raise it
+    # with a Modelfile (PARAMETER num_ctx) or OLLAMA_CONTEXT_LENGTH and match it here.
+    context_tokens: int = 2048
+    # BPE tokens per estimate_tokens token; the estimate runs low on rare words
+    token_margin: float = 1.3
+
     def __init__(self, max_retries: int = 2, verbose: bool = True) -> None:
         super().__init__(name="SummarizeTool", max_retries=max_retries, verbose=verbose)
 
-    def execute(
-        self,
-        text: str,
-        server_address: Optional[str] = None,
-        model_name: Optional[str] = None
-    ) -> SummarizeResult:
-        """Summarize the given text using LLM."""
-        messages: list[ChatCompletionMessageParam] = [
+    def _build_messages(self, text: str, focus: Optional[str] = None) -> list[ChatCompletionMessageParam]:
+        instruction = f"Summarize the following text, focusing on {focus}:" if focus else "Summarize the following text:"
+        return [
             {"role": "system", "content": "You are an expert scientific summarizer."},
-            {"role": "user", "content": f"Summarize the following text:\n{text}"}
+            {"role": "user", "content": f"{instruction}\n{text}"}
         ]
+
+    def _focus(self, text: str, focus: Optional[str], server_address: Optional[str]) -> str:
+        """
+        With a ``focus``, keep only the passages of a long text most relevant to it, up to one chunk.
+        If the passages can't be embedded, the whole text is summarized instead.
+        """
+        if not focus or estimate_tokens(text) <= self.chunk_tokens:
+            return text
+        try:
+            return Retriever(server_address=server_address).select_relevant(text, focus, self.chunk_tokens) or text
+        except Exception as e:
+            logger.warning(f"[SummarizeTool] Focusing on '{focus}' failed, summarizing the whole text: {e}")
+            return text
+
+    def _build_combine_messages(self, partial_summaries: List[str]) -> list[ChatCompletionMessageParam]:
+        parts = "\n\n".join(f"Part {i}:\n{summary}" for i, summary in enumerate(partial_summaries, start=1))
+        return [
+            {"role": "system", "content": "You are an expert scientific summarizer."},
+            {"role": "user", "content": (
+                "The following are summaries of consecutive parts of one document. "
+                f"Combine them into a single coherent summary of the whole document:\n{parts}"
+            )}
+        ]
+
+    def _reply_budget(self, messages: list[ChatCompletionMessageParam]) -> int:
+        """``max_tokens`` for a final summary: what the context window has left after the prompt."""
+        prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+        available = self.context_tokens - math.ceil(prompt_tokens * self.token_margin)
+        return max(self.chunk_tokens // 4, min(2049, available))
+
+    def _partial_budget(self) -> int:
+        """``max_tokens`` for chunk and intermediate summaries, so any two fit in one combine prompt."""
+        return self.chunk_tokens // 2
+
+    def _use_map_reduce(self, text: str, mode: str) -> bool:
+        if mode not in ("auto", "single", "map_reduce"):
+            raise ValueError(f"Unknown summarization mode '{mode}'.")
+        if mode == "auto":
+            return estimate_tokens(text) > self.chunk_tokens
+        return mode == "map_reduce"
+
+    def _group_partials(self, partial_summaries: List[str]) -> List[List[str]]:
+        """
+        Pack consecutive partial summaries into groups that each fit in one chunk.
+        When no two summaries fit together, pair them up anyway so every reduce
+        level still halves the number of partials.
+        """
+        groups: List[List[str]] = []
+        group_tokens = 0
+        for summary in partial_summaries:
+            tokens = estimate_tokens(summary)
+            if groups and group_tokens + tokens <= self.chunk_tokens:
+                groups[-1].append(summary)
+                group_tokens += tokens
+            else:
+                groups.append([summary])
+                group_tokens = tokens
+        if len(partial_summaries) > 1 and len(groups) == len(partial_summaries):
+            return [partial_summaries[i:i + 2] for i in range(0, len(partial_summaries), 2)]
+        return groups
+
+    def _complete(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        server_address: Optional[str],
+        model_name: Optional[str],
+        max_tokens: Optional[int] = None
+    ) -> str:
         try:
             if model_name is None:
                 model_name = "deepseek-r1:1.5b"
-            if self.verbose:
-                print(f"[SummarizeTool] Sending OpenAI request: model={model_name}, messages={messages}")
+            self.log_request(model_name, messages)
             response = get_chat_response(
                 model=model_name,
                 messages=messages,
                 server_address=server_address,
+                max_retries=self.max_retries,
                 temperature=0.3,
-                max_tokens=2049,
+                max_tokens=max_tokens or self._reply_budget(messages),
             )
             summary = response.choices[0].message.content
-            if self.verbose:
-                print(f"[SummarizeTool] OpenAI response: {summary}")
+            self.log_response(summary)
         except Exception as e:
-            import traceback
-            print(f"[SummarizeTool] Exception: {e}")
-            traceback.print_exc()
+            self.log_error(e)
             raise RuntimeError(f"[SummarizeTool] Failed to get response from OpenAI-compatible API: {e}")
         if not isinstance(summary, str):
             summary = ""
-        return SummarizeResult(summary=summary)
+        return summary
+
+    async def _complete_async(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        server_address: Optional[str],
+        model_name: Optional[str],
+        max_tokens: Optional[int] = None
+    ) -> str:
+        try:
+            if model_name is None:
+                model_name = "deepseek-r1:1.5b"
+            self.log_request(model_name, messages, "async")
+            response = await get_chat_response_async(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                max_retries=self.max_retries,
+                temperature=0.3,
+                max_tokens=max_tokens or self._reply_budget(messages),
+            )
+            summary = response.choices[0].message.content
+            self.log_response(summary)
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[SummarizeTool] Failed to get response from OpenAI-compatible API: {e}")
+        if not isinstance(summary, str):
+            summary = ""
+        return summary
+
+    def _stream(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        server_address: Optional[str],
+        model_name: Optional[str],
+        max_tokens: Optional[int] = None
+    ) -> Iterator[str]:
+        if model_name is None:
+            model_name = "deepseek-r1:1.5b"
+        self.log_request(model_name, messages, "streaming")
+        try:
+            yield from stream_chat_response(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                max_retries=self.max_retries,
+                temperature=0.3,
+                max_tokens=max_tokens or self._reply_budget(messages),
+            )
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[SummarizeTool] Failed to get response from OpenAI-compatible API: {e}")
+
+    def execute(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None,
+        mode: str = "auto",
+        focus: Optional[str] = None
+    ) -> SummarizeResult:
+        """
+        Summarize the given text using LLM.
+        mode: 'single' sends the whole text in one request, 'map_reduce' summarizes
+        chunks in parallel and merges them, 'auto' picks map-reduce when the text
+        is longer than ``chunk_tokens``. With ``focus`` (a topic or question), a long
+        text is first cut down to its most relevant passages by embedding search.
+        """
+        text = self._focus(text, focus, server_address)
+        if self._use_map_reduce(text, mode):
+            return SummarizeResult(summary=self._map_reduce(text, server_address, model_name))
+        return SummarizeResult(summary=self._complete(self._build_messages(text, focus), server_address, model_name))
+
+    async def execute_async(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None,
+        mode: str = "auto",
+        focus: Optional[str] = None
+    ) -> SummarizeResult:
+        """Summarize the given text using LLM without blocking the event loop."""
+        if focus:
+            text = await asyncio.to_thread(self._focus, text, focus, server_address)
+        if self._use_map_reduce(text, mode):
+            return SummarizeResult(summary=await self._map_reduce_async(text, server_address, model_name))
+        return SummarizeResult(summary=await self._complete_async(self._build_messages(text, focus), server_address, model_name))
+
+    def execute_stream(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None,
+        mode: str = "auto",
+        focus: Optional[str] = None
+    ) -> StreamedResult[SummarizeResult]:
+        """
+        Summarize the given text, streaming the summary as it is generated.
+        In map-reduce mode the chunk summaries are produced first and only the
+        final merge is streamed.
+        """
+        def deltas() -> Iterator[str]:
+            focused = self._focus(text, focus, server_address)
+            if not self._use_map_reduce(focused, mode):
+                yield from self._stream(self._build_messages(focused, focus), server_address, model_name)
+                return
+            partials = self._reduce_partials(focused, server_address, model_name)
+            if len(partials) == 1:
+                yield partials[0]
+            else:
+                yield from self._stream(self._build_combine_messages(partials), server_address, model_name)
+
+        return StreamedResult(deltas(), lambda summary: SummarizeResult(summary=summary))
+
+    def execute_pages_stream(
+        self,
+        pages: Iterable[str],
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> StreamedResult[SummarizeResult]:
+        """
+        Summarize a document read page by page (e.g. from utils.pdf_extraction.iter_pdf_pages),
+        streaming the summary. Chunk summaries start as soon as each chunk is full, while
+        later pages are still being extracted. A document that fits in one chunk gets a
+        single streamed summary; otherwise only the final merge is streamed.
+        """
+        def deltas() -> Iterator[str]:
+            chunks = iter_chunks(pages, self.chunk_tokens, self.chunk_overlap)
+            head = list(itertools.islice(chunks, 2))
+            if len(head) < 2:
+                if head:
+                    yield from self._stream(self._build_messages(head[0]), server_address, model_name)
+                return
+            partials = self._reduce_chunks(itertools.chain(head, chunks), server_address, model_name)
+            if len(partials) == 1:
+                yield partials[0]
+            else:
+                yield from self._stream(self._build_combine_messages(partials), server_address, model_name)
+
+        return StreamedResult(deltas(), lambda summary: SummarizeResult(summary=summary))
+
+    def _map_reduce(self, text: str, server_address: Optional[str], model_name: Optional[str]) -> str:
+        """Summarize chunks in parallel, then merge the partial summaries level by level."""
+        partials = self._reduce_partials(text, server_address, model_name)
+        if len(partials) == 1:
+            return partials[0]
+        return self._complete(self._build_combine_messages(partials), server_address, model_name)
+
+    def _reduce_partials(self, text: str, server_address: Optional[str], model_name: Optional[str]) -> List[str]:
+        """Map and intermediate reduce steps: partial summaries that together fit one prompt."""
+        return self._reduce_chunks(chunk_text(text, self.chunk_tokens, self.chunk_overlap), server_address, model_name)
+
+    def _reduce_chunks(self, chunks: Iterable[str], server_address: Optional[str], model_name: Optional[str]) -> List[str]:
+        """``_reduce_partials`` over chunks that may still be arriving; each is summarized as soon as it does."""
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            futures: List[Future] = []
+            try:
+                for chunk in chunks:
+                    futures.append(executor.submit(
+                        self._complete, self._build_messages(chunk), server_address, model_name, self._partial_budget()
+                    ))
+                if self.verbose:
+                    logger.debug(f"[SummarizeTool] Map-reduce over {len(futures)} chunks")
+                partials = [future.result() for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()  # a failed chunk or page stops the summaries not yet started
+            while len(partials) > 1:
+                groups = self._group_partials(partials)
+                if len(groups) == 1:
+                    break
+                partials = list(executor.map(
+                    lambda group: group[0] if len(group) == 1 else self._complete(
+                        self._build_combine_messages(group), server_address, model_name, self._partial_budget()),
+                    groups
+                ))
+        return partials
+
+    async def _map_reduce_async(self, text: str, server_address: Optional[str], model_name: Optional[str]) -> str:
+        """Async counterpart of ``_map_reduce``."""
+        chunks = chunk_text(text, self.chunk_tokens, self.chunk_overlap)
+        if self.verbose:
+            logger.debug(f"[SummarizeTool] Map-reduce over {len(chunks)} chunks")
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+        async def bounded(messages: list[ChatCompletionMessageParam]) -> str:
+            async with semaphore:
+                return await self._complete_async(messages, server_address, model_name, self._partial_budget())
+
+        partials = list(await asyncio.gather(*(bounded(self._build_messages(chunk)) for chunk in chunks)))
+        while len(partials) > 1:
+            groups = self._group_partials(partials)
+            if len(groups) == 1:
+                break
+
+            async def reduce_group(group: List[str]) -> str:
+                return group[0] if len(group) == 1 else await bounded(self._build_combine_messages(group))
+
+            partials = list(await asyncio.gather(*(reduce_group(group) for group in groups)))
+        if len(partials) == 1:
+            return partials[0]
+        return await self._complete_async(self._build_combine_messages(partials), server_address, model_name)
@@ -0,0 +1,86 @@
+# agents/text_chunker.py
+"""
+Token-aware text chunking for prompts that must fit small context windows.
+Token counts are estimated from word and punctuation boundaries. BPE tokenizers
+split rare and long words into several tokens, so the estimate runs low and
+budgets built on it should leave headroom below the model's context window.
+"""
+import re
+from typing import Iterable, Iterator, List
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of model tokens in ``text``."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def _split_units(text: str, max_tokens: int) -> Iterator[str]:
+    """Split text into paragraph, sentence or word runs of at most ``max_tokens`` tokens each."""
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                yield sentence
+                continue
+            words = sentence.split()
+            run: List[str] = []
+            run_tokens = 0
+            for word in words:
+                word_tokens = estimate_tokens(word)
+                if run and run_tokens + word_tokens > max_tokens:
+                    yield " ".join(run)
+                    run, run_tokens = [], 0
+                run.append(word)
+                run_tokens += word_tokens
+            if run:
+                yield " ".join(run)
+
+
+def chunk_text(text: str, chunk_tokens: int = 3000, overlap_tokens: int = 200) -> List[str]:
+    """
+    Split ``text`` into chunks of roughly ``chunk_tokens`` tokens, breaking on paragraph
+    and sentence boundaries where possible. Consecutive chunks share up to
+    ``overlap_tokens`` tokens of trailing context.
+    """
+    return list(iter_chunks([text], chunk_tokens, overlap_tokens))
+
+
+def iter_chunks(texts: Iterable[str], chunk_tokens: int = 3000, overlap_tokens: int = 200) -> Iterator[str]:
+    """
+    Like ``chunk_text`` over consecutive texts (e.g. the pages of a document), yielding
+    each chunk as soon as it is full, so chunks can be processed before the last text
+    has been read. Chunks may run across text boundaries.
+    """
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be positive.")
+    overlap_tokens = max(0, min(overlap_tokens, chunk_tokens // 2))
+    current: List[str] = []
+    current_tokens: List[int] = []
+    units = (unit for text in texts for unit in _split_units(text, chunk_tokens))
+    for unit in units:
+        unit_tokens = estimate_tokens(unit)
+        if current and sum(current_tokens) + unit_tokens > chunk_tokens:
+            yield "\n\n".join(current)
+            # Carry trailing units into the next chunk as overlap
+            carried, carried_tokens = [], []
+            for prev, prev_tokens in zip(reversed(current), reversed(current_tokens)):
+                if sum(carried_tokens) + prev_tokens > overlap_tokens:
+                    break
+                carried.insert(0, prev)
+                carried_tokens.insert(0, prev_tokens)
+            current, current_tokens = carried, carried_tokens
+            if current and sum(current_tokens) + unit_tokens > chunk_tokens:
+                current, current_tokens = [], []
+        current.append(unit)
+        current_tokens.append(unit_tokens)
+    if current:
+        yield "\n\n".join(current)
@@ -1,6 +1,8 @@
 from typing import List, Dict, Optional
 from pydantic import BaseModel
+from loguru import logger
 import requests
+from .agent_base import describe_payload
 
 class WebSearchAgent(BaseModel):
     name: str = "WebSearchAgent"
@@ -32,11 +34,11 @@ class WebSearchAgent(BaseModel):
                             "source": "web"
                         })
                     if self.verbose:
-                        print(f"[WebSearchAgent] Search results: {results}")
+                        logger.debug(f"[WebSearchAgent] {len(results)} search results: {describe_payload(results)}")
                     return results
                 except Exception as e:
                     if self.verbose:
-                        print(f"[WebSearchAgent] Attempt {attempt+1} failed: {e}")
+                        logger.warning(f"[WebSearchAgent] Attempt {attempt+1} failed: {e}")
                     if attempt == self.max_retries - 1:
                         raise
         # Add other backends as needed
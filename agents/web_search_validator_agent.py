@@ -1,37 +1,232 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional
 from pydantic import BaseModel
-from .openai_response import get_chat_response
+from loguru import logger
+from .openai_response import get_chat_response, get_chat_response_async
 from openai.types.chat import ChatCompletionMessageParam
+from . import metrics
+
+_THINK_RE = re.compile(r"<think>.*?(</think>|$)", re.DOTALL | re.IGNORECASE)
+_VERDICT_RE = re.compile(r"\b(INVALID|VALID)\b", re.IGNORECASE)
+_ITEM_VERDICT_RE = re.compile(r"^\W*(\d+)\W.*?\b(INVALID|VALID)\b", re.IGNORECASE | re.MULTILINE)
+VERDICT_TOKENS = 16  # one "<number>: INVALID" line
+REASONING_TOKENS = 1024  # room for the <think> block a reasoning model writes first
+_REASONING_MODEL_RE = re.compile(r"(?<![a-z0-9])r1\b|qwq|think|reason", re.IGNORECASE)
+
+
+def is_reasoning_model(model_name: str) -> bool:
+    """Guess from the name whether a model thinks before it answers (deepseek-r1, qwq, ...)."""
+    return _REASONING_MODEL_RE.search(model_name) is not None
+
+
+def parse_verdict(text: Optional[str]) -> Optional[bool]:
+    """Parse a single VALID/INVALID reply, ignoring reasoning blocks. Returns None if no verdict is found."""
+    if not text:
+        return None
+    match = _VERDICT_RE.search(_THINK_RE.sub("", text))
+    if match is None:
+        return None
+    return match.group(1).upper() == "VALID"
+
+
+def parse_batch_verdicts(text: Optional[str], count: int) -> Dict[int, bool]:
+    """
+    Parse a numbered verdict list ('1: VALID', '2. INVALID', ...) into {0-based index: verdict}.
+    Numbers outside 1..count are ignored; the first verdict for a number wins.
+    """
+    verdicts: Dict[int, bool] = {}
+    if not text:
+        return verdicts
+    for match in _ITEM_VERDICT_RE.finditer(_THINK_RE.sub("", text)):
+        index = int(match.group(1)) - 1
+        if 0 <= index < count and index not in verdicts:
+            verdicts[index] = match.group(2).upper() == "VALID"
+    return verdicts
+
 
 class WebSearchValidatorAgent(BaseModel):
     name: str = "WebSearchValidatorAgent"
     model_name: str = "deepseek-r1:1.5b"
     server_address: Optional[str] = None
     max_results: int = 10
+    max_concurrency: int = 4  # LLM calls in flight at once
+    batch_size: int = 1  # results classified per LLM call; 1 disables batching
+    # Extra reply tokens for a <think> block before the verdict. None picks REASONING_TOKENS
+    # for reasoning models (see is_reasoning_model) and 0 for the rest
+    reasoning_tokens: Optional[int] = None
     verbose: bool = True
 
-    def validate(self, results: List[Dict]) -> List[Dict]:
-        """Validate/filter web search results for scientific/technical relevance using LLM."""
+    def _build_messages(self, result: Dict) -> List[ChatCompletionMessageParam]:
+        system_message = (
+            "You are a scientific research assistant. Given a web search result, determine if it is likely to be a scientific paper, journal article, technical blog, or credible technology news. Reply VALID or INVALID."
+        )
+        user_content = f"Title: {result.get('title','')}\nSnippet: {result.get('snippet','')}\nURL: {result.get('url','')}"
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_content}
+        ]
+
+    def _build_batch_messages(self, batch: List[Dict]) -> List[ChatCompletionMessageParam]:
+        system_message = (
+            "You are a scientific research assistant. Given a numbered list of web search results, determine for each one if it is likely to be a scientific paper, journal article, technical blog, or credible technology news. "
+            "Reply with exactly one line per result in the form '<number>: VALID' or '<number>: INVALID' and nothing else."
+        )
+        user_content = "\n\n".join(
+            f"[{i}] Title: {result.get('title','')}\nSnippet: {result.get('snippet','')}\nURL: {result.get('url','')}"
+            for i, result in enumerate(batch, start=1)
+        )
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_content}
+        ]
+
+    def _accepted_prefix(self, results: List[Dict], verdicts: List[Optional[bool]]) -> Optional[List[Dict]]:
+        """
+        Return the validated results in ranking order once they are fully decided:
+        either every verdict is in, or the first ``max_results`` valid hits are known
+        with no undecided result ranked above them. Returns None while still undecided.
+        """
         validated = []
-        for result in results:
-            system_message = (
-                "You are a scientific research assistant. Given a web search result, determine if it is likely to be a scientific paper, journal article, technical blog, or credible technology news. Reply VALID or INVALID."
-            )
-            user_content = f"Title: {result.get('title','')}\nSnippet: {result.get('snippet','')}\nURL: {result.get('url','')}"
-            messages: List[ChatCompletionMessageParam] = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_content}
-            ]
-            response = get_chat_response(
+        for result, verdict in zip(results, verdicts):
+            if verdict is None:
+                return None
+            if verdict:
+                validated.append(result)
+                if len(validated) >= self.max_results:
+                    break
+        return validated
+
+    def _batches(self, results: List[Dict]) -> List[range]:
+        size = max(1, self.batch_size)
+        return [range(start, min(start + size, len(results))) for start in range(0, len(results), size)]
+
+    def _max_tokens(self, count: int) -> int:
+        reasoning_tokens = self.reasoning_tokens
+        if reasoning_tokens is None:
+            reasoning_tokens = REASONING_TOKENS if is_reasoning_model(self.model_name) else 0
+        return reasoning_tokens + VERDICT_TOKENS * count
+
+    def _verdict(self, result: Dict, reply: Optional[str]) -> bool:
+        """
+        A reply without a verdict (e.g. cut off mid-reasoning) keeps the result rather than
+        dropping it. Such replies are counted in ``unparsed_verdicts_total``, so a model that
+        never answers properly (and so lets everything through) shows up in the metrics.
+        """
+        verdict = parse_verdict(reply)
+        if verdict is None:
+            metrics.record_unparsed_verdict(self.name, self.model_name)
+            logger.warning(f"[WebSearchValidatorAgent] No verdict for '{result.get('title', '')}'; keeping it")
+            return True
+        return verdict
+
+    def _classify(self, result: Dict) -> bool:
+        response = get_chat_response(
+            model=self.model_name,
+            messages=self._build_messages(result),
+            server_address=self.server_address,
+            temperature=0.0,
+            max_tokens=self._max_tokens(1),
+        )
+        return self._verdict(result, response.choices[0].message.content)
+
+    def _classify_batch(self, batch: List[Dict]) -> List[bool]:
+        """Classify several results with one call, falling back to per-item calls for unparsed entries."""
+        if len(batch) == 1:
+            return [self._classify(batch[0])]
+        response = get_chat_response(
+            model=self.model_name,
+            messages=self._build_batch_messages(batch),
+            server_address=self.server_address,
+            temperature=0.0,
+            max_tokens=self._max_tokens(len(batch)),
+        )
+        parsed = parse_batch_verdicts(response.choices[0].message.content, len(batch))
+        if self.verbose and len(parsed) < len(batch):
+            logger.debug(f"[WebSearchValidatorAgent] Batch reply covered {len(parsed)}/{len(batch)} results; retrying the rest individually")
+        return [parsed[i] if i in parsed else self._classify(result) for i, result in enumerate(batch)]
+
+    async def _classify_async(self, result: Dict) -> bool:
+        response = await get_chat_response_async(
+            model=self.model_name,
+            messages=self._build_messages(result),
+            server_address=self.server_address,
+            temperature=0.0,
+            max_tokens=self._max_tokens(1),
+        )
+        return self._verdict(result, response.choices[0].message.content)
+
+    async def _classify_batch_async(self, batch: List[Dict], semaphore: asyncio.Semaphore) -> List[bool]:
+        async with semaphore:
+            if len(batch) == 1:
+                return [await self._classify_async(batch[0])]
+            response = await get_chat_response_async(
                 model=self.model_name,
-                messages=messages,
+                messages=self._build_batch_messages(batch),
                 server_address=self.server_address,
                 temperature=0.0,
-                max_tokens=16,
+                max_tokens=self._max_tokens(len(batch)),
             )
-            verdict = response.choices[0].message.content
-            if verdict and "VALID" in verdict.upper():
-                validated.append(result)
-            if len(validated) >= self.max_results:
-                break
-        return validated
+            parsed = parse_batch_verdicts(response.choices[0].message.content, len(batch))
+            if self.verbose and len(parsed) < len(batch):
+                logger.debug(f"[WebSearchValidatorAgent] Batch reply covered {len(parsed)}/{len(batch)} results; retrying the rest individually")
+            missing = [i for i in range(len(batch)) if i not in parsed]
+            fallback = await asyncio.gather(*(self._classify_async(batch[i]) for i in missing))
+            parsed.update(zip(missing, fallback))
+            return [parsed[i] for i in range(len(batch))]
+
+    def validate(self, results: List[Dict]) -> List[Dict]:
+        """
+        Validate/filter web search results for scientific/technical relevance using LLM.
+        Results are classified ``batch_size`` at a time, with up to ``max_concurrency`` calls
+        in flight; calls that have not started yet are cancelled as soon as the top
+        ``max_results`` valid hits are known. Results a batch reply leaves out are
+        classified one by one, and results that still get no verdict are kept.
+        """
+        if not results or self.max_results <= 0:
+            return []
+        verdicts: List[Optional[bool]] = [None] * len(results)
+        executor = ThreadPoolExecutor(max_workers=max(1, self.max_concurrency))
+        try:
+            futures = {
+                executor.submit(self._classify_batch, [results[i] for i in batch]): batch
+                for batch in self._batches(results)
+            }
+            for future in as_completed(futures):
+                for i, verdict in zip(futures[future], future.result()):
+                    verdicts[i] = verdict
+                validated = self._accepted_prefix(results, verdicts)
+                if validated is not None:
+                    return validated
+        finally:
+            # Don't wait for in-flight calls once the answer is known
+            executor.shutdown(wait=False, cancel_futures=True)
+        return []
+
+    async def validate_async(self, results: List[Dict]) -> List[Dict]:
+        """Async counterpart of ``validate``; outstanding calls are cancelled once the answer is known."""
+        if not results or self.max_results <= 0:
+            return []
+        verdicts: List[Optional[bool]] = [None] * len(results)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        tasks = {
+            asyncio.ensure_future(self._classify_batch_async([results[i] for i in batch], semaphore)): batch
+            for batch in self._batches(results)
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for i, verdict in zip(tasks[task], task.result()):
+                        verdicts[i] = verdict
+                validated = self._accepted_prefix(results, verdicts)
+                if validated is not None:
+                    return validated
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return []
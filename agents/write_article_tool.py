@@ -1,9 +1,10 @@
 # agents/write_article_agent.py
 
-from typing import Optional
+from typing import Iterator, Optional
 from pydantic import BaseModel
 from .agent_base import AgentBase
-from .openai_response import get_chat_response
+from .openai_response import get_chat_response, get_chat_response_async, stream_chat_response
+from .streaming import StreamedResult
 from openai.types.chat import ChatCompletionMessageParam
 
 class WriteArticleResult(BaseModel):
@@ -13,43 +14,118 @@ class WriteArticleTool(AgentBase):
     def __init__(self, max_retries: int = 2, verbose: bool = True) -> None:
         super().__init__(name="WriteArticleTool", max_retries=max_retries, verbose=verbose)
 
-    def execute(
-        self, 
-        topic: str, 
-        outline: Optional[str] = None, 
-        server_address: Optional[str] = None, 
-        model_name: Optional[str] = None
-    ) -> WriteArticleResult:
-        """Generate a research article on the given topic and outline using LLM."""
+    def _build_messages(
+        self, topic: str, outline: Optional[str] = None, section: Optional[str] = None, context: Optional[str] = None
+    ) -> list[ChatCompletionMessageParam]:
         system_message = "You are an expert academic writer."
         user_content = f"Write a research article on the following topic:\nTopic: {topic}\n\n"
         if outline:
             user_content += f"Outline:\n{outline}\n\n"
-        user_content += "Article:\n"
-        messages: list[ChatCompletionMessageParam] = [
+        if context:
+            user_content += f"Source passages (use them where relevant and cite them by number):\n{context}\n\n"
+        if section:
+            user_content += f"Write only the following section of the article:\n{section}\n\nSection:\n"
+        else:
+            user_content += "Article:\n"
+        return [
             {"role": "system", "content": system_message},
             {"role": "user", "content": user_content}
         ]
+
+    def execute(
+        self, 
+        topic: str, 
+        outline: Optional[str] = None, 
+        server_address: Optional[str] = None, 
+        model_name: Optional[str] = None,
+        section: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> WriteArticleResult:
+        """
+        Generate a research article (or one ``section`` of it) on the given topic and outline using LLM.
+        ``context`` holds retrieved source passages (see ``agents.retrieval``) for the model to draw on.
+        """
+        messages = self._build_messages(topic, outline, section, context)
         try:
             if model_name is None:
                 model_name = "deepseek-r1:1.5b"
-            if self.verbose:
-                print(f"[WriteArticleTool] Sending OpenAI request: model={model_name}, messages={messages}")
+            self.log_request(model_name, messages)
             response = get_chat_response(
                 model=model_name,
                 messages=messages,
                 server_address=server_address,
+                max_retries=self.max_retries,
                 temperature=0.3,
                 max_tokens=2049,
             )
             article = response.choices[0].message.content
-            if self.verbose:
-                print(f"[WriteArticleTool] OpenAI response: {article}")
+            self.log_response(article)
         except Exception as e:
-            import traceback
-            print(f"[WriteArticleTool] Exception: {e}")
-            traceback.print_exc()
+            self.log_error(e)
             raise RuntimeError(f"[WriteArticleTool] Failed to get response from OpenAI-compatible API: {e}")
         if not isinstance(article, str):
             article = ""
         return WriteArticleResult(article=article)
+
+    async def execute_async(
+        self, 
+        topic: str, 
+        outline: Optional[str] = None, 
+        server_address: Optional[str] = None, 
+        model_name: Optional[str] = None,
+        section: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> WriteArticleResult:
+        """Generate a research article on the given topic and outline using LLM without blocking the event loop."""
+        messages = self._build_messages(topic, outline, section, context)
+        try:
+            if model_name is None:
+                model_name = "deepseek-r1:1.5b"
+            self.log_request(model_name, messages, "async")
+            response = await get_chat_response_async(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                max_retries=self.max_retries,
+                temperature=0.3,
+                max_tokens=2049,
+            )
+            article = response.choices[0].message.content
+            self.log_response(article)
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[WriteArticleTool] Failed to get response from OpenAI-compatible API: {e}")
+        if not isinstance(article, str):
+            article = ""
+        return WriteArticleResult(article=article)
+
+    def execute_stream(
+        self, 
+        topic: str, 
+        outline: Optional[str] = None, 
+        server_address: Optional[str] = None, 
+        model_name: Optional[str] = None,
+        section: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> StreamedResult[WriteArticleResult]:
+        """Generate a research article using LLM, streaming the article as it is generated."""
+        messages = self._build_messages(topic, outline, section, context)
+        if model_name is None:
+            model_name = "deepseek-r1:1.5b"
+
+        def deltas() -> Iterator[str]:
+            self.log_request(model_name, messages, "streaming")
+            try:
+                yield from stream_chat_response(
+                    model=model_name,
+                    messages=messages,
+                    server_address=server_address,
+                    max_retries=self.max_retries,
+                    temperature=0.3,
+                    max_tokens=2049,
+                )
+            except Exception as e:
+                self.log_error(e)
+                raise RuntimeError(f"[WriteArticleTool] Failed to get response from OpenAI-compatible API: {e}")
+
+        return StreamedResult(deltas(), lambda article: WriteArticleResult(article=article))
@@ -1,13 +1,22 @@
 # agents/write_article_validator_agent.py
 
 from typing import Optional
-from .openai_response import get_chat_response
+from .agent_base import AgentLogMixin
+from .openai_response import get_chat_response, get_chat_response_async
 from openai.types.chat import ChatCompletionMessageParam
 
-class WriteArticleValidatorAgent:
+class WriteArticleValidatorAgent(AgentLogMixin):
+    name = "WriteArticleValidatorAgent"
+
     def __init__(self, verbose: bool = True) -> None:
         self.verbose = verbose
 
+    def _build_messages(self, text: str) -> list[ChatCompletionMessageParam]:
+        return [
+            {"role": "system", "content": "You are an expert in scientific article validation."},
+            {"role": "user", "content": f"Validate the following article:\n{text}"}
+        ]
+
     def execute(
         self,
         text: str,
@@ -15,15 +24,11 @@ class WriteArticleValidatorAgent:
         model_name: Optional[str] = None
     ) -> str:
         """Validate written article using LLM."""
-        messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": "You are an expert in scientific article validation."},
-            {"role": "user", "content": f"Validate the following article:\n{text}"}
-        ]
+        messages = self._build_messages(text)
         try:
             if model_name is None:
                 model_name = "deepseek-r1:1.5b"
-            if self.verbose:
-                print(f"[WriteArticleValidatorAgent] Sending OpenAI request: model={model_name}, messages={messages}")
+            self.log_request(model_name, messages)
             response = get_chat_response(
                 model=model_name,
                 messages=messages,
@@ -32,12 +37,37 @@ class WriteArticleValidatorAgent:
                 max_tokens=2049,
             )
             validation = response.choices[0].message.content
-            if self.verbose:
-                print(f"[WriteArticleValidatorAgent] OpenAI response: {validation}")
+            self.log_response(validation)
+        except Exception as e:
+            self.log_error(e)
+            raise RuntimeError(f"[WriteArticleValidatorAgent] Failed to get response from OpenAI-compatible API: {e}")
+        if not isinstance(validation, str):
+            validation = ""
+        return validation
+
+    async def execute_async(
+        self,
+        text: str,
+        server_address: Optional[str] = None,
+        model_name: Optional[str] = None
+    ) -> str:
+        """Validate written article using LLM without blocking the event loop."""
+        messages = self._build_messages(text)
+        try:
+            if model_name is None:
+                model_name = "deepseek-r1:1.5b"
+            self.log_request(model_name, messages, "async")
+            response = await get_chat_response_async(
+                model=model_name,
+                messages=messages,
+                server_address=server_address,
+                temperature=0.3,
+                max_tokens=2049,
+            )
+            validation = response.choices[0].message.content
+            self.log_response(validation)
         except Exception as e:
-            import traceback
-            print(f"[WriteArticleValidatorAgent] Exception: {e}")
-            traceback.print_exc()
+            self.log_error(e)
             raise RuntimeError(f"[WriteArticleValidatorAgent] Failed to get response from OpenAI-compatible API: {e}")
         if not isinstance(validation, str):
             validation = ""
@@ -2,57 +2,87 @@
 
 import streamlit as st
 from agents import AgentManager
-import os
+from agents.model_catalog import get_model_catalog
+from agents.scheduler import get_scheduler
+from agents.server_pool import parse_server_addresses
+from agents.pipeline import build_article_pipeline, split_outline
 from dotenv import load_dotenv
-import logging
 from utils.logger import logger
-import requests
-import PyPDF2 
-from bs4 import BeautifulSoup
-from bs4.element import Tag
 from typing import List, Optional
-import arxiv
-import scholarly
-import itertools
 
 
 # Load environment variables from .env if present
 load_dotenv()
 
 def get_ollama_models(server_address):
-    """Fetches the list of models from the Ollama server."""
+    """Returns the models on the Ollama server(s) from the shared, background-refreshed catalog."""
+    models: List[str] = []
+    for address in parse_server_addresses(server_address):
+        health = get_model_catalog().get_health(address)
+        if not health.ok:
+            logger.error(f"Failed to fetch models from Ollama server {address}: {health.error}")
+        models.extend(model for model in health.models if model not in models)
+    return models
+
+def shared_retriever(server_address):
+    """The shared retrieval index, or None if it can't be opened."""
     try:
-        response = requests.get(f"{server_address}/api/tags")
-        response.raise_for_status()
-        models_data = response.json()
-        models = [ model['name'] for model in models_data['models'] ]
-        return models
+        from agents.retrieval import get_retriever
+        return get_retriever(server_address)
     except Exception as e:
-        logger.error(f"Failed to fetch models from Ollama server: {e}")
-        return []
+        logger.warning(f"Retrieval index unavailable: {e}")
+        return None
+
+def get_source_retriever(server_address):
+    """The shared retriever, or None while nothing has been indexed."""
+    retriever = shared_retriever(server_address)
+    return retriever if retriever is not None and len(retriever.index) else None
+
+def index_document(text, source, server_address):
+    """Add fetched text to the retrieval index in the background."""
+    from agents.retrieval import index_document_in_background
+    retriever = shared_retriever(server_address)
+    if retriever is not None:
+        index_document_in_background(retriever, text, source)
+
+def index_passages(passages, server_address):
+    from agents.retrieval import index_in_background
+    retriever = shared_retriever(server_address)
+    if retriever is not None and passages:
+        index_in_background(retriever, passages)
 
 def main():
     st.set_page_config(page_title="Multi-Agent AI System", layout="wide")
     st.title("Multi-Agent AI System with Collaboration and Validation")
 
     st.sidebar.title("Settings")
-    server_address = st.sidebar.text_input("Ollama Server Address", value="http://localhost:11434")
+    server_address = st.sidebar.text_input(
+        "Ollama Server Address", value="http://localhost:11434",
+        help="Separate several addresses with commas to load-balance across servers.",
+    )
 
     # Verify server connectivity and fetch models
     if st.sidebar.button("Verify Server"):
-        try:
-            models = get_ollama_models(server_address)
-            if models:
-                st.sidebar.success("Server connected successfully!")
+        for address in parse_server_addresses(server_address):
+            health = get_model_catalog().probe(address)
+            if not health.ok:
+                st.sidebar.error(f"Failed to connect to {address}: {health.error}")
+            elif health.models:
+                st.sidebar.success(f"{address} connected successfully! ({health.latency_ms:.0f} ms)")
             else:
-                st.sidebar.warning("No models found on the server.")
-        except Exception as e:
-            st.sidebar.error(f"Failed to connect to server: {e}")
+                st.sidebar.warning(f"No models found on {address}.")
 
     # Populate the model dropdown dynamically
     models = get_ollama_models(server_address)
     model_name = st.sidebar.selectbox("Select Model", models if models else ["No models available"])
 
+    with st.sidebar.expander("Request Queue", expanded=False):
+        for queue_server, stats in get_scheduler().stats().items():
+            st.caption(
+                f"{queue_server}: {stats['in_use']}/{stats['slots']} busy, {stats['queue_depth']} queued, "
+                f"mean wait {stats['mean_wait_s']:.2f}s, {stats['model_switches']} model switches"
+            )
+
     st.sidebar.title("Select Task")
     task = st.sidebar.selectbox("Choose a task:", [
         "Search arXiv Papers",
@@ -61,18 +91,19 @@ def main():
         "Write and Refine Research Article"
     ])
 
-    agent_manager = AgentManager(max_retries=2, verbose=True)
+    agent_manager = AgentManager.shared(max_retries=2, verbose=True)
 
     if task == "Search arXiv Papers":
-        search_arxiv_papers()
+        search_arxiv_papers(server_address)
     elif task == "Search Web":
-        search_web()
+        search_web(server_address, model_name)
     elif task == "Summarize Scientific Papers":
         summarize_section(agent_manager, server_address, model_name)
     elif task == "Write and Refine Research Article":
         write_and_refine_article_section(agent_manager, server_address, model_name)
 
 def summarize_section(agent_manager: AgentManager, server_address: str, model_name: str) -> None:
+    from utils.document_store import fetch_document, iter_document_pages, iter_uploaded_pages, load_uploaded_document
     st.header("Summarize Scientific Papers")
     mode = st.radio("Choose input type:", ["URL (PDF or Web)", "Text", "Upload PDF"])
 
@@ -84,40 +115,28 @@ def summarize_section(agent_manager: AgentManager, server_address: str, model_na
     # Extraction logic
     if mode == "URL (PDF or Web)":
         url = st.text_input("Enter the URL of the paper (PDF or web page):")
-        if url and st.button("Extract"):
+        extract = bool(url) and st.button("Extract")
+        extract_and_summarize = url.lower().endswith(".pdf") and st.button("Extract and Summarize")
+        if extract_and_summarize:
+            summarize_while_extracting(agent_manager, iter_document_pages(url), url, server_address, model_name)
+        elif extract:
             st.session_state["extracted_text"] = ""  # Reset before extraction
             if url.lower().endswith(".pdf"):
                 try:
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    with open("temp.pdf", "wb") as f:
-                        f.write(response.content)
-                    with open("temp.pdf", "rb") as f:
-                        reader = PyPDF2.PdfReader(f)
-                        text = ""
-                        for page in reader.pages:
-                            page_text = page.extract_text()
-                            if page_text:
-                                text += page_text
+                    text = fetch_document(url).text
                     if not text.strip():
                         st.error("No extractable text found in the downloaded PDF. It may be scanned or image-based.")
                         logger.error("No extractable text found in the downloaded PDF.")
                     else:
                         st.session_state["extracted_text"] = text
-                    os.remove("temp.pdf")
+                        index_document(text, url, server_address)
                 except Exception as e:
                     st.error(f"Failed to extract from PDF: {e}")
                     logger.error(f"Failed to extract from PDF: {e}")
             else:
                 try:
-                    response = requests.get(url)
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    abstract = soup.find("meta", {"name": "description"})
-                    if isinstance(abstract, Tag):
-                        text = abstract.get("content", "")
-                    else:
-                        text = soup.get_text()
-                    st.session_state["extracted_text"] = text
+                    st.session_state["extracted_text"] = fetch_document(url).text
+                    index_document(st.session_state["extracted_text"], url, server_address)
                 except Exception as e:
                     st.error(f"Failed to extract from web page: {e}")
                     logger.error(f"Failed to extract from web page: {e}")
@@ -125,14 +144,14 @@ def summarize_section(agent_manager: AgentManager, server_address: str, model_na
 
     elif mode == "Upload PDF":
         uploaded_file = st.file_uploader("Upload a PDF file", type="pdf")
-        if uploaded_file and st.button("Extract"):
+        extract = uploaded_file is not None and st.button("Extract")
+        extract_and_summarize = uploaded_file is not None and st.button("Extract and Summarize")
+        if extract_and_summarize:
+            pages = iter_uploaded_pages(uploaded_file.getvalue())
+            summarize_while_extracting(agent_manager, pages, None, server_address, model_name)
+        elif extract:
             try:
-                reader = PyPDF2.PdfReader(uploaded_file)
-                text = ""
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
+                text = load_uploaded_document(uploaded_file.getvalue()).text
                 if not text.strip():
                     st.error("No extractable text found in the uploaded PDF. It may be scanned or image-based.")
                 else:
@@ -150,46 +169,88 @@ def summarize_section(agent_manager: AgentManager, server_address: str, model_na
 
     # Summarization logic
     if extracted_text:
+        focus = st.text_input("Focus (optional): summarize only the passages about this topic")
         if st.button("Summarize"):
             main_agent = agent_manager.get_agent("summarize")
             validator_agent = agent_manager.get_agent("summarize_validator")
             with st.spinner("Summarizing..."):
                 try:
-                    summary_result = main_agent.execute(extracted_text, server_address, model_name)
-                    summary = summary_result.summary if hasattr(summary_result, 'summary') else summary_result
                     st.subheader("Summary:")
-                    st.write(summary)
+                    summary_stream = main_agent.execute_stream(extracted_text, server_address, model_name, focus=focus or None)
+                    st.write_stream(summary_stream)
+                    summary = summary_stream.result.summary
                 except Exception as e:
                     st.error(f"Error: {e}")
                     logger.error(f"SummarizeAgent Error: {e}")
                     return
-            with st.spinner("Validating summary..."):
-                try:
-                    validation = validator_agent.execute(original_text=extracted_text, summary=summary)
-                    st.subheader("Validation:")
-                    st.write(validation)
-                except Exception as e:
-                    st.error(f"Validation Error: {e}")
-                    logger.error(f"SummarizeValidatorAgent Error: {e}")
+            validate_summary(validator_agent, extracted_text, summary)
     else:
         st.info("Please provide input and click 'Extract' (if needed) before summarizing.")
 
 
+def summarize_while_extracting(agent_manager: AgentManager, pages, source: Optional[str], server_address: str, model_name: str) -> None:
+    """Summarize a PDF page by page as it is extracted, then keep its text for follow-up summaries."""
+    extracted: List[str] = []
+
+    def collect():
+        for page in pages:
+            extracted.append(page)
+            yield page
+
+    st.session_state["extracted_text"] = ""
+    with st.spinner("Extracting and summarizing..."):
+        try:
+            st.subheader("Summary:")
+            summary_stream = agent_manager.get_agent("summarize").execute_pages_stream(collect(), server_address, model_name)
+            st.write_stream(summary_stream)
+            summary = summary_stream.result.summary
+        except Exception as e:
+            st.error(f"Failed to extract or summarize the PDF: {e}")
+            logger.error(f"Failed to extract or summarize the PDF: {e}")
+            return
+    text = "\n".join(extracted)
+    if not text.strip():
+        st.error("No extractable text found in the PDF. It may be scanned or image-based.")
+        logger.error("No extractable text found in the PDF.")
+        return
+    st.session_state["extracted_text"] = text
+    if source:
+        index_document(text, source, server_address)
+    validate_summary(agent_manager.get_agent("summarize_validator"), text, summary)
+
+
+def validate_summary(validator_agent, original_text: str, summary: str) -> None:
+    with st.spinner("Validating summary..."):
+        try:
+            validation = validator_agent.execute(original_text=original_text, summary=summary)
+            st.subheader("Validation:")
+            st.write(validation)
+        except Exception as e:
+            st.error(f"Validation Error: {e}")
+            logger.error(f"SummarizeValidatorAgent Error: {e}")
+
+
 def write_and_refine_article_section(agent_manager: AgentManager, server_address: str, model_name: str) -> None:
     st.header("Write and Refine Research Article")
     topic = st.text_input("Enter the topic for the research article:")
     outline = st.text_area("Enter an outline (optional):", height=150)
+    use_sources = st.checkbox("Ground the article in indexed papers and search results", value=True)
     if st.button("Write and Refine Article"):
         if topic:
+            retriever = get_source_retriever(server_address) if use_sources else None
+            if len(split_outline(outline)) > 1:
+                write_article_in_sections(agent_manager, topic, outline, server_address, model_name, retriever)
+                return
             writer_agent = agent_manager.get_agent("write_article")
             refiner_agent = agent_manager.get_agent("refiner")
             validator_agent = agent_manager.get_agent("validator")
             with st.spinner("Writing article..."):
                 try:
-                    draft_result = writer_agent.execute(topic, outline)
-                    draft = draft_result.article if hasattr(draft_result, 'article') else draft_result
                     st.subheader("Draft Article:")
-                    st.write(draft)
+                    context = retriever.context_for(f"{topic}\n{outline}") if retriever is not None else None
+                    draft_stream = writer_agent.execute_stream(topic, outline, context=context)
+                    st.write_stream(draft_stream)
+                    draft = draft_stream.result.article
                 except Exception as e:
                     st.error(f"Error: {e}")
                     logger.error(f"WriteArticleAgent Error: {e}")
@@ -197,9 +258,10 @@ def write_and_refine_article_section(agent_manager: AgentManager, server_address
 
             with st.spinner("Refining article..."):
                 try:
-                    refined_article = refiner_agent.execute(draft)
                     st.subheader("Refined Article:")
-                    st.write(refined_article)
+                    refined_stream = refiner_agent.execute_stream(draft)
+                    st.write_stream(refined_stream)
+                    refined_article = refined_stream.result
                 except Exception as e:
                     st.error(f"Refinement Error: {e}")
                     logger.error(f"RefinerAgent Error: {e}")
@@ -217,48 +279,102 @@ def write_and_refine_article_section(agent_manager: AgentManager, server_address
             st.warning("Please enter a topic for the research article.")
 
 
+def write_article_in_sections(
+    agent_manager: AgentManager, topic: str, outline: str, server_address: str, model_name: str, retriever=None
+) -> None:
+    """Draft and refine each outline section as a pipeline, showing sections as they finish."""
+    sections = split_outline(outline)
+    pipeline = build_article_pipeline(agent_manager, topic, outline, server_address, model_name, retriever=retriever)
+    refined_sections: List[Optional[str]] = [None] * len(sections)
+    stage_totals = {}
+    with st.spinner(f"Writing and refining {len(sections)} sections..."):
+        for event in pipeline.run_iter(sections):
+            stage_totals[event.stage] = stage_totals.get(event.stage, 0.0) + event.timing.duration
+            title = sections[event.item]
+            if event.error:
+                st.error(f"Section '{title}' failed while running {event.stage}: {event.error}")
+                logger.error(f"Article pipeline error in {event.stage} for section '{title}': {event.error}")
+            elif event.stage == "draft":
+                with st.expander(f"Draft: {title}"):
+                    st.write(event.output)
+            else:
+                refined_sections[event.item] = event.output
+                st.subheader(f"Refined: {title}")
+                st.write(event.output)
+    refined_article = "\n\n".join(section for section in refined_sections if section)
+    if not refined_article:
+        return
+
+    with st.spinner("Validating article..."):
+        try:
+            validation = agent_manager.get_agent("validator").execute(topic=topic, article=refined_article)
+            st.subheader("Validation:")
+            st.write(validation)
+        except Exception as e:
+            st.error(f"Validation Error: {e}")
+            logger.error(f"ValidatorAgent Error: {e}")
+    st.caption("Stage time: " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in stage_totals.items()))
+
+
 # new functions that need agent configuration
-def search_arxiv_papers() -> None:
+def search_arxiv_papers(server_address: str) -> None:
+    from utils.arxiv_search import get_arxiv_search
     st.header("Search arXiv Papers")
-    query = st.text_input("Enter search query for arXiv:")
+    query = st.text_input("Enter search query for arXiv (separate several queries with ';'):")
+    max_results = st.number_input("Results per query", min_value=1, max_value=100, value=10)
+    sort_by = st.selectbox("Sort by", ["relevance", "submitted", "updated"])
+    cite = st.checkbox("Add results to the bibliography")
     if st.button("Search arXiv"):
-        if query:
+        queries = [part.strip() for part in query.split(";") if part.strip()]
+        if queries:
+            service = get_arxiv_search()
             try:
-                search = arxiv.Search(
-                    query=query,
-                    max_results=10,
-                    sort_by=arxiv.SortCriterion.Relevance
+                if len(queries) == 1:
+                    st.subheader("Search Results:")
+                    # Results render as each page arrives; repeated searches come from the cache
+                    papers = []
+                    for paper in service.iter_results(queries[0], int(max_results), sort_by):
+                        render_arxiv_paper(paper)
+                        papers.append(paper)
+                    if not papers:
+                        st.info("No results.")
+                else:
+                    with st.spinner(f"Searching {len(queries)} queries..."):
+                        results = service.search_many(queries, int(max_results), sort_by)
+                    for search_query, found in results.items():
+                        st.subheader(f"Results for '{search_query}':")
+                        for paper in found:
+                            render_arxiv_paper(paper)
+                        if not found:
+                            st.info("No results.")
+                    papers = [paper for found in results.values() for paper in found]
+                if cite and papers:
+                    from utils.citation_store import get_citation_store
+                    added = get_citation_store().add_many(papers)
+                    st.caption(f"Added {added} new citation(s) to the bibliography.")
+                # Keep the abstracts for retrieval-augmented writing
+                index_passages(
+                    [(f"{paper.title}\n{paper.summary}", paper.url, {"title": paper.title}) for paper in papers],
+                    server_address,
                 )
-                results = []
-                for result in search.results():
-                    summary = getattr(result, 'summary', None)
-                    authors = [author.name for author in getattr(result, 'authors', [])] if hasattr(result, 'authors') else None
-                    if not summary or not authors:
-                        continue
-                    title = getattr(result, 'title', str(result))
-                    url = getattr(result, 'entry_id', '')
-                    results.append({'title': title, 'summary': summary, 'authors': authors, 'url': url})
-                st.subheader("Search Results:")
-                for result in results:
-                    with st.container():
-                        st.markdown(f"### [{result['title']}]({result['url']})")
-                        st.write(f"**Authors:** {', '.join(result['authors'])}")
-                        st.write(f"**Summary:** {result['summary']}")
-                        st.write(f"[Read more]({result['url']})")
-                        st.write("---")
             except Exception as e:
                 st.error(f"Error: {e}")
                 logger.error(f"arXiv search error: {e}")
         else:
             st.warning("Please enter a search query.")
 
-def search_web() -> None:
+def render_arxiv_paper(paper) -> None:
+    with st.container():
+        st.markdown(f"### [{paper.title}]({paper.url})")
+        st.write(f"**Authors:** {', '.join(paper.authors)}")
+        st.write(f"**Summary:** {paper.summary}")
+        st.write(f"[Read more]({paper.url})")
+        st.write("---")
+
+def search_web(server_address: str, model_name: str) -> None:
     st.header("Search Web")
     query = st.text_input("Enter search query for the web:")
     api_key = st.secrets["SERPER_API_KEY"] if "SERPER_API_KEY" in st.secrets else st.text_input("Enter Serper API Key:")
-    # Use sidebar-selected model and server, fallback to string defaults if None
-    server_address = st.session_state.get('server_address') or "http://localhost:11434"
-    model_name = st.session_state.get('model_name') or "deepseek-r1:1.5b"
     if st.button("Search Web"):
         if query and api_key:
             from agents.web_search_agent import WebSearchAgent
@@ -266,9 +382,14 @@ def search_web() -> None:
             with st.spinner("Searching the web and validating results..."):
                 try:
                     search_agent = WebSearchAgent(api_key=api_key, backend="serper", max_results=10)
-                    validator_agent = WebSearchValidatorAgent(model_name=str(model_name), server_address=str(server_address), max_results=10)
+                    validator_agent = WebSearchValidatorAgent(model_name=str(model_name), server_address=str(server_address), max_results=10, batch_size=5)
                     results = search_agent.search(query)
                     validated_results = validator_agent.validate(results)
+                    index_passages(
+                        [(f"{r.get('title', '')}\n{r.get('snippet', '')}", r.get('url'), {"title": r.get('title')})
+                         for r in validated_results if r.get('snippet')],
+                        server_address,
+                    )
                     st.subheader("Search Results:")
                     for result in validated_results:
                         st.markdown(f"### [{result.get('title','')}]({result.get('url','')})")
@@ -282,17 +403,29 @@ def search_web() -> None:
             st.warning("Please enter a search query and API key.")
 
     # --- Sidebar: View Citations ---
-    if "citations" in st.session_state and st.session_state["citations"]:
-        with st.sidebar.expander("View Citations", expanded=False):
+    from utils.citation_store import get_citation_store
+    citations = get_citation_store()
+    total = len(citations)
+    if total:
+        with st.sidebar.expander(f"View Citations ({total})", expanded=False):
+            style = st.radio("Format", ["APA", "BibTeX"], horizontal=True, key="citation_style")
             st.markdown("**Collected Citations:**")
-            for i, citation in enumerate(st.session_state["citations"]):
-                st.code(citation, language="text")
-            st.download_button(
-                label="Download All Citations (txt)",
-                data="\n\n".join(st.session_state["citations"]),
-                file_name="citations.txt",
-                mime="text/plain"
-            )
+            for citation in citations.iter_citations(limit=50):
+                st.code(citation.format(style), language="text")
+            if total > 50:
+                st.caption(f"Showing 50 of {total}; download for the full list.")
+            # Formatting every citation is only worth it when someone asks for the file
+            export_key = (total, style)
+            if st.button("Prepare Download"):
+                st.session_state["citation_export"] = (export_key, "\n\n".join(citations.iter_formatted(style)))
+            export = st.session_state.get("citation_export")
+            if export and export[0] == export_key:
+                st.download_button(
+                    label=f"Download All Citations ({'bib' if style == 'BibTeX' else 'txt'})",
+                    data=export[1],
+                    file_name="citations.bib" if style == "BibTeX" else "citations.txt",
+                    mime="text/plain"
+                )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,115 @@
+# benchmarks/import_time.py
+"""
+Cold-start import benchmark for the modules workers and batch jobs load.
+
+Each module is imported in a fresh interpreter; the best of several runs is
+compared against the "import:<module>" entries in budgets.json, and the run fails
+if a module pulls in a dependency it must not load at import time (Streamlit,
+arXiv, or the OpenAI SDK for the lightweight entry points).
+
+Usage:
+    python -m benchmarks.import_time --budgets benchmarks/budgets.json
+    python -m benchmarks.import_time --module agents.batch_runner --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from .run_benchmarks import check_budgets
+
+# Module -> dependencies that must not be imported as a side effect of importing it
+MODULES: Dict[str, Tuple[str, ...]] = {
+    "agents": ("streamlit", "arxiv", "openai"),
+    "agents.__main__": ("streamlit", "arxiv", "openai"),
+    "agents.batch_runner": ("streamlit", "arxiv", "openai"),
+    "agents.pipeline": ("streamlit", "arxiv", "openai"),
+    "agents.model_catalog": ("streamlit", "arxiv", "openai"),
+    "agents.scheduler": ("streamlit", "arxiv", "openai"),
+    "agents.summarize_tool": ("streamlit", "arxiv"),
+    "agents.validator_agent": ("streamlit", "arxiv"),
+    "utils.document_store": ("streamlit", "arxiv", "PyPDF2", "bs4"),
+}
+
+_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({{'import_ms': elapsed * 1000, 'loaded': [m for m in {forbidden!r} if m in sys.modules]}}))\n"
+)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str, forbidden: Tuple[str, ...], runs: int = 3) -> Dict[str, object]:
+    """Import ``module`` in ``runs`` fresh interpreters; report the fastest time and any forbidden imports."""
+    best: Optional[float] = None
+    loaded: List[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, forbidden=forbidden)],
+            cwd=_ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        best = sample["import_ms"] if best is None else min(best, sample["import_ms"])
+        loaded = sample["loaded"]
+    return {"import_ms": best or 0.0, "loaded": loaded}
+
+
+def _importtime(code: str) -> List[Tuple[int, str]]:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=_ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            entries.append((int(cumulative), name.strip()))
+    return entries
+
+
+def slowest_imports(module: str, top: int = 10) -> List[Tuple[int, str]]:
+    """The ``top`` dependencies of ``module`` by cumulative import time (microseconds), from -X importtime."""
+    startup = {name for _, name in _importtime("pass")}  # imported before -c runs (site, .pth files)
+    entries = [(cumulative, name) for cumulative, name in _importtime(f"import {module}") if name not in startup]
+    return sorted(entries, reverse=True)[:top]
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the agent modules.")
+    parser.add_argument("--module", action="append", default=None, help="module to measure (repeatable; default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module (best is kept)")
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports of each module")
+    parser.add_argument("--budgets", default=None, help="JSON file with import:<module> limits")
+    args = parser.parse_args(argv)
+
+    modules = args.module or list(MODULES)
+    results: Dict[str, Dict[str, float]] = {}
+    failures: List[str] = []
+    print(f"{'module':<28}{'import ms':>11}")
+    print("-" * 39)
+    for module in modules:
+        stats = measure(module, MODULES.get(module, ("streamlit",)), args.runs)
+        results[f"import:{module}"] = {"import_ms": float(stats["import_ms"])}  # type: ignore[arg-type]
+        print(f"{module:<28}{stats['import_ms']:>11.1f}")
+        if stats["loaded"]:
+            failures.append(f"import:{module}: loads {', '.join(stats['loaded'])} at import time")  # type: ignore[arg-type]
+        for cumulative, name in slowest_imports(module, args.top) if args.top else []:
+            print(f"    {cumulative / 1000:>9.1f}  {name}")
+
+    if args.budgets:
+        with open(args.budgets, "r", encoding="utf-8") as f:
+            failures += check_budgets(results, json.load(f))
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
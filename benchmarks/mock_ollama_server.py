@@ -0,0 +1,224 @@
+# benchmarks/mock_ollama_server.py
+"""
+Local stand-in for an Ollama server, for benchmarks and offline runs.
+
+Implements the endpoints the agents use: OpenAI-compatible chat completions
+(plain and streamed), embeddings, and Ollama's /api/tags and /api/ps. Latency is
+simulated as a time-to-first-token plus a per-token delay, and a fraction of
+requests can be made to fail to exercise retry paths. No GPU or model needed.
+
+Run standalone:
+    python -m benchmarks.mock_ollama_server --port 11435 --token-latency 0.002
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+_NUMBERED_ITEM_RE = re.compile(r"^\[(\d+)\]", re.MULTILINE)
+
+
+class MockSettings:
+    def __init__(
+        self,
+        ttft: float = 0.02,
+        token_latency: float = 0.001,
+        completion_tokens: int = 64,
+        error_rate: float = 0.0,
+        models: Optional[List[str]] = None,
+        seed: int = 0,
+        parallel: int = 0,
+    ) -> None:
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.models = models or ["deepseek-r1:1.5b", "llama3.2:3b"]
+        self.random = random.Random(seed)
+        # Like OLLAMA_NUM_PARALLEL: requests beyond this many queue for a slot (0 = unlimited)
+        self.slots = threading.BoundedSemaphore(parallel) if parallel else None
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                return True
+            return False
+
+
+def _reply_text(messages: List[Dict[str, Any]], completion_tokens: int, max_tokens: Optional[int]) -> List[str]:
+    """Build a deterministic reply as a list of tokens, shaped like what each agent expects."""
+    system = str(messages[0].get("content", "")) if messages else ""
+    user = str(messages[-1].get("content", "")) if messages else ""
+    if "numbered list" in system:
+        items = _NUMBERED_ITEM_RE.findall(user)
+        return [f"{item}: {'VALID' if int(item) % 2 else 'INVALID'}\n" for item in items]
+    if "VALID or INVALID" in system:
+        return ["VALID"]
+    digest = hashlib.sha256(user.encode("utf-8")).hexdigest()
+    count = min(completion_tokens, max_tokens) if max_tokens else completion_tokens
+    return [f"tok{digest[i % 64]}{i} " for i in range(count)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    settings: MockSettings
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/api/tags":
+            self._send_json(200, {"models": [{"name": name, "model": name} for name in self.settings.models]})
+        elif self.path.rstrip("/") == "/api/ps":
+            self._send_json(200, {"models": [{"name": name, "model": name} for name in self.settings.models[:1]]})
+        elif self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": name, "object": "model"} for name in self.settings.models]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        request = self._read_json()
+        if self.settings.should_fail():
+            self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+            return
+        path = self.path.rstrip("/")
+        if path == "/v1/chat/completions":
+            if self.settings.slots is None:
+                self._chat(request)
+            else:
+                with self.settings.slots:
+                    self._chat(request)
+        elif path == "/v1/embeddings":
+            self._embeddings(request)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _chat(self, request: Dict[str, Any]) -> None:
+        settings = self.settings
+        tokens = _reply_text(request.get("messages", []), settings.completion_tokens, request.get("max_tokens"))
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": request.get("model", "")}
+        time.sleep(settings.ttft)
+        if not request.get("stream"):
+            time.sleep(settings.token_latency * len(tokens))
+            self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(tokens)},
+            }]))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(data: str) -> None:
+            payload = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for token in tokens:
+                send_event(json.dumps(dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "delta": {"content": token}, "finish_reason": None,
+                }])))
+                time.sleep(settings.token_latency)
+            send_event(json.dumps(dict(base, object="chat.completion.chunk", usage=usage, choices=[{
+                "index": 0, "delta": {}, "finish_reason": "stop",
+            }])))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client closed the stream early
+
+    def _embeddings(self, request: Dict[str, Any]) -> None:
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(self.settings.ttft)
+        data = []
+        for index, text in enumerate(inputs):
+            digest = hashlib.sha256(str(text).encode("utf-8")).digest()
+            data.append({"object": "embedding", "index": index, "embedding": [b / 255.0 - 0.5 for b in digest[:16]]})
+        self._send_json(200, {
+            "object": "list", "model": request.get("model", ""), "data": data,
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        })
+
+
+class MockOllamaServer:
+    """Threaded mock server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, settings: Optional[MockSettings] = None) -> None:
+        self.settings = settings or MockSettings()
+        handler = type("MockHandler", (_Handler,), {"settings": self.settings})
+        server_class = type("MockHTTPServer", (ThreadingHTTPServer,), {"request_queue_size": 128})
+        self._server = server_class((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a mock Ollama/OpenAI-compatible server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--ttft", type=float, default=0.02, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.001, help="seconds per generated token")
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--parallel", type=int, default=0, help="requests generated concurrently (0 = unlimited)")
+    args = parser.parse_args(argv)
+    settings = MockSettings(args.ttft, args.token_latency, args.completion_tokens, args.error_rate, parallel=args.parallel)
+    server = MockOllamaServer(args.host, args.port, settings)
+    print(f"Mock Ollama server listening on {server.address}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark every agent and the Streamlit-free pipelines against the local mock
+Ollama server. Reports throughput, p50/p95/p99 latency and allocations per
+scenario, and fails (exit code 1) when a scenario exceeds its latency budget.
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --only summarize,web_search_validate --json bench_output.json
+    python -m benchmarks.run_benchmarks --budgets benchmarks/budgets.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from .mock_ollama_server import MockOllamaServer, MockSettings
+
+LONG_TEXT = "\n\n".join(
+    " ".join(f"Paragraph {p} sentence {s} describes a measurement of the system under test." for s in range(6))
+    for p in range(120)
+)
+SEARCH_RESULTS = [
+    {"title": f"Result {i}", "snippet": f"Snippet about topic {i}", "url": f"https://example.org/{i}"}
+    for i in range(10)
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def build_scenarios(server: str, manager: Any, pool: Optional[str] = None) -> Dict[str, Callable[[], Any]]:
+    from agents.batch_runner import BatchRunner
+    from agents.pipeline import run_article_pipeline
+    from agents.web_search_validator_agent import WebSearchValidatorAgent
+
+    summarize = manager.get_agent("summarize")
+    map_reduce = type(summarize)(verbose=False)
+    map_reduce.chunk_tokens = 800
+    map_reduce.chunk_overlap = 50
+
+    def consume_stream() -> None:
+        stream = summarize.execute_stream("A short abstract to summarize.", server)
+        for _ in stream:
+            pass
+
+    async def async_fanout(address: str) -> None:
+        await asyncio.gather(*(
+            summarize.execute_async(f"Abstract number {i}.", address) for i in range(16)
+        ))
+
+    def web_search(batch_size: int) -> Callable[[], Any]:
+        validator = WebSearchValidatorAgent(server_address=server, max_results=10, batch_size=batch_size, verbose=False)
+        return lambda: validator.validate(SEARCH_RESULTS)
+
+    def batch_runner() -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = os.path.join(tmp, "jobs.jsonl")
+            with open(jobs, "w", encoding="utf-8") as f:
+                for i in range(24):
+                    f.write(json.dumps({"id": str(i), "type": "summarize", "text": f"Document {i}."}) + "\n")
+            BatchRunner(manager, workers=8, server_address=server).run(jobs, os.path.join(tmp, "out.jsonl"))
+
+    return {
+        "summarize": lambda: summarize.execute("A short abstract to summarize.", server),
+        "summarize_stream": consume_stream,
+        "summarize_map_reduce": lambda: map_reduce.execute(LONG_TEXT, server),
+        "summarize_async_fanout_16": lambda: asyncio.run(async_fanout(server)),
+        "summarize_pool_fanout_16": lambda: asyncio.run(async_fanout(pool or server)),
+        "write_article": lambda: manager.get_agent("write_article").execute("Benchmarking", "Intro", server),
+        "refiner": lambda: manager.get_agent("refiner").execute("Draft text.", server),
+        "sanitize_data": lambda: manager.get_agent("sanitize_data").execute("Patient John Smith, seen 03/04/2021.", server),
+        "sanitize_data_prescan_only": lambda: manager.get_agent("sanitize_data").execute("03/04/2021, 555-123-4567", server),
+        "summarize_validator": lambda: manager.get_agent("summarize_validator").execute("Original.", "Summary.", server),
+        "write_article_validator": lambda: manager.get_agent("write_article_validator").execute("Article.", server),
+        "sanitize_data_validator": lambda: manager.get_agent("sanitize_data_validator").execute("Patient [NAME] saw Dr. Lee.", server),
+        "validator": lambda: manager.get_agent("validator").execute("Topic", "Article.", server),
+        "web_search_validate": web_search(1),
+        "web_search_validate_batched": web_search(5),
+        "article_pipeline": lambda: run_article_pipeline(manager, "Benchmarking", "Intro\nMethods\nResults", server),
+        "batch_runner_24_jobs": batch_runner,
+    }
+
+
+def run_scenario(fn: Callable[[], Any], iterations: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+
+    # Allocations are measured in a separate pass so tracing doesn't skew latency
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+
+    return {
+        "iterations": iterations,
+        "throughput_per_s": iterations / wall if wall else 0.0,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_alloc_kb": peak / 1024,
+        "retained_alloc_kb": allocated / 1024,
+    }
+
+
+def check_budgets(results: Dict[str, Dict[str, float]], budgets: Dict[str, Dict[str, float]]) -> List[str]:
+    """Return a message for every metric that exceeds its budget (budget keys match result keys)."""
+    failures = []
+    for name, limits in budgets.items():
+        if name not in results:
+            continue
+        for metric, limit in limits.items():
+            value = results[name].get(metric)
+            if value is not None and value > limit:
+                failures.append(f"{name}: {metric}={value:.1f} exceeds budget {limit:.1f}")
+    return failures
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark agents against a mock Ollama server.")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--only", default="", help="comma-separated scenario names")
+    parser.add_argument("--ttft", type=float, default=0.02)
+    parser.add_argument("--token-latency", type=float, default=0.0005)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=4, help="concurrent generations per mock server, like OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this JSON file")
+    parser.add_argument("--budgets", default=None, help="JSON file of per-scenario metric limits")
+    args = parser.parse_args(argv)
+
+    from agents import AgentManager
+    from agents.response_cache import configure_response_cache
+
+    configure_response_cache(max_entries=0)  # measure the model path, not the cache
+    def settings() -> MockSettings:
+        return MockSettings(args.ttft, args.token_latency, args.completion_tokens, args.error_rate, parallel=args.parallel)
+
+    results: Dict[str, Dict[str, float]] = {}
+    with MockOllamaServer(settings=settings()) as server, MockOllamaServer(settings=settings()) as second:
+        scenarios = build_scenarios(server.address, AgentManager(verbose=False), f"{server.address},{second.address}")
+        selected = [name for name in args.only.split(",") if name] or list(scenarios)
+        for name in selected:
+            if name not in scenarios:
+                parser.error(f"unknown scenario '{name}'")
+            try:
+                results[name] = run_scenario(scenarios[name], args.iterations)
+            except Exception as e:
+                results[name] = {"error": str(e)}  # type: ignore[dict-item]
+
+    header = f"{'scenario':<28}{'ops/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>11}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        if "error" in stats:
+            print(f"{name:<28} ERROR: {stats['error']}")
+            continue
+        print(f"{name:<28}{stats['throughput_per_s']:>9.1f}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['peak_alloc_kb']:>11.0f}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failures = [f"{name}: {stats['error']}" for name, stats in results.items() if "error" in stats]
+    if args.budgets:
+        with open(args.budgets, "r", encoding="utf-8") as f:
+            failures += check_budgets(results, json.load(f))
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,27 @@
 import subprocess
 import sys
 
+# Offline unit tests first; test_agent_suite.py needs a running Ollama server
+TEST_MODULES = [
+    "test_phi_scanner.py",
+    "test_openai_response.py",
+    "test_summarize_tool.py",
+    "test_server_pool.py",
+    "test_scheduler.py",
+    "test_citation_store.py",
+    "test_web_search_validator.py",
+    "test_resilience.py",
+    "test_dataset_sanitizer.py",
+    "test_batch_runner.py",
+    "test_logger.py",
+    "test_agent_suite.py",
+]
+
 class TestRunner:
     @staticmethod
     def run_tests():
         print("Running agent test suite...")
-        result = subprocess.run([sys.executable, "-m", "unittest", "test_agent_suite.py"], capture_output=True, text=True)
+        result = subprocess.run([sys.executable, "-m", "unittest", *TEST_MODULES], capture_output=True, text=True)
         print(result.stdout)
         print(result.stderr)
         if result.returncode == 0:
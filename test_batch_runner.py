@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+from agents.batch_runner import BatchRunner, load_checkpoint
+
+
+class Crash(BaseException):
+    """Stands in for the process dying: unlike Exception, it is not recorded as a failed job."""
+
+
+class FakeSummarizer:
+    def __init__(self, crash_on_call=None, fail_ids=()):
+        self.crash_on_call = crash_on_call
+        self.fail_ids = set(fail_ids)
+        self.calls = 0
+        self.seen = []
+        self.lock = threading.Lock()
+
+    def execute(self, text, server_address=None, model_name=None):
+        with self.lock:
+            self.calls += 1
+            if self.calls == self.crash_on_call:
+                raise Crash()
+            self.seen.append(text)
+        if text in self.fail_ids:
+            raise RuntimeError("model error")
+        return SimpleNamespace(summary=text.upper())
+
+
+class FakeManager:
+    def __init__(self, summarizer):
+        self.summarizer = summarizer
+
+    def get_agent(self, name):
+        return self.summarizer
+
+
+class TestBatchRunnerResume(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.jobs = os.path.join(directory.name, "jobs.jsonl")
+        self.output = os.path.join(directory.name, "results.jsonl")
+        with open(self.jobs, "w", encoding="utf-8") as f:
+            for i in range(40):
+                f.write(json.dumps({"id": f"doc-{i}", "type": "summarize", "text": f"doc-{i}"}) + "\n")
+
+    def run_jobs(self, summarizer, **kwargs):
+        return BatchRunner(FakeManager(summarizer), workers=4).run(self.jobs, self.output, **kwargs)
+
+    def read_output(self):
+        with open(self.output, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_resume_after_a_crash_runs_only_unrecorded_jobs(self):
+        with self.assertRaises(Crash):
+            self.run_jobs(FakeSummarizer(crash_on_call=15))
+        recorded = {record["id"] for record in self.read_output()}
+        self.assertTrue(recorded)
+        with open(self.output, "a", encoding="utf-8") as f:
+            f.write('{"id": "doc-39", "status": "o')  # torn write from the crash
+
+        summarizer = FakeSummarizer()
+        counts = self.run_jobs(summarizer, resume=True)
+        self.assertEqual(counts["skipped"], len(recorded))
+        self.assertEqual(set(summarizer.seen), {f"doc-{i}" for i in range(40)} - recorded)
+        records = self.read_output()  # every line parses: the torn one was dropped
+        ids = [record["id"] for record in records]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), {f"doc-{i}" for i in range(40)})
+        self.assertTrue(all(record["status"] == "ok" for record in records))
+
+    def test_load_checkpoint_truncates_a_torn_last_line(self):
+        lines = [json.dumps({"id": "a", "status": "ok"}), json.dumps({"id": "b", "status": "error"})]
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + '\n{"id": "c", "sta')
+        self.assertEqual(load_checkpoint(self.output), {"a", "b"})
+        with open(self.output, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "\n".join(lines) + "\n")
+        self.assertEqual(load_checkpoint(self.output, retry_failed=True), {"a"})
+
+    def test_load_checkpoint_truncates_at_a_line_that_is_not_an_object(self):
+        head = json.dumps({"id": "a", "status": "ok"}) + "\n"
+        for bad in ("[]", '"x"', "1"):
+            with self.subTest(line=bad):
+                with open(self.output, "w", encoding="utf-8") as f:
+                    f.write(head + bad + "\n" + json.dumps({"id": "b", "status": "ok"}) + "\n")
+                self.assertEqual(load_checkpoint(self.output), {"a"})
+                with open(self.output, encoding="utf-8") as f:
+                    self.assertEqual(f.read(), head)
+
+    def test_repeated_id_is_reported_as_an_error(self):
+        with open(self.jobs, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": "doc-5", "type": "summarize", "text": "another doc"}) + "\n")
+        summarizer = FakeSummarizer()
+        counts = self.run_jobs(summarizer)
+        self.assertEqual(counts, {"ok": 40, "error": 1, "skipped": 0})
+        self.assertNotIn("another doc", summarizer.seen)
+        errors = [record for record in self.read_output() if record["status"] == "error"]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]["id"], "doc-5")
+        self.assertIn("duplicate id", errors[0]["error"])
+
+    def test_retry_failed_reruns_only_failed_jobs(self):
+        self.run_jobs(FakeSummarizer(fail_ids={"doc-3", "doc-17"}))
+        summarizer = FakeSummarizer()
+        counts = self.run_jobs(summarizer, resume=True, retry_failed=True)
+        self.assertEqual(sorted(summarizer.seen), ["doc-17", "doc-3"])
+        self.assertEqual(counts, {"ok": 2, "error": 0, "skipped": 38})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from utils.citation_store import CitationStore, citation_key
+
+PAPERS = [
+    {"title": "Attention Is All You Need", "authors": ["Ashish Vaswani"], "url": "https://arxiv.org/abs/1706.03762v5"},
+    {"title": "Deep Residual Learning", "authors": ["Kaiming He"], "year": "2015"},
+]
+
+
+class TestCitationStoreAddMany(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = CitationStore(os.path.join(directory.name, "citations.sqlite3"))
+        self.addCleanup(self.store.close)
+
+    def test_duplicates_within_a_batch_are_stored_once(self):
+        duplicate = dict(PAPERS[0], url="https://arxiv.org/pdf/1706.03762")
+        self.assertEqual(self.store.add_many(PAPERS + [duplicate]), 2)
+        self.assertEqual(len(self.store), 2)
+
+    def test_failed_commit_does_not_mark_keys_as_stored(self):
+        db = self.store._db
+        failing = mock.MagicMock(wraps=db)
+        failing.commit.side_effect = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(self.store, "_db", failing):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.store.add_many(PAPERS)
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.add_many(PAPERS), 2)
+        self.assertEqual(len(self.store), 2)
+    def test_failed_commit_rolls_back_a_single_add(self):
+        db = self.store._db
+        failing = mock.MagicMock(wraps=db)
+        failing.commit.side_effect = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(self.store, "_db", failing):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.store.add(PAPERS[0])
+        failing.rollback.assert_called_once()
+        self.assertFalse(db.in_transaction)
+        self.assertEqual(len(self.store), 0)
+        self.assertTrue(self.store.add(PAPERS[0])[1])
+        self.assertEqual(len(self.store), 1)
+
+    def test_untitled_records_are_keyed_by_url(self):
+        untitled = [{"url": "https://example.org/a"}, {"url": "https://example.org/b"}]
+        self.assertEqual(self.store.add_many(untitled + [{"url": "http://www.Example.org/a/"}]), 2)
+        self.assertEqual(citation_key("", url="https://example.org/a"), "url:example.org/a")
+
+    def test_records_with_nothing_to_key_by_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.store.add({"title": "  ", "authors": ["Anon"]})
+        with self.assertRaises(ValueError):
+            self.store.add_many(PAPERS + [{"authors": ["Anon"]}])
+        self.assertEqual(len(self.store), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
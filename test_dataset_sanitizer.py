@@ -0,0 +1,109 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from agents.dataset_sanitizer import Checkpoint, DatasetSanitizer
+
+
+class UppercaseTool:
+    """Stand-in for SanitizeDataTool: upper-cases string values and can fail on its n-th call."""
+
+    def __init__(self, fail_on_call=None):
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+        self.seen = []
+        self.lock = threading.Lock()
+
+    def execute_records(self, records, server_address=None, model_name=None):
+        with self.lock:
+            self.calls += 1
+            if self.calls == self.fail_on_call:
+                raise RuntimeError("server went away")
+            self.seen.extend(records)
+        return [{k: v.upper() if isinstance(v, str) else v for k, v in record.items()} for record in records]
+
+
+class TestDatasetSanitizerResume(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def sanitizer(self, tool):
+        return DatasetSanitizer(tool, workers=3, batch_tokens=40, max_batch_records=5, fields=["name", "note"])
+
+    def write_csv(self, rows):
+        path = self.path("in.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "name", "note"])
+            for i in range(rows):
+                # Quoted newlines and commas must not confuse the record count on resume
+                writer.writerow([i, f"name {i}", f"line one\nline, {i}" if i % 7 == 0 else f"note {i}"])
+        return path
+
+    def interrupt_and_resume(self, input_path, output_name, torn_tail):
+        reference = self.path("reference" + os.path.splitext(output_name)[1])
+        self.sanitizer(UppercaseTool()).run(input_path, reference)
+        output = self.path(output_name)
+        with self.assertRaises(RuntimeError):
+            self.sanitizer(UppercaseTool(fail_on_call=8)).run(input_path, output)
+        done = Checkpoint(output).load()["records"]
+        self.assertGreater(done, 0)
+        with open(output, "ab") as f:
+            f.write(torn_tail)  # a write cut off by the crash, after the last checkpoint
+
+        tool = UppercaseTool()
+        counts = self.sanitizer(tool).run(input_path, output, resume=True)
+        self.assertEqual(counts["skipped"], done)
+        with open(reference, "rb") as expected, open(output, "rb") as actual:
+            self.assertEqual(actual.read(), expected.read())
+        return done, tool
+
+    def test_csv_resume_reprocesses_only_unwritten_records(self):
+        input_path = self.write_csv(120)
+        done, tool = self.interrupt_and_resume(input_path, "out.csv", b'121,"NAME 1')
+        self.assertEqual([record["name"] for record in tool.seen], [f"name {i}" for i in range(done, 120)])
+        with open(self.path("out.csv"), newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["id"] for row in rows], [str(i) for i in range(120)])
+        self.assertEqual(rows[7]["note"], "LINE ONE\nLINE, 7")
+
+    def test_jsonl_resume_leaves_no_torn_or_duplicate_lines(self):
+        input_path = self.path("in.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for i in range(100):
+                f.write(json.dumps({"id": i, "name": f"name {i}", "note": f"note {i}", "meta": {"n": i}}) + "\n")
+        done, tool = self.interrupt_and_resume(input_path, "out.jsonl", b'{"id": 99, "na')
+        self.assertEqual(len(tool.seen), 100 - done)
+        with open(self.path("out.jsonl"), encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record["id"] for record in records], list(range(100)))
+
+    def test_completed_run_is_not_repeated(self):
+        input_path = self.write_csv(20)
+        output = self.path("out.csv")
+        self.sanitizer(UppercaseTool()).run(input_path, output)
+        tool = UppercaseTool()
+        self.assertEqual(self.sanitizer(tool).run(input_path, output, resume=True)["skipped"], 20)
+        self.assertEqual(tool.calls, 0)
+
+    def test_checkpoint_for_a_different_input_is_refused(self):
+        input_path = self.write_csv(20)
+        output = self.path("out.csv")
+        with self.assertRaises(RuntimeError):
+            self.sanitizer(UppercaseTool(fail_on_call=3)).run(input_path, output)
+        with open(input_path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow([20, "name 20", "note 20"])
+        with self.assertRaises(ValueError):
+            self.sanitizer(UppercaseTool()).run(input_path, output, resume=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
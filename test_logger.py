@@ -0,0 +1,41 @@
+import io
+import sys
+import unittest
+from unittest import mock
+
+from loguru import logger
+
+from agents.agent_base import AgentBase
+from utils.logger import configure_logging
+
+
+class TestLazyPayloadLogging(unittest.TestCase):
+    def setUp(self):
+        self.agent = AgentBase(name="LoggingProbe", verbose=True)
+        self.messages = [{"role": "user", "content": "Patient John Smith, seen 03/04/2021."}]
+        self.addCleanup(self.restore_default_sink)
+
+    @staticmethod
+    def restore_default_sink():
+        logger.remove()
+        logger.add(sys.stderr)
+
+    def digests_computed(self, **levels):
+        configure_logging(log_file=None, console=io.StringIO(), **levels)
+        with mock.patch("agents.agent_base.describe_messages", return_value="") as describe:
+            self.agent.log_request("m", self.messages)
+        logger.complete()
+        return describe.call_count
+
+    def test_payload_is_not_hashed_without_a_debug_sink(self):
+        self.assertEqual(self.digests_computed(console_level="INFO"), 0)
+
+    def test_payload_is_hashed_for_a_debug_sink(self):
+        self.assertEqual(self.digests_computed(console_level="DEBUG"), 1)
+
+    def test_module_level_lowers_the_sink_minimum(self):
+        self.assertEqual(self.digests_computed(console_level="INFO", module_levels={"test_logger": "DEBUG"}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
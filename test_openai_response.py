@@ -0,0 +1,28 @@
+import unittest
+
+from agents import metrics
+from agents.openai_response import stream_chat_response
+from agents.resilience import SERVER, CircuitOpenError, configure_resilience, get_circuit_breaker
+
+SERVERS = "http://pool-a.invalid:11434,http://pool-b.invalid:11434"
+
+
+class TestStreamChatResponse(unittest.TestCase):
+    def setUp(self):
+        configure_resilience(failure_threshold=1, reset_timeout=60.0)
+        metrics.reset_metrics()
+
+    def tearDown(self):
+        configure_resilience(failure_threshold=5, reset_timeout=30.0)
+
+    def test_pool_failure_before_the_stream_opens_is_raised_as_is(self):
+        for base_url in ("http://pool-a.invalid:11434/v1", "http://pool-b.invalid:11434/v1"):
+            get_circuit_breaker(base_url).record_failure(SERVER)
+        stream = stream_chat_response("m", [{"role": "user", "content": "hi"}], server_address=SERVERS)
+        with self.assertRaises(CircuitOpenError):
+            list(stream)
+        self.assertNotIn("ollama_requests_total{", metrics.render_prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
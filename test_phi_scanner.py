@@ -0,0 +1,125 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from agents.phi_scanner import PhiScanner, is_identifying_field
+from agents.sanitize_data_tool import SanitizeDataTool
+from agents.sanitize_data_validator_agent import CLEAN_SCAN_VALIDATION, SanitizeDataValidatorAgent
+
+
+def fake_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def redact_everything(model, messages, **kwargs):
+    """Stand-in model: answers record batches with every string value replaced by [REDACTED]."""
+    payload = messages[-1]["content"].rsplit("\n", 1)[1]
+    if payload.startswith("["):
+        records = json.loads(payload)
+        return fake_response(json.dumps([{k: "[REDACTED]" for k in record} for record in records]))
+    return fake_response("[REDACTED]")
+
+
+class TestPhiScanner(unittest.TestCase):
+    def setUp(self):
+        self.scanner = PhiScanner()
+
+    def test_redacts_fixed_shape_identifiers(self):
+        scan = self.scanner.scan("contact a.b@example.com or 555-123-4567, ssn 123-45-6789, born 03/14/1962")
+        self.assertEqual(scan.text, "contact [EMAIL] or [PHONE], ssn [SSN], born [DATE]")
+        self.assertFalse(scan.needs_review)
+
+    def test_out_of_dictionary_names_need_review(self):
+        for text in ("Zelda Quackenbush", "Seen today: Olusegun Adeyemi.", "Referred from a clinic in Springfield."):
+            with self.subTest(text=text):
+                self.assertTrue(self.scanner.scan(text).needs_review)
+
+    def test_out_of_dictionary_name_and_place_are_review_terms(self):
+        scan = self.scanner.scan("Olusegun Adeyemi of Springfield, DOB 01/02/1990, diagnosed with HIV.")
+        self.assertIn("Olusegun Adeyemi", scan.review_terms)
+        self.assertIn("Springfield", scan.review_terms)
+        self.assertIn("[DATE]", scan.text)
+
+    def test_sentence_initial_words_alone_are_clean(self):
+        scan = self.scanner.scan("Lab results within normal range. Follow up in two weeks.\n- No acute findings.")
+        self.assertTrue(scan.clean)
+
+    def test_identifying_fields(self):
+        self.assertTrue(is_identifying_field("patient_name"))
+        self.assertTrue(is_identifying_field("City"))
+        self.assertFalse(is_identifying_field("diagnosis"))
+
+
+class TestSanitizePrescan(unittest.TestCase):
+    def setUp(self):
+        self.tool = SanitizeDataTool(verbose=False)
+
+    def test_out_of_dictionary_text_goes_to_the_model(self):
+        with mock.patch("agents.sanitize_data_tool.get_chat_response", side_effect=redact_everything) as model:
+            result = self.tool.execute("Olusegun Adeyemi of Springfield, DOB 01/02/1990, diagnosed with HIV.")
+        self.assertEqual(model.call_count, 1)
+        self.assertEqual(result.sanitized_data, "[REDACTED]")
+
+    def test_lowercase_and_informal_phi_goes_to_the_model(self):
+        for text in (
+            "pt john smith, dob 03/04/1950, call 555-123-4567.",
+            "lives at 12 elm street springfield",
+            "patient: j. doe, 45yo",
+        ):
+            with self.subTest(text=text):
+                with mock.patch("agents.sanitize_data_tool.get_chat_response", side_effect=redact_everything) as model:
+                    result = self.tool.execute(text)
+                self.assertEqual(model.call_count, 1)
+                self.assertEqual(result.sanitized_data, "[REDACTED]")
+
+    def test_model_sees_the_locally_redacted_text(self):
+        with mock.patch("agents.sanitize_data_tool.get_chat_response", side_effect=redact_everything) as model:
+            self.tool.execute("pt john smith, dob 03/04/1950, call 555-123-4567.")
+        prompt = model.call_args.kwargs["messages"][-1]["content"]
+        self.assertIn("pt john smith, dob [DATE], call [PHONE].", prompt)
+
+    def test_records_with_free_text_go_to_the_model(self):
+        records = [
+            {"name": "Zelda Quackenbush", "dob": "1/2/1980", "note": "stable"},
+            {"name": "olusegun", "city": "springfield", "phone": "555-222-3333"},
+            {"note": "seen by dr lee", "visit": "2021-04-05"},
+            {"phone": "555-222-3333", "visit": "2021-04-05", "visits": 3},
+        ]
+        with mock.patch("agents.sanitize_data_tool.get_chat_response", side_effect=redact_everything) as model:
+            result = self.tool.execute_records(records)
+        self.assertEqual(model.call_count, 1)
+        sent = json.loads(model.call_args.kwargs["messages"][-1]["content"].rsplit("\n", 1)[1])
+        self.assertEqual(len(sent), 3)  # only the last record is settled locally
+        self.assertEqual(result[1]["name"], "[REDACTED]")
+        self.assertEqual(result[2]["note"], "[REDACTED]")
+        self.assertEqual(result[3], {"phone": "[PHONE]", "visit": "[DATE]", "visits": 3})
+
+    def test_text_without_letters_after_redaction_skips_the_model(self):
+        with mock.patch("agents.sanitize_data_tool.get_chat_response") as model:
+            result = self.tool.execute("555-123-4567, 2020-01-02")
+        model.assert_not_called()
+        self.assertEqual(result.sanitized_data, "[PHONE], [DATE]")
+
+
+class TestValidatorPrescan(unittest.TestCase):
+    def test_validator_uses_the_model_by_default(self):
+        validator = SanitizeDataValidatorAgent(verbose=False)
+        with mock.patch("agents.sanitize_data_validator_agent.get_chat_response",
+                        return_value=fake_response("INVALID: names remain")) as model:
+            verdict = validator.execute("Olusegun Adeyemi of Springfield, DOB [DATE], diagnosed with HIV.")
+        self.assertEqual(model.call_count, 1)
+        self.assertEqual(verdict, "INVALID: names remain")
+
+    def test_opt_in_prescan_never_passes_out_of_dictionary_names(self):
+        validator = SanitizeDataValidatorAgent(verbose=False)
+        validator.prescan = True
+        with mock.patch("agents.sanitize_data_validator_agent.get_chat_response",
+                        return_value=fake_response("INVALID")) as model:
+            self.assertEqual(validator.execute("Olusegun Adeyemi of Springfield"), "INVALID")
+            self.assertEqual(validator.execute("Record [NAME], phone [PHONE]."), CLEAN_SCAN_VALIDATION)
+        self.assertEqual(model.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
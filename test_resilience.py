@@ -0,0 +1,189 @@
+import random
+import time
+import unittest
+from unittest import mock
+
+import httpx
+import openai
+
+from agents import metrics
+from agents.resilience import (
+    CLIENT,
+    CONNECTION,
+    RATE_LIMIT,
+    SERVER,
+    TIMEOUT,
+    UNKNOWN,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    RetryPolicy,
+    RetryState,
+    call_with_retries,
+    classify_error,
+    configure_resilience,
+    is_retryable,
+)
+
+REQUEST = httpx.Request("POST", "http://ollama.invalid:11434/v1/chat/completions")
+
+
+def status_error(status, headers=None):
+    response = httpx.Response(status, request=REQUEST, headers=headers)
+    if status == 429:
+        return openai.RateLimitError("rate limited", response=response, body=None)
+    return openai.APIStatusError(f"status {status}", response=response, body=None)
+
+
+class TestClassifyError(unittest.TestCase):
+    def test_error_classes(self):
+        cases = [
+            (openai.APITimeoutError(request=REQUEST), TIMEOUT),
+            (httpx.ReadTimeout("slow", request=REQUEST), TIMEOUT),
+            (openai.APIConnectionError(request=REQUEST), CONNECTION),
+            (ConnectionRefusedError(), CONNECTION),
+            (status_error(429), RATE_LIMIT),
+            (status_error(408), TIMEOUT),
+            (status_error(503), SERVER),
+            (status_error(404), CLIENT),
+            (httpx.HTTPStatusError("bad gateway", request=REQUEST, response=httpx.Response(502, request=REQUEST)), SERVER),
+            (ValueError("bug"), UNKNOWN),
+        ]
+        for error, expected in cases:
+            with self.subTest(error=type(error).__name__, expected=expected):
+                self.assertEqual(classify_error(error), expected)
+
+    def test_only_transient_errors_are_retryable(self):
+        self.assertTrue(is_retryable(status_error(500)))
+        self.assertTrue(is_retryable(openai.APIConnectionError(request=REQUEST)))
+        self.assertFalse(is_retryable(status_error(400)))
+        self.assertFalse(is_retryable(ValueError("bug")))
+
+
+class TestBackoff(unittest.TestCase):
+    def test_full_jitter_stays_under_the_capped_exponential(self):
+        policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+        rng = random.Random(7)
+        for attempt, cap in enumerate([0.5, 1.0, 2.0, 4.0, 4.0, 4.0]):
+            delays = [policy.backoff(attempt, rng) for _ in range(200)]
+            self.assertTrue(all(0.0 <= delay <= cap for delay in delays), attempt)
+            self.assertGreater(max(delays), cap * 0.9)  # jitter spans the whole range
+            self.assertLess(min(delays), cap * 0.1)
+
+    def test_seeded_rng_is_reproducible(self):
+        policy = RetryPolicy()
+        self.assertEqual(
+            [policy.backoff(i, random.Random(1)) for i in range(5)],
+            [policy.backoff(i, random.Random(1)) for i in range(5)],
+        )
+
+
+class TestRetryState(unittest.TestCase):
+    def test_client_errors_are_not_retried(self):
+        error = status_error(404)
+        with self.assertRaises(openai.APIStatusError):
+            RetryState(max_retries=3, deadline=None).delay_after(error)
+
+    def test_gives_up_after_max_retries(self):
+        state = RetryState(max_retries=2, deadline=None)
+        error = status_error(503)
+        for _ in range(2):
+            self.assertLessEqual(state.delay_after(error), 8.0)
+        with self.assertRaises(openai.APIStatusError):
+            state.delay_after(error)
+
+    def test_rate_limit_honours_retry_after_up_to_the_cap(self):
+        state = RetryState(max_retries=3, deadline=None)
+        self.assertGreaterEqual(state.delay_after(status_error(429, {"retry-after": "5"})), 5.0)
+        self.assertLessEqual(state.delay_after(status_error(429, {"retry-after": "3600"})), 30.0)
+
+    def test_deadline(self):
+        state = RetryState(max_retries=5, deadline=0.2)
+        self.assertLessEqual(state.remaining(), 0.2)
+        # A retry that could not finish before the deadline is not attempted
+        with self.assertRaises(openai.APIStatusError):
+            state.delay_after(status_error(429, {"retry-after": "10"}))
+        state.expires_at = time.monotonic() - 0.01
+        with self.assertRaises(DeadlineExceeded):
+            state.remaining()
+
+    def test_call_with_retries_passes_the_remaining_time_to_each_attempt(self):
+        configure_resilience(failure_threshold=5)
+        metrics.reset_metrics()
+        timeouts = []
+
+        def flaky(timeout):
+            timeouts.append(timeout)
+            if len(timeouts) < 3:
+                raise openai.APIConnectionError(request=REQUEST)
+            return "ok"
+
+        with mock.patch("agents.resilience.time.sleep") as sleep:
+            result = call_with_retries(flaky, "http://retries.invalid:11434/v1", max_retries=2, deadline=60.0)
+        self.assertEqual(result, "ok")
+        self.assertEqual(sleep.call_count, 2)
+        self.assertTrue(all(0 < timeout <= 60.0 for timeout in timeouts))
+        self.assertEqual(timeouts, sorted(timeouts, reverse=True))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("http://breaker.invalid:11434/v1", failure_threshold=2, reset_timeout=30.0)
+
+    def expire_open_period(self):
+        self.breaker.opened_at -= self.breaker.reset_timeout
+
+    def test_opens_after_consecutive_retryable_failures(self):
+        self.breaker.record_failure(SERVER)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record_failure(CONNECTION)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allows_request())
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.before_call()
+        self.assertGreater(raised.exception.retry_in, 0)
+
+    def test_client_errors_and_successes_do_not_open_it(self):
+        for _ in range(5):
+            self.breaker.record_failure(CLIENT)
+        self.breaker.record_failure(SERVER)
+        self.breaker.record_success()
+        self.breaker.record_failure(SERVER)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_trial_through_and_closes_on_success(self):
+        self.breaker.record_failure(SERVER)
+        self.breaker.record_failure(SERVER)
+        self.expire_open_period()
+        self.assertTrue(self.breaker.allows_request())
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allows_request())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()  # only one trial at a time
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+
+    def test_failed_trial_reopens_the_circuit(self):
+        self.breaker.record_failure(TIMEOUT)
+        self.breaker.record_failure(TIMEOUT)
+        self.expire_open_period()
+        self.breaker.before_call()
+        self.breaker.record_failure(TIMEOUT)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_cancelled_trial_gives_back_its_slot(self):
+        self.breaker.record_failure(SERVER)
+        self.breaker.record_failure(SERVER)
+        self.expire_open_period()
+        self.breaker.before_call()
+        self.breaker.release()
+        self.assertTrue(self.breaker.allows_request())
+        self.breaker.before_call()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from agents.resilience import DeadlineExceeded
+from agents.scheduler import BATCH, INTERACTIVE, ModelScheduler
+
+SERVER = "http://scheduler.invalid:11434/v1"
+
+
+class TestModelAffinity(unittest.TestCase):
+    def acquire_in_thread(self, scheduler, model, priority=INTERACTIVE):
+        granted = threading.Event()
+
+        def run():
+            scheduler.acquire(SERVER, model, timeout=5, priority=priority)
+            granted.set()
+
+        threading.Thread(target=run, daemon=True).start()
+        return granted
+
+    def test_cold_model_waits_for_a_free_slot_while_another_model_runs(self):
+        scheduler = ModelScheduler(slots=4, max_wait_for_switch=0.3)
+        scheduler.acquire(SERVER, "a")
+        started = time.monotonic()
+        granted = self.acquire_in_thread(scheduler, "b")
+        self.assertFalse(granted.wait(0.1))  # a slot is free, but "a" is running
+        self.assertTrue(granted.wait(2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(scheduler.stats()[SERVER]["model_switches"], 1)
+
+    def test_warm_model_is_granted_while_a_cold_one_is_held(self):
+        scheduler = ModelScheduler(slots=4, max_wait_for_switch=5)
+        scheduler.acquire(SERVER, "a")
+        cold = self.acquire_in_thread(scheduler, "b")
+        time.sleep(0.05)
+        scheduler.acquire(SERVER, "a", timeout=1)
+        self.assertFalse(cold.is_set())
+
+    def test_cold_model_is_granted_once_the_server_drains(self):
+        scheduler = ModelScheduler(slots=4, max_wait_for_switch=5)
+        scheduler.acquire(SERVER, "a")
+        cold = self.acquire_in_thread(scheduler, "b")
+        self.assertFalse(cold.wait(0.1))
+        scheduler.release(SERVER, "a")
+        self.assertTrue(cold.wait(1))
+
+    def test_abandoned_cold_waiter_releases_the_waiters_behind_it(self):
+        scheduler = ModelScheduler(slots=4, max_wait_for_switch=5)
+        scheduler.acquire(SERVER, "a")
+        timed_out = threading.Event()
+
+        def cold():
+            try:
+                scheduler.acquire(SERVER, "b", timeout=0.2)
+            except DeadlineExceeded:
+                timed_out.set()
+
+        threading.Thread(target=cold, daemon=True).start()
+        time.sleep(0.05)
+        batch = self.acquire_in_thread(scheduler, "a", priority=BATCH)
+        self.assertFalse(batch.wait(0.1))  # queued behind the held interactive request
+        self.assertTrue(timed_out.wait(1))
+        self.assertTrue(batch.wait(1))
+
+class TestInterruptedAcquire(unittest.TestCase):
+    def interrupt_wait(self):
+        return mock.patch("agents.scheduler.threading.Event.wait", side_effect=KeyboardInterrupt)
+
+    def test_interrupt_while_queued_leaves_the_queue(self):
+        scheduler = ModelScheduler(slots=1)
+        scheduler.acquire(SERVER, "a")
+        with self.interrupt_wait(), self.assertRaises(KeyboardInterrupt):
+            scheduler.acquire(SERVER, "a")
+        self.assertEqual(scheduler.stats()[SERVER]["queue_depth"], 0)
+        scheduler.release(SERVER, "a")
+        self.assertEqual(scheduler.stats()[SERVER]["in_use"], 0)
+
+    def test_interrupt_after_the_grant_gives_the_slot_back(self):
+        scheduler = ModelScheduler(slots=1)
+        with self.interrupt_wait(), self.assertRaises(KeyboardInterrupt):
+            scheduler.acquire(SERVER, "a")
+        self.assertEqual(scheduler.stats()[SERVER]["in_use"], 0)
+        scheduler.acquire(SERVER, "b", timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import httpx
+import openai
+
+from agents.model_catalog import ModelCatalog, ServerHealth, get_model_catalog
+from agents.server_pool import ServerPool
+
+SERVERS = ["http://pool-a.invalid:11434", "http://pool-b.invalid:11434"]
+
+
+class TestServerPoolPlacement(unittest.TestCase):
+    def setUp(self):
+        get_model_catalog().invalidate()
+        self.probed_on = []
+        self.probed = threading.Event()
+
+        def probe(catalog, server_address):
+            self.probed_on.append(threading.current_thread())
+            self.probed.set()
+            return ServerHealth(server_address=server_address, ok=True, models=["m"])
+
+        patcher = mock.patch.object(ModelCatalog, "probe", probe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(get_model_catalog().invalidate)
+
+    def test_call_async_does_not_probe_on_the_event_loop(self):
+        pool = ServerPool(SERVERS)
+
+        async def fn(base_url, timeout):
+            return base_url
+
+        async def main():
+            loop_thread = threading.current_thread()
+            result = await pool.call_async(fn, model="m")
+            return loop_thread, result
+
+        loop_thread, result = asyncio.run(main())
+        self.assertIn(result, pool.servers)
+        self.assertTrue(self.probed.wait(5))  # unknown servers are probed in the background
+        self.assertNotIn(loop_thread, self.probed_on)
+
+    def test_choose_probes_unknown_servers_synchronously(self):
+        pool = ServerPool(SERVERS)
+        pool.choose("m")
+        self.assertEqual(self.probed_on, [threading.current_thread()] * len(SERVERS))
+
+
+
+class TestServerPoolFailover(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(
+            ModelCatalog, "probe", lambda catalog, address: ServerHealth(server_address=address, ok=True, models=["m"])
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(get_model_catalog().invalidate)
+
+    def servers(self, name):
+        return [f"http://{name}-{i}.invalid:11434" for i in range(4)]
+
+    @staticmethod
+    def unavailable(base_url):
+        response = httpx.Response(503, request=httpx.Request("POST", f"{base_url}/v1/chat/completions"))
+        return openai.APIStatusError("status 503", response=response, body=None)
+
+    def test_failovers_count_against_max_retries(self):
+        pool = ServerPool(self.servers("failover-sync"))
+        attempts = []
+
+        def fn(base_url, timeout):
+            attempts.append(base_url)
+            raise self.unavailable(base_url)
+
+        with self.assertRaises(openai.APIStatusError):
+            pool.call(fn, model="m", max_retries=1)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(len(set(attempts)), 2)
+
+    def test_async_failovers_count_against_max_retries(self):
+        pool = ServerPool(self.servers("failover-async"))
+        attempts = []
+
+        async def fn(base_url, timeout):
+            attempts.append(base_url)
+            raise self.unavailable(base_url)
+
+        with self.assertRaises(openai.APIStatusError):
+            asyncio.run(pool.call_async(fn, model="m", max_retries=2))
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(len(set(attempts)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
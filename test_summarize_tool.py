@@ -0,0 +1,118 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from agents.summarize_tool import SummarizeTool
+from agents.text_chunker import estimate_tokens
+
+
+def fake_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestSummarizeMapReduce(unittest.TestCase):
+    def setUp(self):
+        self.tool = SummarizeTool(verbose=False)
+        self.tool.chunk_tokens = 100
+        self.tool.chunk_overlap = 0
+        self.tool.max_concurrency = 1
+        self.text = "\n\n".join(" ".join(["word"] * 90) + "." for _ in range(8))
+
+    def test_partials_that_never_fit_together_are_merged_pairwise(self):
+        # Every summary is longer than half a chunk, so no two pack into one group
+        with mock.patch("agents.summarize_tool.get_chat_response",
+                        return_value=fake_response(" ".join(["summary"] * 60))) as model:
+            self.tool.execute(self.text, mode="map_reduce")
+        prompts = [call.kwargs["messages"][-1]["content"] for call in model.call_args_list]
+        combines = [prompt for prompt in prompts if prompt.startswith("The following are summaries")]
+        # 8 chunks -> 4 -> 2 -> 1: every merge combines exactly two parts
+        self.assertEqual(len(prompts), 8 + 4 + 2 + 1)
+        for prompt in combines:
+            self.assertIn("Part 2:", prompt)
+            self.assertNotIn("Part 3:", prompt)
+            self.assertLessEqual(estimate_tokens(prompt), 2 * self.tool.chunk_tokens)
+
+    def test_pages_are_summarized_while_later_pages_are_extracted(self):
+        first_call = threading.Event()
+        waited = []
+
+        def pages():
+            for i in range(7):
+                yield " ".join(["word"] * 90) + "."
+            waited.append(first_call.wait(5))  # the last page is still "being parsed"
+            yield "Last page."
+
+        def summarize(**kwargs):
+            first_call.set()
+            return fake_response("part")
+
+        with mock.patch("agents.summarize_tool.get_chat_response", side_effect=summarize) as model, \
+                mock.patch("agents.summarize_tool.stream_chat_response", return_value=iter(["final"])) as stream:
+            result = self.tool.execute_pages_stream(pages()).result
+        self.assertEqual(waited, [True])
+        self.assertEqual(model.call_count, 7)
+        stream.assert_called_once()
+        self.assertEqual(result.summary, "final")
+
+    def test_document_that_fits_one_chunk_gets_a_single_summary(self):
+        with mock.patch("agents.summarize_tool.get_chat_response") as model, \
+                mock.patch("agents.summarize_tool.stream_chat_response", return_value=iter(["short"])) as stream:
+            result = self.tool.execute_pages_stream(iter(["Page one.", "Page two."])).result
+        model.assert_not_called()
+        self.assertIn("Page one.\n\nPage two.", stream.call_args.kwargs["messages"][-1]["content"])
+        self.assertEqual(result.summary, "short")
+
+
+
+class TestSummarizeContextWindow(unittest.TestCase):
+    def fill_the_reply(self, model, messages, **kwargs):
+        """Worst case: every reply uses its whole max_tokens budget."""
+        self.calls.append((messages, kwargs["max_tokens"]))
+        return fake_response(" ".join(f"finding{i}" for i in range(kwargs["max_tokens"])))
+
+    def assert_calls_fit_the_window(self, tool):
+        self.assertTrue(self.calls)
+        for messages, max_tokens in self.calls:
+            prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+            self.assertLessEqual(prompt_tokens * tool.token_margin + max_tokens, tool.context_tokens)
+
+    def test_map_reduce_calls_fit_the_default_context_window(self):
+        tool = SummarizeTool(verbose=False)
+        self.calls = []
+        text = "\n\n".join(
+            " ".join(f"Section {p} reports measurement {s} of cohort {p * s} with outcome {s % 3}." for s in range(40))
+            for p in range(20)
+        )
+        self.assertGreater(estimate_tokens(text), 8 * tool.chunk_tokens)
+        with mock.patch("agents.summarize_tool.get_chat_response", side_effect=self.fill_the_reply):
+            tool.execute(text)
+        self.assert_calls_fit_the_window(tool)
+        self.assertGreater(len(self.calls), 8)
+
+    def test_single_prompt_reply_uses_what_the_prompt_leaves(self):
+        tool = SummarizeTool(verbose=False)
+        self.calls = []
+        with mock.patch("agents.summarize_tool.get_chat_response", side_effect=self.fill_the_reply):
+            tool.execute(" ".join(f"word{i}" for i in range(900)))
+        self.assert_calls_fit_the_window(tool)
+        self.calls = []
+        with mock.patch("agents.summarize_tool.get_chat_response", side_effect=self.fill_the_reply):
+            tool.execute("A short abstract.")
+        self.assertGreater(self.calls[0][1], 1500)
+
+
+class TestSummarizeFocus(unittest.TestCase):
+    def test_embedding_failure_falls_back_to_the_whole_text(self):
+        tool = SummarizeTool(verbose=False)
+        tool.chunk_tokens = 20
+        text = "Cardiology results. " * 10 + "Oncology results. " * 10
+        with mock.patch("agents.summarize_tool.Retriever.select_relevant", side_effect=ConnectionError("no embed model")), \
+                mock.patch("agents.summarize_tool.get_chat_response", return_value=fake_response("summary")) as model:
+            result = tool.execute(text, mode="single", focus="oncology")
+        self.assertEqual(result.summary, "summary")
+        self.assertIn(text, model.call_args.kwargs["messages"][-1]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
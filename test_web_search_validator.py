@@ -0,0 +1,61 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from agents import metrics
+from agents.web_search_validator_agent import VERDICT_TOKENS, WebSearchValidatorAgent
+
+RESULTS = [
+    {"title": f"Result {i}", "snippet": f"Snippet {i}", "url": f"https://example.org/{i}"}
+    for i in range(1, 4)
+]
+
+
+def fake_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestWebSearchValidator(unittest.TestCase):
+    def test_leaves_room_for_reasoning_before_the_verdict(self):
+        validator = WebSearchValidatorAgent(verbose=False)
+        with mock.patch("agents.web_search_validator_agent.get_chat_response",
+                        return_value=fake_response("<think>Peer-reviewed venue.</think>\nINVALID")) as model:
+            self.assertEqual(validator.validate(RESULTS[:1]), [])
+        self.assertGreaterEqual(model.call_args.kwargs["max_tokens"], 512)
+
+    def test_non_reasoning_models_reserve_only_the_verdict(self):
+        for validator in (
+            WebSearchValidatorAgent(model_name="llama3.1:8b", verbose=False),
+            WebSearchValidatorAgent(reasoning_tokens=0, verbose=False),
+        ):
+            with self.subTest(model=validator.model_name), \
+                    mock.patch("agents.web_search_validator_agent.get_chat_response",
+                               return_value=fake_response("VALID")) as model:
+                validator.validate(RESULTS[:1])
+                self.assertEqual(model.call_args.kwargs["max_tokens"], VERDICT_TOKENS)
+
+    def test_reply_cut_off_mid_reasoning_keeps_the_result(self):
+        metrics.reset_metrics()
+        validator = WebSearchValidatorAgent(verbose=False)
+        with mock.patch("agents.web_search_validator_agent.get_chat_response",
+                        return_value=fake_response("<think>This looks like a journal")):
+            self.assertEqual(validator.validate(RESULTS[:1]), RESULTS[:1])
+        unparsed = metrics.UNPARSED_VERDICTS.value(agent=validator.name, model=validator.model_name)
+        self.assertEqual(unparsed, 1)
+
+    def test_batch_entries_without_a_verdict_are_retried_singly(self):
+        validator = WebSearchValidatorAgent(batch_size=3, verbose=False)
+
+        def reply(model, messages, **kwargs):
+            if "[2]" in messages[-1]["content"]:
+                return fake_response("<think>Checking each one.</think>\n1: INVALID")
+            return fake_response("INVALID" if "Result 2" in messages[-1]["content"] else "VALID")
+
+        with mock.patch("agents.web_search_validator_agent.get_chat_response", side_effect=reply) as model:
+            validated = validator.validate(RESULTS)
+        self.assertEqual(validated, [RESULTS[2]])
+        self.assertEqual(model.call_count, 3)  # one batch call, then results 2 and 3 alone
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+# utils/arxiv_search.py
+"""
+Cached, rate-limited arXiv search.
+
+Results are fetched one page at a time and only when the caller asks for them,
+so the UI can render the first page while later ones load. Every page is cached
+(TTL + LRU) per query, sort order and page size, so repeating a search or paging
+back is served from memory, and concurrent requests for a page that is already
+being fetched wait for that fetch instead of sending their own.
+
+All page requests in the process go through one throttle that keeps them at
+least ``min_interval`` seconds apart (arXiv asks for one request every three
+seconds) and backs off further when arXiv answers 429 or 5xx, so parallel
+sessions queue politely instead of failing.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from pydantic import BaseModel
+
+SORT_ORDERS = ("relevance", "submitted", "updated")
+
+
+class ArxivPaper(BaseModel):
+    title: str
+    summary: str
+    authors: List[str]
+    url: str
+    pdf_url: Optional[str] = None
+    published: Optional[str] = None
+
+
+class RateLimiter:
+    """Spaces calls at least ``min_interval`` seconds apart across all threads."""
+
+    def __init__(self, min_interval: float = 3.0, max_backoff: float = 60.0) -> None:
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+        self._penalty = 0.0  # extra spacing after the server asked us to slow down
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until this caller's slot comes up; slots are handed out in arrival order."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval + self._penalty
+        if slot > now:
+            time.sleep(slot - now)
+
+    def backoff(self) -> None:
+        with self._lock:
+            self._penalty = min(self.max_backoff, max(self.min_interval, self._penalty * 2))
+            self._next_slot = max(self._next_slot, time.monotonic() + self._penalty)
+
+    def recover(self) -> None:
+        with self._lock:
+            self._penalty = self._penalty / 2 if self._penalty > 0.5 else 0.0
+
+
+class _Page(BaseModel):
+    papers: List[ArxivPaper]
+    last: bool  # no results beyond this page
+
+
+class ArxivSearchService:
+    def __init__(
+        self,
+        page_size: int = 10,
+        ttl: float = 3600.0,
+        max_entries: int = 256,
+        min_interval: float = 3.0,
+        num_retries: int = 3,
+        max_workers: int = 4,
+    ) -> None:
+        self.page_size = page_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.num_retries = num_retries
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(min_interval)
+        self._pages: "OrderedDict[Tuple[str, str, int, int], Tuple[float, _Page]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str, int, int], Future] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"hits": 0, "misses": 0, "requests": 0, "throttled": 0}
+
+    def _client(self) -> Any:
+        import arxiv
+        # The throttle spaces requests, so the client itself must not sleep or retry
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = arxiv.Client(page_size=self.page_size, delay_seconds=0, num_retries=0)
+        return client
+
+    def _cached(self, key: Tuple[str, str, int, int]) -> Optional[_Page]:
+        entry = self._pages.get(key)
+        if entry is None:
+            return None
+        created, page = entry
+        if time.time() - created > self.ttl:
+            del self._pages[key]
+            return None
+        self._pages.move_to_end(key)
+        return page
+
+    def _store(self, key: Tuple[str, str, int, int], page: _Page) -> None:
+        self._pages[key] = (time.time(), page)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+
+    def _fetch(self, query: str, sort_by: str, page_index: int) -> _Page:
+        import arxiv
+        criterion = {
+            "relevance": arxiv.SortCriterion.Relevance,
+            "submitted": arxiv.SortCriterion.SubmittedDate,
+            "updated": arxiv.SortCriterion.LastUpdatedDate,
+        }[sort_by]
+        offset = page_index * self.page_size
+        # max_results bounds the client to exactly this one page
+        search = arxiv.Search(query=query, max_results=offset + self.page_size, sort_by=criterion)
+        for attempt in range(self.num_retries + 1):
+            self.limiter.wait()
+            with self._lock:
+                self._stats["requests"] += 1
+            try:
+                results = list(self._client().results(search, offset=offset))
+            except (arxiv.HTTPError, requests.exceptions.ConnectionError) as e:
+                retryable = not isinstance(e, arxiv.HTTPError) or e.status in (429, 500, 502, 503)
+                if not retryable or attempt == self.num_retries:
+                    raise
+                with self._lock:
+                    self._stats["throttled"] += 1
+                self.limiter.backoff()
+                continue
+            self.limiter.recover()
+            break
+        papers = []
+        for result in results:
+            authors = [author.name for author in (result.authors or [])]
+            if not result.summary or not authors:
+                continue
+            papers.append(ArxivPaper(
+                title=result.title, summary=result.summary, authors=authors, url=result.entry_id,
+                pdf_url=result.pdf_url, published=result.published.date().isoformat() if result.published else None,
+            ))
+        return _Page(papers=papers, last=len(results) < self.page_size)
+
+    def search_page(self, query: str, page_index: int = 0, sort_by: str = "relevance") -> Tuple[List[ArxivPaper], bool]:
+        """One page of results and whether it is the last one, from the cache when possible."""
+        if sort_by not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order '{sort_by}'; expected one of {SORT_ORDERS}")
+        key = (query.strip(), sort_by, self.page_size, page_index)
+        with self._lock:
+            page = self._cached(key)
+            if page is not None:
+                self._stats["hits"] += 1
+                return page.papers, page.last
+            self._stats["misses"] += 1
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = Future()
+        if not owner:
+            page = pending.result()  # someone else is fetching this page; share their result
+            return page.papers, page.last
+        try:
+            page = self._fetch(key[0], sort_by, page_index)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self._store(key, page)
+            del self._pending[key]
+        pending.set_result(page)
+        return page.papers, page.last
+
+    def iter_results(self, query: str, max_results: Optional[int] = 10, sort_by: str = "relevance") -> Iterator[ArxivPaper]:
+        """Yield up to ``max_results`` papers, fetching each page only once the previous one is consumed."""
+        produced = 0
+        page_index = 0
+        while max_results is None or produced < max_results:
+            papers, last = self.search_page(query, page_index, sort_by)
+            for paper in papers:
+                if max_results is not None and produced >= max_results:
+                    return
+                produced += 1
+                yield paper
+            if last:
+                return
+            page_index += 1
+
+    def search(self, query: str, max_results: int = 10, sort_by: str = "relevance") -> List[ArxivPaper]:
+        return list(self.iter_results(query, max_results, sort_by))
+
+    def search_many(
+        self, queries: Sequence[str], max_results: int = 10, sort_by: str = "relevance"
+    ) -> Dict[str, List[ArxivPaper]]:
+        """Run several queries concurrently; cached pages return at once, the rest share the throttle."""
+        queries = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+        if not queries:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(queries))) as executor:
+            futures = {query: executor.submit(self.search, query, max_results, sort_by) for query in queries}
+            return {query: future.result() for query, future in futures.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._pages))
+
+
+_service: Optional[ArxivSearchService] = None
+_service_lock = threading.Lock()
+
+
+def get_arxiv_search() -> ArxivSearchService:
+    """
+    Return the process-wide search service, shared by every session so the cache
+    and the rate limit are too. ARXIV_CACHE_TTL and ARXIV_MIN_INTERVAL (seconds)
+    override the defaults.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ArxivSearchService(
+                ttl=float(os.environ.get("ARXIV_CACHE_TTL", "3600")),
+                min_interval=float(os.environ.get("ARXIV_MIN_INTERVAL", "3")),
+            )
+        return _service
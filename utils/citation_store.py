@@ -0,0 +1,321 @@
+# utils/citation_store.py
+"""
+Persistent bibliography of collected citations.
+
+Citations are keyed by a normalised identifier: the DOI when there is one, else
+the arXiv id (version stripped), else the normalised title plus year, so the same
+paper reached through different URLs or capitalisations is stored once. Untitled
+records are keyed by their normalised URL; one with no title, DOI, arXiv id or URL
+can't be told apart from any other and is rejected. Adding a citation is a set
+lookup plus an ``INSERT OR IGNORE``.
+
+Only the bibliographic fields are stored; APA and BibTeX strings are rendered
+when asked for and memoised per citation. Exports stream from SQLite page by page,
+so a large bibliography is never held in memory as formatted text.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from functools import cached_property
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+DEFAULT_CITATION_DB = os.path.join(".cache", "citations.sqlite3")
+DEFAULT_COLLECTION = "default"
+STYLES = ("APA", "BibTeX")
+EXPORT_PAGE_SIZE = 500
+
+_DOI_RE = re.compile(r"(10\.\d{4,9}/[^\s\"<>]+)", re.IGNORECASE)
+# New-style ids (1706.03762) and old-style ids (hep-th/9901001), with an optional version
+_ARXIV_RE = re.compile(r"(?:arxiv\.org/(?:abs|pdf)/|arxiv:)?(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?", re.IGNORECASE)
+
+
+def normalize_doi(value: Optional[str]) -> Optional[str]:
+    match = _DOI_RE.search(value or "")
+    return match.group(1).rstrip(".").lower() if match else None
+
+
+def normalize_arxiv_id(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    if "arxiv" not in value.lower() and not re.fullmatch(r"\s*[\w.\-/]+\s*", value):
+        return None
+    match = _ARXIV_RE.search(value)
+    return match.group(1).lower() if match else None
+
+
+def normalize_title(title: str) -> str:
+    """Lower-case ASCII words only, so punctuation, accents and spacing don't matter."""
+    ascii_title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.findall(r"[a-z0-9]+", ascii_title.lower()))
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """Host (without ``www.``), path and query, so scheme, case of the host and trailing slashes don't matter."""
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    path = parts.path.rstrip("/")
+    if not host and not path:
+        return None
+    return host + path + (f"?{parts.query}" if parts.query else "")
+
+
+class Citation(BaseModel):
+    key: str
+    title: str
+    authors: List[str] = []
+    year: Optional[str] = None
+    journal: Optional[str] = None
+    url: Optional[str] = None
+    doi: Optional[str] = None
+    arxiv_id: Optional[str] = None
+
+    @classmethod
+    def from_record(cls, record: Union[Dict[str, Any], Any]) -> "Citation":
+        """Build a citation from a paper result (dict or object with title/authors/url/... fields)."""
+        if not isinstance(record, dict):
+            record = record.model_dump() if hasattr(record, "model_dump") else vars(record)
+        title = " ".join(str(record.get("title") or "").split())
+        authors = record.get("authors") or []
+        if isinstance(authors, str):
+            authors = [name.strip() for name in re.split(r";| and ", authors) if name.strip()]
+        year = record.get("year") or str(record.get("published") or "")[:4] or None
+        url = record.get("url") or record.get("entry_id")
+        doi = normalize_doi(record.get("doi")) or normalize_doi(url)
+        arxiv_id = normalize_arxiv_id(record.get("arxiv_id")) or normalize_arxiv_id(url)
+        return cls(
+            key=citation_key(title, year, doi, arxiv_id, url), title=title, authors=[str(a) for a in authors],
+            year=str(year) if year else None, journal=record.get("journal") or None, url=url, doi=doi, arxiv_id=arxiv_id,
+        )
+
+    def format(self, style: str = "APA") -> str:
+        return self.bibtex if style == "BibTeX" else self.apa
+
+    @cached_property
+    def apa(self) -> str:
+        authors = [_apa_author(name) for name in self.authors]
+        if len(authors) > 1:
+            author_text = ", ".join(authors[:-1]) + ", & " + authors[-1]
+        else:
+            author_text = authors[0] if authors else ""
+        title = self.title.rstrip(". ")
+        parts = [f"{author_text} ({self.year or 'n.d.'}).", title if title.endswith(("?", "!")) else f"{title}."]
+        if self.journal:
+            parts.append(f"{self.journal}.")
+        elif self.arxiv_id:
+            parts.append(f"arXiv preprint arXiv:{self.arxiv_id}.")
+        link = f"https://doi.org/{self.doi}" if self.doi else self.url
+        if link:
+            parts.append(link)
+        return " ".join(part for part in parts if part.strip(". "))
+
+    @cached_property
+    def bibtex(self) -> str:
+        fields = [("title", self.title), ("author", " and ".join(self.authors)), ("year", self.year)]
+        if self.journal:
+            fields.append(("journal", self.journal))
+        elif self.arxiv_id:
+            fields += [("eprint", self.arxiv_id), ("archivePrefix", "arXiv")]
+        fields += [("doi", self.doi), ("url", self.url)]
+        body = ",\n".join(f"  {name} = {{{_bibtex_escape(value)}}}" for name, value in fields if value)
+        return f"@{'article' if self.journal else 'misc'}{{{self.bibtex_key},\n{body}\n}}"
+
+    @property
+    def bibtex_key(self) -> str:
+        last_name = _last_name(self.authors[0]) if self.authors else "anon"
+        first_word = next((w for w in normalize_title(self.title).split() if len(w) > 3), "")
+        return re.sub(r"[^a-z0-9]", "", normalize_title(last_name)) + (self.year or "") + first_word
+
+
+def citation_key(
+    title: str, year: Optional[str] = None, doi: Optional[str] = None, arxiv_id: Optional[str] = None,
+    url: Optional[str] = None,
+) -> str:
+    """Identity of a citation in the store; empty when there is nothing to tell it apart by."""
+    if doi:
+        return f"doi:{doi}"
+    if arxiv_id:
+        return f"arxiv:{arxiv_id}"
+    normalized_title = normalize_title(title)
+    if normalized_title:
+        return f"title:{normalized_title}:{year or ''}"
+    normalized_url = normalize_url(url)
+    return f"url:{normalized_url}" if normalized_url else ""
+
+
+def _storable(record: Union[Dict[str, Any], Citation, Any]) -> Citation:
+    citation = record if isinstance(record, Citation) else Citation.from_record(record)
+    if not citation.key:
+        raise ValueError("Citation has no title, DOI, arXiv id or URL to identify it by")
+    return citation
+
+
+def _last_name(name: str) -> str:
+    return name.split(",")[0].strip() if "," in name else (name.split() or [""])[-1]
+
+
+def _apa_author(name: str) -> str:
+    if "," in name:
+        last, given = (part.strip() for part in name.split(",", 1))
+    else:
+        parts = name.split()
+        last, given = (parts[-1], " ".join(parts[:-1])) if parts else ("", "")
+    initials = " ".join(f"{part[0]}." for part in re.split(r"[\s\-]+", given) if part)
+    return f"{last}, {initials}" if initials else last
+
+
+def _bibtex_escape(value: str) -> str:
+    return str(value).replace("{", "\\{").replace("}", "\\}")
+
+
+class CitationStore:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.environ.get("CITATION_DB", DEFAULT_CITATION_DB)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS citations ("
+            "collection TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, added REAL NOT NULL, "
+            "PRIMARY KEY (collection, key));"
+        )
+        self._db.commit()
+        self._keys: Set[Tuple[str, str]] = set(self._db.execute("SELECT collection, key FROM citations"))
+
+    def add(self, record: Union[Dict[str, Any], Citation, Any], collection: str = DEFAULT_COLLECTION) -> Tuple[Citation, bool]:
+        """Store a citation unless its key is already in ``collection``; returns it and whether it was new."""
+        citation = _storable(record)
+        with self._lock:
+            if (collection, citation.key) in self._keys:
+                return citation, False
+            try:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO citations (collection, key, data, added) VALUES (?, ?, ?, ?)",
+                    (collection, citation.key, citation.model_dump_json(exclude={"key"}), time.time()),
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+            self._keys.add((collection, citation.key))
+            return citation, cursor.rowcount > 0
+
+    def add_many(
+        self, records: Iterable[Union[Dict[str, Any], Citation, Any]], collection: str = DEFAULT_COLLECTION
+    ) -> int:
+        """Store many citations in one transaction; returns how many were new."""
+        citations = [_storable(record) for record in records]  # reject the batch before writing any of it
+        rows = []
+        keys: Set[Tuple[str, str]] = set()
+        with self._lock:
+            for citation in citations:
+                entry = (collection, citation.key)
+                if entry not in self._keys and entry not in keys:
+                    keys.add(entry)
+                    rows.append((collection, citation.key, citation.model_dump_json(exclude={"key"}), time.time()))
+            before = self._db.total_changes
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO citations (collection, key, data, added) VALUES (?, ?, ?, ?)", rows
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+            # Only committed keys may short-circuit later adds
+            self._keys |= keys
+            return self._db.total_changes - before
+
+    def __contains__(self, key: str) -> bool:
+        return (DEFAULT_COLLECTION, key) in self._keys
+
+    def contains(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return (collection, key) in self._keys
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[Citation]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM citations WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+        return Citation(key=key, **json.loads(row[0])) if row else None
+
+    def count(self, collection: str = DEFAULT_COLLECTION) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM citations WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def iter_citations(self, collection: str = DEFAULT_COLLECTION, limit: Optional[int] = None) -> Iterator[Citation]:
+        """Citations in the order they were added, read from disk one page at a time."""
+        last_rowid = 0
+        produced = 0
+        while limit is None or produced < limit:
+            page_size = EXPORT_PAGE_SIZE if limit is None else min(EXPORT_PAGE_SIZE, limit - produced)
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT rowid, key, data FROM citations WHERE collection = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (collection, last_rowid, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            for rowid, key, data in rows:
+                last_rowid = rowid
+                produced += 1
+                yield Citation(key=key, **json.loads(data))
+
+    def iter_formatted(self, style: str = "APA", collection: str = DEFAULT_COLLECTION) -> Iterator[str]:
+        if style not in STYLES:
+            raise ValueError(f"Unknown citation style '{style}'; expected one of {STYLES}")
+        for citation in self.iter_citations(collection):
+            yield citation.format(style)
+
+    def export(self, out: IO[str], style: str = "APA", collection: str = DEFAULT_COLLECTION) -> int:
+        """Write every citation in ``collection`` to ``out``, separated by blank lines; returns the count."""
+        written = 0
+        for text in self.iter_formatted(style, collection):
+            out.write(("\n\n" if written else "") + text)
+            written += 1
+        if written:
+            out.write("\n")
+        return written
+
+    def remove(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM citations WHERE collection = ? AND key = ?", (collection, key))
+            self._db.commit()
+            self._keys.discard((collection, key))
+            return cursor.rowcount > 0
+
+    def clear(self, collection: str = DEFAULT_COLLECTION) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM citations WHERE collection = ?", (collection,))
+            self._db.commit()
+            self._keys = {entry for entry in self._keys if entry[0] != collection}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_default_store: Optional[CitationStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_citation_store() -> CitationStore:
+    """Return the process-wide store at CITATION_DB (default .cache/citations.sqlite3)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CitationStore()
+        return _default_store
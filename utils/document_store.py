@@ -0,0 +1,303 @@
+# utils/document_store.py
+"""
+Persistent store of extracted documents, shared across sessions and processes.
+
+Extracted text is stored once per content hash (SHA-256 of the downloaded bytes),
+and URLs point at their content together with the fetch metadata (ETag and
+Last-Modified). Fetching a known URL sends a conditional request, so an unchanged
+document costs a 304 and a lookup instead of a download and a PDF parse; a URL
+whose bytes match an already extracted document reuses that text.
+
+``iter_document_pages`` and ``iter_uploaded_pages`` yield each page as soon as it
+is extracted, so a summary can start before the last page is parsed; the document
+is stored once every page has been read.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Generator, Iterator, List, Optional, Tuple
+
+import requests
+from pydantic import BaseModel
+
+from .pdf_extraction import DOWNLOAD_CHUNK_SIZE, iter_pdf_pages
+
+DEFAULT_STORE_PATH = os.path.join(".cache", "documents.sqlite3")
+
+
+class StoredDocument(BaseModel):
+    content_hash: str
+    text: str
+    page_offsets: List[int] = []  # character offset where each page starts in ``text``
+    content_type: str = ""
+    url: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: Optional[float] = None
+
+    def pages(self) -> List[str]:
+        """Split ``text`` back into its pages."""
+        bounds = self.page_offsets + [len(self.text)]
+        return [self.text[start:end].rstrip("\n") for start, end in zip(bounds, bounds[1:])]
+
+
+class DocumentStore:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.environ.get("DOCUMENT_STORE_PATH", DEFAULT_STORE_PATH)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "content_hash TEXT PRIMARY KEY, text TEXT NOT NULL, page_offsets TEXT NOT NULL, "
+            "content_type TEXT NOT NULL, created REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, content_hash TEXT NOT NULL REFERENCES documents(content_hash), "
+            "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL);"
+        )
+        self._db.commit()
+
+    def _document(self, content_hash: str, url_row: Optional[Tuple] = None) -> Optional[StoredDocument]:
+        row = self._db.execute(
+            "SELECT text, page_offsets, content_type FROM documents WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        document = StoredDocument(
+            content_hash=content_hash, text=row[0], page_offsets=json.loads(row[1]), content_type=row[2],
+        )
+        if url_row is not None:
+            document.url, document.etag, document.last_modified, document.fetched_at = url_row
+        return document
+
+    def get_by_hash(self, content_hash: str) -> Optional[StoredDocument]:
+        with self._lock:
+            return self._document(content_hash)
+
+    def get_by_url(self, url: str) -> Optional[StoredDocument]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash, url, etag, last_modified, fetched_at FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            return self._document(row[0], row[1:])
+
+    def put(self, document: StoredDocument) -> None:
+        """Store a document's text (once per content hash) and, if it has one, its URL record."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO documents (content_hash, text, page_offsets, content_type, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (document.content_hash, document.text, json.dumps(document.page_offsets), document.content_type, time.time()),
+            )
+            if document.url:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO urls (url, content_hash, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (document.url, document.content_hash, document.etag, document.last_modified, document.fetched_at or time.time()),
+                )
+            self._db.commit()
+
+    def touch(self, url: str) -> None:
+        """Record that ``url`` was revalidated (e.g. answered 304 Not Modified)."""
+        with self._lock:
+            self._db.execute("UPDATE urls SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_default_store: Optional[DocumentStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Return the process-wide store at DOCUMENT_STORE_PATH (default .cache/documents.sqlite3)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DocumentStore()
+        return _default_store
+
+
+def _is_pdf(path: str, content_type: str, url: str) -> bool:
+    if "pdf" in content_type.lower() or url.lower().endswith(".pdf"):
+        return True
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def _extract_pdf(path: str) -> Generator[str, None, Tuple[str, List[int]]]:
+    """Yield each page as it is extracted, then return the joined text and page offsets."""
+    parts: List[str] = []
+    offsets: List[int] = []
+    position = 0
+    for page in iter_pdf_pages(path):
+        offsets.append(position)
+        parts.append(page)
+        position += len(page) + 1
+        yield page
+    return "\n".join(parts), offsets
+
+
+def _extract_html(path: str) -> str:
+    """Use the page's meta description when present, otherwise its visible text."""
+    from bs4 import BeautifulSoup
+    from bs4.element import Tag
+    with open(path, "rb") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    abstract = soup.find("meta", {"name": "description"})
+    if isinstance(abstract, Tag):
+        return str(abstract.get("content", ""))
+    return soup.get_text()
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extract_pages(path: str, content_type: str = "", url: str = "") -> Generator[str, None, StoredDocument]:
+    """Yield the pages of a local PDF or HTML file as they are extracted, then return the (unsaved) document."""
+    if _is_pdf(path, content_type, url):
+        text, offsets = yield from _extract_pdf(path)
+        content_type = "application/pdf"
+    else:
+        text, offsets = _extract_html(path), [0]
+        yield text
+        content_type = content_type or "text/html"
+    return StoredDocument(content_hash=_hash_file(path), text=text, page_offsets=offsets, content_type=content_type)
+
+
+def _finish(extraction: Generator[str, None, StoredDocument]) -> StoredDocument:
+    """Run an extraction to the end and return its document."""
+    while True:
+        try:
+            next(extraction)
+        except StopIteration as done:
+            return done.value
+
+
+def _pages(extraction: Generator[str, None, StoredDocument]) -> Iterator[str]:
+    """Pages as they are extracted, or those of the stored document when nothing had to be extracted."""
+    extracted = False
+    while True:
+        try:
+            page = next(extraction)
+        except StopIteration as done:
+            document = done.value
+            break
+        extracted = True
+        yield page
+    if not extracted:
+        yield from document.pages()
+
+
+def extract_file(path: str, content_type: str = "", url: str = "") -> StoredDocument:
+    """Extract text from a local PDF or HTML file into an (unsaved) document."""
+    return _finish(_extract_pages(path, content_type, url))
+
+
+def fetch_document(
+    url: str,
+    store: Optional[DocumentStore] = None,
+    max_age: Optional[float] = None,
+    timeout: Tuple[float, float] = (5.0, 60.0),
+) -> StoredDocument:
+    """
+    Return the extracted text of ``url``, downloading and parsing it only when needed.
+    Within ``max_age`` seconds of the last fetch the stored copy is returned without a
+    request; after that a conditional GET revalidates it.
+    """
+    return _finish(_fetch(url, store, max_age, timeout))
+
+
+def iter_document_pages(
+    url: str,
+    store: Optional[DocumentStore] = None,
+    max_age: Optional[float] = None,
+    timeout: Tuple[float, float] = (5.0, 60.0),
+) -> Iterator[str]:
+    """Like ``fetch_document``, but yield the pages as they are extracted; a web page is one page."""
+    return _pages(_fetch(url, store, max_age, timeout))
+
+
+def _fetch(
+    url: str, store: Optional[DocumentStore], max_age: Optional[float], timeout: Tuple[float, float]
+) -> Generator[str, None, StoredDocument]:
+    store = store or get_document_store()
+    known = store.get_by_url(url)
+    if known is not None and max_age is not None and known.fetched_at and time.time() - known.fetched_at < max_age:
+        return known
+
+    headers: Dict[str, str] = {}
+    if known is not None:
+        if known.etag:
+            headers["If-None-Match"] = known.etag
+        if known.last_modified:
+            headers["If-Modified-Since"] = known.last_modified
+
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        digest = hashlib.sha256()
+        with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code == 304 and known is not None:
+                store.touch(url)
+                return known
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_type = response.headers.get("Content-Type", "")
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        content_hash = digest.hexdigest()
+        document = store.get_by_hash(content_hash)
+        if document is None:
+            document = yield from _extract_pages(path, content_type, url)
+        document.url, document.etag, document.last_modified, document.fetched_at = url, etag, last_modified, time.time()
+        store.put(document)
+        return document
+    finally:
+        os.remove(path)
+
+
+def load_uploaded_document(data: bytes, store: Optional[DocumentStore] = None) -> StoredDocument:
+    """Extract an uploaded file, reusing the stored text when the same bytes were seen before."""
+    return _finish(_load_upload(data, store))
+
+
+def iter_uploaded_pages(data: bytes, store: Optional[DocumentStore] = None) -> Iterator[str]:
+    """Like ``load_uploaded_document``, but yield the pages as they are extracted."""
+    return _pages(_load_upload(data, store))
+
+
+def _load_upload(data: bytes, store: Optional[DocumentStore]) -> Generator[str, None, StoredDocument]:
+    store = store or get_document_store()
+    document = store.get_by_hash(hashlib.sha256(data).hexdigest())
+    if document is not None:
+        return document
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        document = yield from _extract_pages(path)
+    finally:
+        os.remove(path)
+    store.put(document)
+    return document
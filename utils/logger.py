@@ -1,14 +1,75 @@
 # utils/logger.py
+"""
+Logging setup for the app.
+
+Both sinks are queue-backed (``enqueue=True``): a call to the logger only puts the
+record on a queue and a background thread does the console and file I/O, so
+logging never holds up a request. Levels can be set per module with LOG_LEVELS,
+e.g. ``LOG_LEVELS="agents.summarize_tool=DEBUG,agents.openai_response=WARNING"``;
+LOG_LEVEL (console, default INFO) and LOG_FILE_LEVEL (file, default DEBUG) apply
+to every other module. Each sink's minimum level is the lowest of those, so
+below it loguru drops a record before formatting it and ``lazy`` arguments (the
+payload digests of AgentBase.log_request) are never computed. Tracebacks are
+logged without local variable values (``diagnose=False``), which would otherwise
+repeat the prompts they hold.
+
+Importing this module configures logging for the app; command-line entry points
+call ``configure_logging_from_env(console=sys.stderr)`` so logs stay off stdout.
+"""
 
 from loguru import logger
 import sys
 import os
+from typing import Dict, Optional, TextIO
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,other.module=LEVEL" into a loguru filter mapping."""
+    levels = {}
+    for entry in spec.split(","):
+        if "=" in entry:
+            module, level = entry.split("=", 1)
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+
+def _lowest_level(levels: Dict[str, str]) -> int:
+    return min(logger.level(level).no for level in levels.values())
+
+
+def configure_logging(
+    console_level: str = "INFO",
+    file_level: str = "DEBUG",
+    module_levels: Optional[Dict[str, str]] = None,
+    log_file: Optional[str] = "logs/multi_agent_system.log",
+    rotation: str = "10 MB",
+    console: TextIO = sys.stdout,
+) -> None:
+    module_levels = module_levels or {}
+    logger.remove()  # Remove the default logger
+    console_filter = {"": console_level, **module_levels}
+    logger.add(
+        console, level=_lowest_level(console_filter), filter=console_filter, enqueue=True, diagnose=False,
+        format="<green>{time}</green> <level>{message}</level>",
+    )
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        file_filter = {"": file_level, **module_levels}
+        logger.add(
+            log_file, level=_lowest_level(file_filter), filter=file_filter, enqueue=True, diagnose=False,
+            rotation=rotation, retention="10 days", format="{time} {level} {name} {message}",
+        )
+
+
+def configure_logging_from_env(console: TextIO = sys.stdout) -> None:
+    """Configure logging from LOG_LEVEL, LOG_FILE_LEVEL, LOG_LEVELS and LOG_ROTATION."""
+    configure_logging(
+        console_level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        file_level=os.environ.get("LOG_FILE_LEVEL", "DEBUG").upper(),
+        module_levels=parse_module_levels(os.environ.get("LOG_LEVELS", "")),
+        rotation=os.environ.get("LOG_ROTATION", "10 MB"),
+        console=console,
+    )
 
-# Create logs directory if it doesn't exist
-if not os.path.exists("logs"):
-    os.makedirs("logs")
 
-# Configure logger
-logger.remove()  # Remove the default logger
-logger.add(sys.stdout, level="INFO", format="<green>{time}</green> <level>{message}</level>")
-logger.add("logs/multi_agent_system.log", rotation="1 MB", retention="10 days", level="DEBUG", format="{time} {level} {message}")
+configure_logging_from_env()
@@ -0,0 +1,137 @@
+# utils/pdf_extraction.py
+"""
+PDF download and text extraction.
+
+Downloads are streamed in chunks to a per-request temporary file, so concurrent
+sessions never share a path and large PDFs are never held in memory twice. Pages
+are extracted in parallel across a process pool (PyPDF2 parsing is CPU-bound) and
+yielded lazily in page order, so callers can start working on the first pages
+before the last one is parsed (see SummarizeTool.execute_pages_stream).
+
+The pool starts its workers with "spawn": forking a process that runs Streamlit's
+and the scheduler's threads could copy a lock held by another thread into a
+worker, which then deadlocks.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+PdfSource = Union[str, bytes, BinaryIO]
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PAGES_PER_TASK = 8
+# Below this many pages, process start-up costs more than parallel parsing saves
+MIN_PAGES_FOR_POOL = 2 * PAGES_PER_TASK
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, min(8, os.cpu_count() or 1)),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Process-pool task: extract the text of pages [start, stop) from the PDF at ``path``."""
+    import PyPDF2
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def download_pdf(url: str, timeout: Tuple[float, float] = (5.0, 60.0), chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> str:
+    """Stream ``url`` into a new temporary file and return its path. The caller owns (and removes) the file."""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _spool_to_file(source: Union[bytes, BinaryIO]) -> str:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        if isinstance(source, bytes):
+            f.write(source)
+        else:
+            source.seek(0)
+            while True:
+                chunk = source.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+    return path
+
+
+def iter_pdf_pages(source: PdfSource, parallel: bool = True) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF, in order, as soon as it is available.
+    ``source`` may be a file path, raw bytes or a binary file object (e.g. a Streamlit upload).
+    Pages without extractable text yield an empty string.
+    """
+    import PyPDF2
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    reader = PyPDF2.PdfReader(source)
+    page_count = len(reader.pages)
+    if not parallel or page_count < MIN_PAGES_FOR_POOL:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    # Worker processes need a path to open; spool in-memory sources to a private temp file
+    spooled = None
+    path = source if isinstance(source, str) else None
+    if path is None:
+        spooled = path = _spool_to_file(source)
+    try:
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+        pool = _get_pool()
+        futures = [pool.submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    finally:
+        if spooled:
+            os.remove(spooled)
+
+
+def extract_pdf_text(source: PdfSource, parallel: bool = True) -> str:
+    """Extract the full text of a PDF, one line break between pages."""
+    return "\n".join(page for page in iter_pdf_pages(source, parallel) if page)
+
+
+def iter_pdf_pages_from_url(url: str, parallel: bool = True) -> Iterator[str]:
+    """Download a PDF to a private temporary file and yield its pages; the file is removed afterwards."""
+    path = download_pdf(url)
+    try:
+        yield from iter_pdf_pages(path, parallel)
+    finally:
+        os.remove(path)
+
+
+def extract_pdf_text_from_url(url: str, parallel: bool = True) -> str:
+    """Download a PDF and extract its full text."""
+    return "\n".join(page for page in iter_pdf_pages_from_url(url, parallel) if page)
@@ -0,0 +1,216 @@
+# utils/vector_index.py
+"""
+Local vector index with top-k cosine search.
+
+Vectors are L2-normalised on insert, so cosine similarity is a dot product.
+With a directory, the index is persisted as
+
+    vectors.f32   raw float32 rows, appended on insert and memory-mapped for search
+    entries.jsonl one JSON line per row (id, text, source, metadata)
+    index.json    dimension, row count and embedding model
+
+Inserts only append to these files, and search scans the memory map in blocks,
+so the index can grow past RAM: only the scores of one block and the top-k
+candidates are held at a time, and entry text is read from disk for the hits
+alone. Without a directory the index lives in memory.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+SEARCH_BLOCK_ROWS = 65536
+
+
+class IndexEntry(BaseModel):
+    id: str
+    text: str
+    source: Optional[str] = None
+    metadata: Dict[str, Any] = {}
+
+
+class SearchHit(BaseModel):
+    entry: IndexEntry
+    score: float
+
+
+def entry_id(text: str, source: Optional[str] = None) -> str:
+    """Stable id of a passage: the same text from the same source is only indexed once."""
+    return hashlib.sha1(f"{source or ''}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _normalize(vectors: Any) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    def __init__(self, directory: Optional[str] = None, model: Optional[str] = None) -> None:
+        self.directory = directory
+        self.model = model
+        self.dim: Optional[int] = None
+        self.count = 0
+        self._ids: Dict[str, int] = {}
+        self._offsets: List[int] = []  # byte offset of each row's line in entries.jsonl
+        self._entries: List[IndexEntry] = []  # in-memory mode only
+        self._vectors = np.zeros((0, 0), dtype=np.float32)  # in-memory rows (capacity may exceed count)
+        self._mmap: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory or "", name)
+
+    def _load(self) -> None:
+        header_path = self._path("index.json")
+        if not os.path.exists(header_path):
+            return
+        with open(header_path, encoding="utf-8") as f:
+            header = json.load(f)
+        if self.model and header.get("model") and header["model"] != self.model:
+            raise ValueError(
+                f"Index at {self.directory} was built with embedding model '{header['model']}', not '{self.model}'."
+            )
+        self.model = self.model or header.get("model")
+        self.dim = header["dim"]
+        with open(self._path("entries.jsonl"), "rb") as f:
+            offset = 0
+            for line in f:
+                if len(self._offsets) == header["count"]:
+                    break  # rows past the header's count come from an interrupted insert
+                self._ids[json.loads(line)["id"]] = len(self._offsets)
+                self._offsets.append(offset)
+                offset += len(line)
+        self.count = len(self._offsets)
+        # Drop any partial tail from an interrupted insert so appends stay aligned
+        for name, size in (("entries.jsonl", offset), ("vectors.f32", self.count * self.dim * 4)):
+            with open(self._path(name), "r+b") as f:
+                f.truncate(size)
+
+    def _write_header(self, count: int) -> None:
+        tmp = self._path("index.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": count, "model": self.model}, f)
+        os.replace(tmp, self._path("index.json"))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._ids
+
+    def add(self, vectors: Any, entries: Sequence[IndexEntry]) -> int:
+        """Append ``entries`` with their vectors, skipping ids already indexed; returns how many were added."""
+        vectors = _normalize(vectors)
+        if len(vectors) != len(entries):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(entries)} entries.")
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vectors have dimension {vectors.shape[1]}, the index expects {self.dim}.")
+            keep = []
+            for row, entry in enumerate(entries):
+                if entry.id not in self._ids:
+                    self._ids[entry.id] = -1  # reserved; also dedups within this batch
+                    keep.append(row)
+            if not keep:
+                return 0
+            vectors = vectors[keep]
+            entries = [entries[row] for row in keep]
+            try:
+                if self.directory:
+                    self._append_files(vectors, entries)
+                else:
+                    self._append_memory(vectors, entries)
+            except BaseException:
+                for entry in entries:
+                    del self._ids[entry.id]
+                del self._offsets[self.count:]
+                del self._entries[self.count:]
+                raise
+            for entry in entries:
+                self._ids[entry.id] = self.count
+                self.count += 1
+            return len(entries)
+
+    def _append_files(self, vectors: np.ndarray, entries: List[IndexEntry]) -> None:
+        with open(self._path("entries.jsonl"), "ab") as f:
+            offset = f.tell()
+            for entry in entries:
+                line = (json.dumps(entry.model_dump(), ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                self._offsets.append(offset)
+                offset += len(line)
+        with open(self._path("vectors.f32"), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._mmap = None  # remapped on the next search
+        self._write_header(self.count + len(entries))  # written last: the header's count commits the rows
+
+    def _append_memory(self, vectors: np.ndarray, entries: List[IndexEntry]) -> None:
+        needed = self.count + len(vectors)
+        if needed > len(self._vectors):
+            grown = np.zeros((max(needed, 2 * len(self._vectors), 64), self.dim), dtype=np.float32)
+            if self.count:
+                grown[:self.count] = self._vectors[:self.count]
+            self._vectors = grown
+        self._vectors[self.count:needed] = vectors
+        self._entries.extend(entries)
+
+    def _matrix(self) -> np.ndarray:
+        if not self.directory:
+            return self._vectors[:self.count]
+        if self._mmap is None or len(self._mmap) != self.count:
+            self._mmap = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._mmap
+
+    def _entry(self, row: int) -> IndexEntry:
+        if not self.directory:
+            return self._entries[row]
+        with open(self._path("entries.jsonl"), "rb") as f:
+            f.seek(self._offsets[row])
+            return IndexEntry(**json.loads(f.readline()))
+
+    def search(self, query: Any, k: int = 5, min_score: Optional[float] = None) -> List[SearchHit]:
+        """The ``k`` entries most similar to ``query`` by cosine similarity, best first."""
+        with self._lock:
+            if not self.count or k <= 0:
+                return []
+            matrix = self._matrix()
+        query = _normalize(query)[0]
+        if len(query) != matrix.shape[1]:
+            raise ValueError(f"Query has dimension {len(query)}, the index expects {matrix.shape[1]}.")
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+            scores = matrix[start:start + SEARCH_BLOCK_ROWS] @ query
+            if len(scores) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores)
+        hits = []
+        for row, score in zip(best_rows[order], best_scores[order]):
+            if min_score is not None and score < min_score:
+                break
+            hits.append(SearchHit(entry=self._entry(int(row)), score=float(score)))
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": self.count, "dim": self.dim, "model": self.model, "directory": self.directory}